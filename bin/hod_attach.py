@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# #
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Attach to a hod session (eg the HODclient session) on this node. Detach with ctrl-].
+
+@author: Stijn De Weirdt (Universiteit Gent)
+"""
+import os
+import sys
+
+from hod.session import attach, list_sessions, session_socket, CLIENT_SESSION_DEFAULT
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        name = sys.argv[1]
+    else:
+        name = CLIENT_SESSION_DEFAULT
+
+    sockfn = session_socket(name)
+    if not os.path.exists(sockfn):
+        sessions = list_sessions()
+        print "No session %s found. Available sessions: %s" % (name, ', '.join(sessions) or 'none')
+        sys.exit(1)
+
+    print "Attaching to session %s, detach with ctrl-]" % name
+    attach(sockfn)
+    print "\nDetached from session %s" % name
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# #
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+"""
+Build the bundle of HOD and its pure Python dependencies (see hod.bundle), to start the ranks with
+--hod-bundle=<bundle> from one byte-compiled zip instead of the modules on the shared filesystem.
+Rebuild it after changing (or upgrading the dependencies of) HOD.
+
+@author: Stijn De Weirdt (Universiteit Gent)
+"""
+import os
+import sys
+
+from vsc.utils.generaloption import simple_option
+
+from hod.bundle import build_bundle, BundleError, BUNDLE_NAME, BUNDLE_PACKAGES
+
+options = {
+    'target': ("Filename of the bundle", "string", "store", BUNDLE_NAME),
+    'main': ("Script the bundle runs (default: hod_main.py next to this script)", "string", "store", None),
+    'packages': ("Packages in the bundle", "strlist", "store", BUNDLE_PACKAGES),
+}
+go = simple_option(options)
+
+main = go.options.main
+if main is None:
+    main = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), 'hod_main.py')
+if not os.path.isfile(main):
+    go.parser.error("No script %s, provide --main" % main)
+
+try:
+    modules = build_bundle(go.options.target, packages=go.options.packages, main=main)
+except BundleError, err:
+    print err
+    sys.exit(1)
+
+print "Bundle %s with %s modules of %s (%s bytes)" % (go.options.target, modules, ', '.join(go.options.packages),
+                                                      os.path.getsize(go.options.target))
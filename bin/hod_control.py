@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# #
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Control a running HOD job: hod_control.py [options] stop|status|extend|drain
+
+    stop: stop all services now
+    status: show the running work
+    extend: extend the maximum runtime of the services by --seconds
+    drain: stop the MapReduce queues (no new jobs), stop once the client script finished,
+           no MapReduce jobs are running and the HBase tables are flushed
+
+@author: Stijn De Weirdt (Universiteit Gent)
+"""
+import json
+import sys
+
+from vsc.utils.generaloption import simple_option
+
+from hod.control import control_request, ControlError, CONTROL_ACTIONS
+from hod.status import format_status
+from hod.jobdir import find_job, job_dir, list_jobs, JOBDIR_BASE
+
+options = {
+    'jobid': ("Id of the job (default: the only job with a job directory)", "string", "store", None),
+    'jobdir': ("Base directory of the per job directories", "string", "store", JOBDIR_BASE),
+    'seconds': ("Number of seconds to extend with", "int", "store", 3600),
+    'json': ("Print the status as JSON", None, "store_true", False),
+}
+go = simple_option(options)
+
+if len(go.args) != 1:
+    go.parser.error("Provide one command: %s" % ', '.join(CONTROL_ACTIONS + ['status']))
+command = go.args[0]
+
+jobs = list_jobs(go.options.jobdir)
+jobid = go.options.jobid
+if jobid is None:
+    if len(jobs) != 1:
+        go.parser.error("Provide --jobid, found jobs: %s" % (', '.join(jobs) or 'none'))
+    jobid = jobs[0]
+elif find_job(jobid, basedir=go.options.jobdir) is None:
+    go.parser.error("No job %s, found jobs: %s" % (jobid, ', '.join(jobs) or 'none'))
+else:
+    jobid = find_job(jobid, basedir=go.options.jobdir)
+
+kwargs = {}
+if command == 'extend':
+    kwargs['seconds'] = go.options.seconds
+
+try:
+    reply = control_request(job_dir(jobid=jobid, basedir=go.options.jobdir), command, **kwargs)
+except ControlError, err:
+    print "Job %s: %s" % (jobid, err)
+    sys.exit(1)
+
+if not reply.get('ok', False):
+    print "Job %s: %s failed: %s" % (jobid, command, reply.get('error', 'unknown error'))
+    sys.exit(1)
+
+if command == 'status' and not go.options.json:
+    print format_status(reply)
+else:
+    print json.dumps(reply, indent=4, sort_keys=True)
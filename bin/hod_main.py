@@ -28,12 +28,18 @@ Main hanythingondemand script, should be invoked in a job
 @author: Stijn De Weirdt (Universiteit Gent)
 @author: Ewan Higgs (Universiteit Gent)
 """
+import time
+IMPORT_START = time.time()
+
 from hod.config.hodoption import HodOption
 from hod.hodproc import Slave, HadoopMaster
 from hod.mpiservice import MASTERRANK
+from hod.timeline import process_start
 
 from mpi4py import MPI
 
+IMPORT_END = time.time()
+
 options = HodOption()
 
 if MPI.COMM_WORLD.rank == MASTERRANK:
@@ -41,6 +47,13 @@ if MPI.COMM_WORLD.rank == MASTERRANK:
 else:
     serv = Slave(options)
 
+# # the interpreter start and the imports (on a shared filesystem) in the startup timeline of each rank
+start = process_start()
+if start is not None:
+    serv.timeline.t0 = start
+    serv.timeline.add('python start', start, IMPORT_START)
+serv.timeline.add('hod import', IMPORT_START, IMPORT_END)
+
 try:
     serv.run_dist()
 
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# #
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Summarize the resource metrics of a HOD job: per metric the average, the peak, the imbalance
+between the nodes (average of max/mean) and the hotspots (ranks most often in the top).
+
+@author: Stijn De Weirdt (Universiteit Gent)
+"""
+import json
+import os
+import sys
+
+from vsc.utils.generaloption import simple_option
+
+from hod.jobdir import find_job, job_dir, list_jobs, JOBDIR_BASE
+from hod.sampler import summarize, METRICS_CSV
+from hod.status import STATUS_SNAPSHOT
+
+options = {
+    'jobid': ("Id of the job (default: the only job with a job directory)", "string", "store", None),
+    'jobdir': ("Base directory of the per job directories", "string", "store", JOBDIR_BASE),
+    'metric': ("Only show metrics starting with this (eg node.)", "string", "store", ''),
+}
+go = simple_option(options)
+
+jobs = list_jobs(go.options.jobdir)
+if go.options.jobid is None:
+    if len(jobs) != 1:
+        go.parser.error("Provide --jobid, found jobs: %s" % (', '.join(jobs) or 'none'))
+    jobid = jobs[0]
+else:
+    jobid = find_job(go.options.jobid, basedir=go.options.jobdir)
+    if jobid is None:
+        go.parser.error("No job %s, found jobs: %s" % (go.options.jobid, ', '.join(jobs) or 'none'))
+
+jobdir = job_dir(jobid, basedir=go.options.jobdir)
+metrics_fn = os.path.join(jobdir, METRICS_CSV)
+if not os.path.exists(metrics_fn):
+    print "No metrics for job %s (%s not found)" % (jobid, metrics_fn)
+    sys.exit(1)
+
+# # rank to hostname, from the status snapshot
+hosts = {}
+try:
+    hosts = dict([(int(rank), info['fqdn']) for rank, info in json.load(open(os.path.join(jobdir, STATUS_SNAPSHOT)))['ranks'].items()])
+except (IOError, ValueError, KeyError):
+    pass
+
+
+def rankname(rank):
+    return "%s(%s)" % (rank, hosts.get(rank, '?'))
+
+print "%-32s %7s %10s %22s %9s  %s" % ('metric', 'samples', 'mean', 'peak (rank)', 'imbalance', 'hotspots (times in top)')
+for name, summ in sorted(summarize(metrics_fn).items()):
+    if not name.startswith(go.options.metric):
+        continue
+    hotspots = ' '.join(["%s:%s" % (rankname(rank), count) for rank, count in summ['hotspots']])
+    print "%-32s %7d %10.2f %10.2f %11s %9.2f  %s" % (name, summ['samples'], summ['mean'], summ['peak'],
+                                                      rankname(summ['peakrank']), summ['imbalance'], hotspots)
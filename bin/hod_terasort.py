@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# #
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Terasort benchmark of the running HOD cluster (run it from the HOD client session).
+The results are recorded with a label for the storage layout (default: the number of data dirs per node),
+so runs with eg --hod-storage-layout=striped and =single can be compared (--compare).
+
+@author: Stijn De Weirdt (Universiteit Gent)
+"""
+import os
+import sys
+
+from vsc.utils.generaloption import simple_option
+
+from hod.benchmark import Terasort, compare, data_dirs, find_examples_jar, record, TERASORT_CSV, TERASORT_STEPS
+from hod.jobdir import JOBDIR_BASE
+
+options = {
+    'rows': ("Number of 100 byte rows to generate", "int", "store", 10 ** 7),
+    'label': ("Label of the storage layout (default: number of data dirs)", "string", "store", None),
+    'hdfsdir': ("HDFS directory for the benchmark data", "string", "store", 'hodbench'),
+    'results': ("CSV file with the results", "string", "store", os.path.join(JOBDIR_BASE, TERASORT_CSV)),
+    'compare': ("Only compare the recorded results", None, "store_true", False),
+}
+go = simple_option(options)
+
+if not go.options.compare:
+    jar = find_examples_jar(os.environ.get('HADOOP_HOME', ''))
+    if jar is None:
+        go.parser.error("No hadoop examples jar found in HADOOP_HOME %s" % os.environ.get('HADOOP_HOME', ''))
+    confdir = os.environ.get('HADOOP_CONF_DIR', None)
+    if confdir is None:
+        go.parser.error("HADOOP_CONF_DIR not set, run this in the HOD client session")
+
+    datadirs = len(data_dirs(confdir))
+    label = go.options.label or "datadirs=%s" % datadirs
+    timings = Terasort(jar, go.options.rows, go.options.hdfsdir).run()
+    record(go.options.results, label, datadirs, go.options.rows, timings)
+    if None in timings.values():
+        print "Terasort failed: %s" % timings
+        sys.exit(1)
+
+if not os.path.exists(go.options.results):
+    print "No results in %s" % go.options.results
+    sys.exit(1)
+
+results = compare(go.options.results)
+print "%-20s %12s %5s %s %10s %8s" % ('label', 'rows', 'runs', ' '.join(["%12s" % x for x in TERASORT_STEPS]),
+                                       'total', 'speedup')
+for rows in sorted(set([x[1] for x in results])):
+    # # speedup relative to the slowest layout for the same number of rows
+    slowest = max([mean['total'] for (label, nrows), mean in results.items() if nrows == rows])
+    for (label, nrows), mean in sorted(results.items()):
+        if nrows != rows:
+            continue
+        print "%-20s %12s %5s %s %10.1f %8.2f" % (label, rows, mean['runs'],
+                                                  ' '.join(["%12.1f" % mean[x] for x in TERASORT_STEPS]),
+                                                  mean['total'], slowest / mean['total'])
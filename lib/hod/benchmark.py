@@ -0,0 +1,259 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Benchmarks
+
+Terasort benchmark of a running HOD cluster, to compare storage layouts (eg striped and single data dir).
+Each run does teragen, terasort and teravalidate and records the walltime of each step, together with
+the data directory layout of the cluster, in a CSV file shared by all runs.
+
+Codec benchmark, to pick the map output codec: the compression throughput of the codecs through hadoop
+itself (so with the native libraries it actually loads on the node). This is a rough check: the codec
+factory of hadoop copies through a 100-byte buffer, so the per-call overhead is part of the throughput;
+it only shows codecs that fail or are much slower on the nodes.
+
+@author: Stijn De Weirdt
+"""
+import csv
+import glob
+import os
+import random
+import shutil
+import time
+from xml.dom import minidom
+
+from vsc import fancylogger
+
+from hod.commands.hadoop import HadoopCommand, CodecCompress
+from hod.config.hadoopcfg import CODECS
+
+
+TERASORT_STEPS = ['teragen', 'terasort', 'teravalidate']
+TERASORT_TIMEOUT = 24 * 3600
+TERASORT_CSV = 'terasort.csv'
+TERASORT_FIELDS = ['time', 'label', 'datadirs', 'rows'] + TERASORT_STEPS
+# # examples jar of hadoop 1 and 2 (relative to the hadoop home)
+EXAMPLES_JARS = ['hadoop-examples*.jar', 'share/hadoop/mapreduce/hadoop-mapreduce-examples-*.jar']
+
+CODEC_SAMPLE_SIZE = 32 * 1024 * 1024
+CODEC_SAMPLE_CHUNK = 1024 * 1024  # unique data, more than the window of the fast codecs
+CODEC_TIMEOUT = 300
+CODEC_BENCHMARK_MARGIN = 1.5  # a rough benchmark only overrides the auto codec when it is this much faster
+
+_log = fancylogger.getLogger('benchmark', fname=False)
+
+
+def find_examples_jar(hadoophome):
+    """The hadoop examples jar in hadoophome (None if not found)"""
+    for pattern in EXAMPLES_JARS:
+        jars = sorted(glob.glob(os.path.join(hadoophome, pattern)))
+        if jars:
+            return jars[0]
+    return None
+
+
+def conf_property(fn, name):
+    """Value of property name in hadoop xml config file fn (None if not set)"""
+    for prop in minidom.parse(fn).getElementsByTagName('property'):
+        names = prop.getElementsByTagName('name')
+        values = prop.getElementsByTagName('value')
+        if names and values and names[0].firstChild and names[0].firstChild.data.strip() == name:
+            return values[0].firstChild and values[0].firstChild.data.strip()
+    return None
+
+
+def data_dirs(confdir):
+    """The dfs.data.dir directories in the hdfs-site.xml in confdir"""
+    value = conf_property(os.path.join(confdir, 'hdfs-site.xml'), 'dfs.data.dir') or ''
+    return [x for x in value.split(',') if x]
+
+
+class Terasort(object):
+    """Run the terasort steps"""
+    def __init__(self, jar, rows, basedir):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        self.jar = jar
+        self.rows = rows
+        self.basedir = basedir  # HDFS directory for the data
+
+    def hadoop(self, args):
+        """Run hadoop with args; returns True on success"""
+        cmd = HadoopCommand(args)
+        cmd.timeout = TERASORT_TIMEOUT
+        cmd.run()
+        if not cmd.result.is_ok():
+            self.log.error("Failed %s: %s" % (cmd, cmd.result))
+            return False
+        return True
+
+    def run(self):
+        """Run all steps; returns dict with the walltime of each step (None if a step failed)"""
+        gen, out, report = [os.path.join(self.basedir, x) for x in ('gen', 'sorted', 'report')]
+        self.hadoop(['fs', '-rmr', '-skipTrash', self.basedir])  # left over from a previous run
+        args = {
+            'teragen': [self.rows, gen],
+            'terasort': [gen, out],
+            'teravalidate': [out, report],
+        }
+        res = dict([(x, None) for x in TERASORT_STEPS])
+        for step in TERASORT_STEPS:
+            start = time.time()
+            if not self.hadoop(['jar', self.jar, step] + ["%s" % x for x in args[step]]):
+                break
+            res[step] = time.time() - start
+            self.log.info("%s of %s rows took %.1fs" % (step, self.rows, res[step]))
+        self.hadoop(['fs', '-rmr', '-skipTrash', self.basedir])
+        return res
+
+
+def record(fn, label, datadirs, rows, timings):
+    """Add a run to the CSV file fn"""
+    new = not os.path.exists(fn)
+    fh = open(fn, 'a')
+    writer = csv.writer(fh)
+    if new:
+        writer.writerow(TERASORT_FIELDS)
+    row = {'time': int(time.time()), 'label': label, 'datadirs': datadirs, 'rows': rows}
+    row.update(timings)
+    writer.writerow(['' if row[x] is None else row[x] for x in TERASORT_FIELDS])
+    fh.close()
+
+
+def compare(fn):
+    """Per (label, rows): number of successful runs and the mean walltime of each step and of all steps"""
+    runs = {}
+    for row in csv.DictReader(open(fn)):
+        if not all([row[x] for x in TERASORT_STEPS]):
+            continue  # failed run
+        runs.setdefault((row['label'], int(row['rows'])), []).append(row)
+
+    res = {}
+    for key, rows in runs.items():
+        mean = dict([(x, sum([float(y[x]) for y in rows]) / len(rows)) for x in TERASORT_STEPS])
+        mean['total'] = sum(mean.values())
+        mean['runs'] = len(rows)
+        res[key] = mean
+    return res
+
+
+def codec_sample(fn, size=CODEC_SAMPLE_SIZE):
+    """Write size bytes of text like data (like most map output) to fn"""
+    rnd = random.Random(size)
+    words = ["%x" % rnd.getrandbits(28) for _ in range(2000)]
+    lines = []
+    chunk = 0
+    while chunk < CODEC_SAMPLE_CHUNK:
+        lines.append("%010d\t%s\n" % (rnd.randint(0, 10 ** 9), ' '.join(rnd.sample(words, 6))))
+        chunk += len(lines[-1])
+    chunk = ''.join(lines)
+
+    fh = open(fn, 'w')
+    for _ in range(max(1, size // len(chunk))):
+        fh.write(chunk)
+    fh.close()
+
+
+def slowest_throughput(results, codec):
+    """The throughput of codec on the slowest rank, from the benchmark results of all ranks (None if it failed)"""
+    throughputs = [x.get(codec, None) and x[codec]['throughput'] for x in results]
+    if not throughputs or not all(throughputs):
+        return None
+    return min(throughputs)
+
+
+def best_codec(results):
+    """The codec with the highest throughput on the slowest rank, from the benchmark results of all ranks"""
+    codecs = set(sum([x.keys() for x in results], []))
+    slowest = {}
+    for codec in codecs:
+        throughput = slowest_throughput(results, codec)
+        if throughput is not None:
+            slowest[codec] = throughput
+    if not slowest:
+        return None, None
+    codec = max(slowest, key=lambda x: slowest[x])
+    return codec, slowest[codec]
+
+
+class CodecBenchmark(object):
+    """Rough compression throughput of codecs (CompressionCodecFactory -in, see CODEC_BENCHMARK_MARGIN)"""
+    def __init__(self, workdir, codecs, size=CODEC_SAMPLE_SIZE):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        self.workdir = workdir
+        self.codecs = codecs
+        self.size = size
+        self.confdir = os.path.join(self.workdir, 'conf')
+
+    def conf(self):
+        """Config dir where the codec factory knows all codecs"""
+        if not os.path.isdir(self.confdir):
+            os.makedirs(self.confdir)
+        classes = ','.join([CODECS[x][0] for x in sorted(CODECS)])
+        fh = open(os.path.join(self.confdir, 'core-site.xml'), 'w')
+        fh.write('<?xml version="1.0"?>\n<configuration><property><name>io.compression.codecs</name>'
+                 '<value>%s</value></property></configuration>\n' % classes)
+        fh.close()
+
+    def compress(self, fn, codec):
+        """Compress fn with codec; returns (walltime, compressed size), walltime None on failure"""
+        target = "%s%s" % (fn, CODECS[codec][1])
+        cmd = CodecCompress(target)
+        cmd.timeout = CODEC_TIMEOUT
+        cmd.env = dict(os.environ)
+        cmd.env['HADOOP_CONF_DIR'] = self.confdir
+        cmd.run()
+        size = None
+        if os.path.exists(target):
+            size = os.path.getsize(target)
+            os.remove(target)
+        if not cmd.result.is_ok() or size is None:
+            self.log.warn("Codec %s failed: %s %s" % (codec, cmd.result, cmd.result.err))
+            return None, size
+        return cmd.result.walltime, size
+
+    def run(self):
+        """Dict with throughput (MB/s) and ratio per codec (None if the codec failed)"""
+        self.conf()
+        sample = os.path.join(self.workdir, 'sample')
+        codec_sample(sample, self.size)
+        size = os.path.getsize(sample)
+        empty = os.path.join(self.workdir, 'empty')
+        open(empty, 'w').close()
+
+        res = {}
+        for codec in self.codecs:
+            # # the startup of the jvm and the loading of the native library is not part of the throughput
+            startup, _ = self.compress(empty, codec)
+            walltime, compressed = self.compress(sample, codec)
+            if startup is None or walltime is None:
+                res[codec] = None
+                continue
+            res[codec] = {
+                'throughput': size / (1024.0 * 1024) / max(walltime - startup, 0.001),
+                'ratio': float(compressed) / size,
+            }
+            self.log.debug("Codec %s: %s" % (codec, res[codec]))
+        shutil.rmtree(self.workdir, ignore_errors=True)
+        return res
@@ -0,0 +1,257 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Bundle HOD and its pure Python dependencies in one byte-compiled zip archive
+
+Started from a module on a shared filesystem, every rank imports some hundreds of modules, each a
+search over all sys.path entries: thousands of stat and open calls per rank, a metadata storm at
+hundreds of ranks. Started from the bundle (python hod.zip ...), the modules are looked up in the
+zip directory that is read once, and no source is compiled. The bundle first copies itself to node-local
+tmp (TMPDIR, once per node: another rank or job on the node reuses the copy) and restarts from there,
+so the shared filesystem sees one sequential read per node. The standard library is still imported from
+the python installation.
+
+C extensions (mpi4py, netifaces) can not be imported from a zip; they are still imported from sys.path.
+
+@author: Stijn De Weirdt
+"""
+import imp
+import marshal
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import types
+import zipfile
+import zipimport
+
+
+BUNDLE_PACKAGES = ['hod', 'vsc', 'netaddr']
+BUNDLE_NAME = 'hod.zip'
+BUNDLE_MAIN_MODULE = 'hod_main'
+BUNDLE_MAIN = '''"""Run %(main)s from the bundle, from a node-local copy"""
+import runpy
+import sys
+from hod.bundle import install, localize, restart
+
+local = localize(sys.argv[0])
+if local is not None:
+    restart(local, sys.argv[1:])
+install(sys.argv[0])
+runpy.run_module('%(main)s', run_name='__main__')
+'''
+# # namespace packages without __init__ (eg vsc, from a -nspkg.pth file) or with a pkg_resources one (eg vsc.utils)
+# # get an empty one: the bundle has the namespace from all paths, and importing pkg_resources scans all of sys.path
+BUNDLE_NAMESPACE_INIT = ''
+BUNDLE_LOCAL_ENV = 'HOD_BUNDLE_LOCAL'  # set (to 0) to run from the bundle itself, eg when TMPDIR is shared
+
+
+class BundleError(Exception):
+    """Failure to build the bundle"""
+
+
+def package_sources(name):
+    """List of (filename, archive name) of the Python sources of package name"""
+    try:
+        package = __import__(name)
+    except ImportError, err:
+        raise BundleError("Can't import package %s: %s" % (name, err))
+
+    sources = []
+    for path in getattr(package, '__path__', []):
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted([x for x in dirnames if not x.startswith('.') and not x == '__pycache__'])
+            for fn in sorted(filenames):
+                if os.path.splitext(fn)[1] in ['.so', '.pyd']:
+                    raise BundleError("Package %s has C extension %s, can't be imported from a zip" %
+                                      (name, os.path.join(dirpath, fn)))
+                if fn.endswith('.py'):
+                    arcname = os.path.join(name, os.path.relpath(os.path.join(dirpath, fn), path))
+                    sources.append((os.path.join(dirpath, fn), arcname))
+    if not sources:
+        raise BundleError("No Python sources for package %s" % name)
+    return sources
+
+
+def compiled(source, filename, mtime):
+    """The pyc data of source (with the mtime of the source, so zipimport uses it instead of compiling)"""
+    code = compile(source, filename, 'exec')
+    return imp.get_magic() + struct.pack('<I', int(mtime) & 0xFFFFFFFF) + marshal.dumps(code)
+
+
+def _add(archive, arcname, data, mtime, prefix):
+    """Add source data and its pyc as arcname to the zip archive"""
+    for name, content in [(arcname, data), (arcname + 'c', compiled(data, os.path.join(prefix, arcname), mtime))]:
+        info = zipfile.ZipInfo(name, time.localtime(mtime)[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0644 << 16
+        archive.writestr(info, content)
+
+
+def build_bundle(target, packages=None, main=None):
+    """Write the bundle of packages (default BUNDLE_PACKAGES) and __main__ running script main to target
+        returns the number of modules
+    """
+    if packages is None:
+        packages = BUNDLE_PACKAGES
+
+    tmptarget = "%s.%s" % (target, os.getpid())
+    prefix = os.path.basename(target)
+    modules = 0
+    archive = None
+    try:
+        archive = zipfile.ZipFile(tmptarget, 'w', zipfile.ZIP_DEFLATED)
+        for name in packages:
+            sources = package_sources(name)
+            arcnames = [arcname for _, arcname in sources]
+            for fn, arcname in sources:
+                data = open(fn).read()
+                if os.path.basename(fn) == '__init__.py' and 'declare_namespace' in data:
+                    data = BUNDLE_NAMESPACE_INIT
+                _add(archive, arcname, data, os.stat(fn).st_mtime, prefix)
+            # # a package is a directory with an __init__ (in the zip too)
+            for dirname in sorted(set([os.path.dirname(x) for x in arcnames])):
+                init = os.path.join(dirname, '__init__.py')
+                if not init in arcnames:
+                    _add(archive, init, BUNDLE_NAMESPACE_INIT, time.time(), prefix)
+            modules += len(sources)
+
+        if main is not None:
+            name = BUNDLE_MAIN_MODULE
+            _add(archive, '%s.py' % name, open(main).read(), os.stat(main).st_mtime, prefix)
+            _add(archive, '__main__.py', BUNDLE_MAIN % {'main': name}, time.time(), prefix)
+            modules += 1
+        archive.close()
+        os.rename(tmptarget, target)
+    except (BundleError, IOError, OSError, SyntaxError), err:
+        if archive is not None:
+            archive.close()
+        if os.path.exists(tmptarget):
+            os.remove(tmptarget)
+        if isinstance(err, BundleError):
+            raise
+        raise BundleError("Failed to build bundle %s: %s" % (target, err))
+
+    return modules
+
+
+def localize(bundle, tmpdir=None):
+    """Copy the bundle to node-local tmpdir (default TMPDIR), unless it is already there
+        the copy is named after the size and mtime of the bundle: a copy is never replaced (zipimport
+        reopens the archive for every module), a rebuilt bundle gets a new copy
+        returns the path of the local copy, None if bundle is in tmpdir (or localization is disabled or fails)
+    """
+    if os.environ.get(BUNDLE_LOCAL_ENV, '1') in ['0', 'no', 'false']:
+        return None
+    if tmpdir is None:
+        tmpdir = tempfile.gettempdir()
+    tmpdir = os.path.abspath(tmpdir)
+    bundle = os.path.abspath(bundle)
+    if os.path.dirname(bundle) == tmpdir:
+        return None
+
+    try:
+        st = os.stat(bundle)
+        base, ext = os.path.splitext(os.path.basename(bundle))
+        local = os.path.join(tmpdir, "%s-%s-%d%s" % (base, st.st_size, st.st_mtime, ext))
+        if not os.path.exists(local):
+            # # copy and rename, so a rank never starts from a partial copy of another
+            tmplocal = "%s.%s" % (local, os.getpid())
+            shutil.copy2(bundle, tmplocal)
+            os.rename(tmplocal, local)
+    except (IOError, OSError), err:
+        sys.stderr.write("Failed to copy bundle %s to %s, running from the bundle: %s\n" % (bundle, tmpdir, err))
+        return None
+    return local
+
+
+def restart(bundle, args):
+    """Restart the interpreter from bundle with args (does not return)"""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.execv(sys.executable, [sys.executable, bundle] + list(args))
+
+
+def retitle(code, filename):
+    """code (and the code objects in it) with co_filename filename"""
+    consts = tuple([retitle(x, filename) if isinstance(x, types.CodeType) else x for x in code.co_consts])
+    return types.CodeType(code.co_argcount, code.co_nlocals, code.co_stacksize, code.co_flags, code.co_code, consts,
+                          code.co_names, code.co_varnames, filename, code.co_name, code.co_firstlineno,
+                          code.co_lnotab, code.co_freevars, code.co_cellvars)
+
+
+class BundleImporter(zipimport.zipimporter):
+    """zipimporter that sets the filename of the code to the source in the archive
+        python2 zipimport keeps the filename of the build, so inspect (eg in every fancylogger getLogger)
+        can't map frames to their module and scans all modules for every frame
+    """
+    def get_code(self, fullname):
+        """The code object of module fullname"""
+        code = super(BundleImporter, self).get_code(fullname)
+        return retitle(code, os.path.splitext(self.get_filename(fullname))[0] + '.py')
+
+    def load_module(self, fullname):
+        """Load module fullname from the archive"""
+        code = self.get_code(fullname)
+        filename = self.get_filename(fullname)
+        module = sys.modules.setdefault(fullname, imp.new_module(fullname))
+        module.__file__ = filename
+        module.__loader__ = self
+        if self.is_package(fullname):
+            module.__path__ = [os.path.dirname(filename)]
+        try:
+            exec code in module.__dict__
+        except:
+            del sys.modules[fullname]
+            raise
+        return sys.modules[fullname]
+
+
+def install(bundle, packages=None):
+    """Import from bundle with the BundleImporter
+        and look up namespace packages (default BUNDLE_PACKAGES) that were set up before the bundle
+        (eg vsc, by site) in the bundle first
+    """
+    bundle = os.path.abspath(bundle)
+
+    def hook(path):
+        if not path.startswith(bundle):
+            raise ImportError("Not in bundle %s" % bundle)
+        return BundleImporter(path)
+
+    sys.path_hooks.insert(0, hook)
+    for path in sys.path_importer_cache.keys():
+        if path.startswith(bundle):
+            del sys.path_importer_cache[path]
+
+    if packages is None:
+        packages = BUNDLE_PACKAGES
+    for name in packages:
+        module = sys.modules.get(name, None)
+        path = os.path.join(bundle, name)
+        if module is not None and not path in getattr(module, '__path__', [path]):
+            module.__path__.insert(0, path)
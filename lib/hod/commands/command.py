@@ -32,9 +32,13 @@ TODO: acutally use vsc.utils.run here
 
 @author: Jens Timmerman, Stijn De Weirdt
 """
+from collections import deque
 from subprocess import Popen, PIPE
-import datetime
+import errno
 import os
+import re
+import select
+import shlex
 import signal
 import time
 
@@ -42,6 +46,72 @@ from vsc import fancylogger
 
 
 COMMAND_TIMEOUT = 120  # timeout
+COMMAND_KILL_DELAY = 5  # seconds between SIGTERM and SIGKILL of a command that timed out
+COMMAND_OUTPUT_LIMIT = 1024 * 1024  # bytes of stdout and of stderr that are kept (the tail)
+COMMAND_READ_SIZE = 64 * 1024
+# the exit of a process is only noticed through its output pipes closing;
+# if a (daemonised) child keeps them open, check for exit with this interval (s) at most
+COMMAND_EXIT_POLL_MIN = 0.001
+COMMAND_EXIT_POLL_MAX = 0.5
+
+# commands with any of these need /bin/sh (quoting, expansion, redirection, ...)
+SHELL_METACHARACTERS = re.compile(r"[|&;<>()$`\\\"'*?\[\]#~\n]")
+SHELL_ASSIGNMENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*=")
+SHELL_BUILTINS = ['.', ':', '!', '{', 'alias', 'case', 'cd', 'eval', 'exec', 'exit', 'export', 'for', 'if',
+                  'read', 'set', 'shift', 'source', 'trap', 'ulimit', 'umask', 'unset', 'until', 'wait', 'while']
+
+
+class OutputBuffer(object):
+    """Bounded buffer that keeps the tail of a stream"""
+    def __init__(self, limit=COMMAND_OUTPUT_LIMIT):
+        self.limit = limit
+        self.chunks = deque()
+        self.size = 0
+        self.dropped = 0  # number of bytes no longer in the buffer
+
+    def append(self, data):
+        """Add data, drop whole chunks from the head that are not needed for the tail"""
+        self.chunks.append(data)
+        self.size += len(data)
+        while len(self.chunks) > 1 and self.size - len(self.chunks[0]) >= self.limit:
+            old = self.chunks.popleft()
+            self.size -= len(old)
+            self.dropped += len(old)
+
+    def truncated(self):
+        """Was any of the stream dropped"""
+        return self.dropped > 0 or self.size > self.limit
+
+    def getvalue(self):
+        txt = ''.join(self.chunks)
+        if len(txt) > self.limit:
+            txt = txt[-self.limit:]
+        return txt
+
+
+class CommandResult(object):
+    """The outcome of running a Command"""
+    def __init__(self, command, pid=None, exitcode=None, out='', err='', walltime=0.0,
+                 timedout=False, killed=False, truncated=False):
+        self.command = command
+        self.pid = pid
+        self.exitcode = exitcode  # negative N: terminated by signal N
+        self.out = out
+        self.err = err
+        self.walltime = walltime  # in seconds
+        self.timedout = timedout  # SIGTERM was sent after timeout
+        self.killed = killed  # SIGKILL was sent after the SIGTERM did not stop the process
+        self.truncated = truncated  # out or err only contain the tail of the output
+
+    def is_ok(self):
+        """Exited with 0 and did not time out"""
+        return self.exitcode == 0 and not self.timedout
+
+    def __str__(self):
+        txt = "cmd %s pid %s exitcode %s walltime %.3fs" % (self.command, self.pid, self.exitcode, self.walltime)
+        if self.timedout:
+            txt += " timedout (killed %s)" % self.killed
+        return txt
 
 
 class Command(object):
@@ -50,17 +120,26 @@ class Command(object):
     this will have to be extended
     '''
 
-    def __init__(self, command=None, timeout=COMMAND_TIMEOUT):
+    def __init__(self, command=None, timeout=COMMAND_TIMEOUT, shell=None):
         '''
         Constructor
-        command is a string representing the command to be run
+        command is a string representing the command to be run, or a list with the arguments
+        shell: True to always run the command through /bin/sh, False to never do so;
+               None (the default) only uses /bin/sh when the command needs it (see argv)
         '''
         self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
         self.command = command
         self.timeout = timeout
+        self.shell = shell
+        self.kill_delay = COMMAND_KILL_DELAY
+        self.output_limit = COMMAND_OUTPUT_LIMIT
 
         self.fake_pty = False
 
+        self.env = None  # environment to run the command with (None: inherit)
+
+        self.result = None  # CommandResult of last run
+
     def __str__(self):
         cmd = self.getCommand()
         if type(cmd) in (tuple, list,):
@@ -79,20 +158,85 @@ class Command(object):
         """
         return self.command
 
+    def argv(self):
+        """
+        Return the argument list to execute directly, or None if the command has to run through /bin/sh
+        (when shell mode is set, or when the command uses shell features or builtins)
+        """
+        if self.shell:
+            return None
+
+        cmd = self.getCommand()
+        if type(cmd) in (tuple, list,):
+            args = ["%s" % x for x in cmd]
+            needs_shell = any([SHELL_METACHARACTERS.search(x) for x in args])
+        else:
+            cmd = "%s" % cmd
+            needs_shell = SHELL_METACHARACTERS.search(cmd) is not None
+            if needs_shell:
+                try:
+                    args = shlex.split(cmd)
+                except ValueError:
+                    args = [cmd]  # unbalanced quotes; only the shell can make sense of it
+            else:
+                args = cmd.split()
+
+        if not args or args[0] in SHELL_BUILTINS or SHELL_ASSIGNMENT.search(args[0]):
+            needs_shell = True
+
+        if not needs_shell:
+            return args
+        elif self.shell is False and args:
+            self.log.warning("cmd %s uses shell features, but shell mode is disabled. Running it directly." % cmd)
+            return args
+        else:
+            return None
+
     def run(self):
         """
         Run commands
+        Returns (out, err); the complete outcome is set as self.result (a CommandResult)
         """
         if self.command is None:
             self.log.error("No command set")
             return
 
         self.log.debug("Run going to run %s" % self.command)
-        start = datetime.datetime.now()
+        self.result = self._execute()
+
+        if self.fake_pty:
+            # # no stdout/stderr
+            self.log.debug("No stdout/stderr in fake pty mode")
+            out = 'Fake PTY no out (this is ok)'
+            err = 'Fake PTY no err (this is ok)'
+        else:
+            out = self.result.out
+            err = self.result.err
+
+        ec = self.result.exitcode
+        if self.result.timedout:
+            self.log.warning("Timeout occured with cmd %s. took more than %s secs to complete (%s)." % (self.command, self.timeout, self.result))
+        if not ec == 0:
+            self.log.warning("Problem occured with cmd %s: out %s, err %s" % (self.command, out, err))
+            err += "Exitcode %s\n" % ec
+        else:
+            self.log.debug("cmd ok %s: out %s err %s (%s)" % (self.command, out, err, self.result))
+        return out, err
+
+    def _execute(self):
+        """
+        Start the process and wait for it, without fixed sleeps:
+            output is drained as soon as the pipes are readable (so a chatty command can't block on a full pipe)
+            the timeout is enforced with SIGTERM, followed by SIGKILL after kill_delay seconds
+        Returns a CommandResult
+        """
+        start = time.time()
 
+        argv = self.argv()
         nameds = {
-            'shell': True,
+            'shell': argv is None,
             'close_fds': True,
+            'env': self.env,
         }
         if self.fake_pty:
             self.log.debug("Setting up PTY")
@@ -111,39 +255,130 @@ class Command(object):
             }
 
         nameds.update(stdouterr)
-        # TODO: (high) buffer overflow here sometimes, check what happens and fix
-        # see easybuild/buildsoft/async
-        p = Popen(self.__str__(), **nameds)
-        time.sleep(.1)  # for immediate answers
-        timedout = False
+        if argv is None:
+            self.log.debug("Running cmd %s through the shell" % self.command)
+            argv = self.__str__()
+        try:
+            p = Popen(argv, **nameds)
+        except OSError, err:
+            # # only when executing directly; the shell would report this with exitcode 126/127
+            if self.fake_pty:
+                os.close(master)
+                os.close(slave)
+            ec = 127
+            if err.errno == errno.EACCES:
+                ec = 126
+            self.log.debug("Failed to execute cmd %s: %s" % (self.command, err))
+            exe = argv
+            if isinstance(argv, list):
+                exe = argv[0]
+            return CommandResult(self.command, exitcode=ec, err="%s: %s" % (exe, err.strerror),
+                                 walltime=time.time() - start)
+
+        out = OutputBuffer(self.output_limit)
+        err = OutputBuffer(self.output_limit)
+        if self.fake_pty:
+            os.close(slave)  # only the child has the slave end now; reading master gives EIO once it is closed
+            streams = {master: out}  # drained to keep the command going, not reported
+        else:
+            streams = {p.stdout.fileno(): out, p.stderr.fileno(): err}
+
+        state = {
+            'deadline': start + self.timeout,
+            'killtime': None,
+            'timedout': False,
+            'killed': False,
+        }
+
+        exit_poll = COMMAND_EXIT_POLL_MIN
+        next_exit_check = start + exit_poll
+        while streams:
+            now = time.time()
+            self._enforce_timeout(p, state, now)
+            if now >= next_exit_check:
+                if p.poll() is not None:
+                    self.log.debug("cmd %s exited, but its output is still open (held by child process?)" % self.command)
+                    self._read_streams(p, streams, 0)
+                    break
+                exit_poll = min(exit_poll * 2, COMMAND_EXIT_POLL_MAX)
+                next_exit_check = now + exit_poll
+
+            wakeup = min(next_exit_check, self._next_signal_time(state))
+            self._read_streams(p, streams, max(0, wakeup - now))
+
+        # all output is closed, process is (nearly always) gone
         while p.poll() is None:
-            if os.path.exists("/proc/%s" % (p.pid)):
-                now = datetime.datetime.now()
-                if (now - start).seconds > self.timeout:
-                    if timedout is False:
-                        os.kill(p.pid, signal.SIGTERM)
-                        self.log.debug("Timeout occured with cmd %s. took more than %i secs to complete." % (self.command, self.timeout))
-                        timedout = True
-                    else:
-                        os.kill(p.pid, signal.SIGKILL)
-            time.sleep(1)
+            now = time.time()
+            self._enforce_timeout(p, state, now)
+            wakeup = min(now + exit_poll, self._next_signal_time(state))
+            time.sleep(max(0, wakeup - now))
+            exit_poll = min(exit_poll * 2, COMMAND_EXIT_POLL_MAX)
 
         if self.fake_pty:
-            # # no stdout/stderr
-            self.log.debug("No stdout/stderr in fake pty mode")
-            out = 'Fake PTY no out (this is ok)'
-            err = 'Fake PTY no err (this is ok)'
+            os.close(master)
         else:
-            out = p.stdout.read().strip()
-            err = p.stderr.read().strip()
-
-        ec = p.returncode
-        if not ec == 0:
-            self.log.warning("Problem occured with cmd %s: out %s, err %s" % (self.command, out, err))
-            err += "Exitcode %s\n"
+            p.stdout.close()
+            p.stderr.close()
+
+        return CommandResult(self.command, pid=p.pid, exitcode=p.returncode,
+                             out=out.getvalue().strip(), err=err.getvalue().strip(),
+                             walltime=time.time() - start,
+                             timedout=state['timedout'], killed=state['killed'],
+                             truncated=out.truncated() or err.truncated())
+
+    def _read_streams(self, p, streams, timeout):
+        """Wait at most timeout seconds for any of the streams to become readable, read what is available.
+           Closed streams are removed from streams."""
+        try:
+            ready, _, _ = select.select(streams.keys(), [], [], timeout)
+        except select.error, err:
+            if err.args[0] == errno.EINTR:
+                return
+            raise
+
+        for fd in ready:
+            try:
+                data = os.read(fd, COMMAND_READ_SIZE)
+            except OSError, err:
+                if err.errno == errno.EIO:  # pty: slave end closed
+                    data = ''
+                elif err.errno == errno.EINTR:
+                    continue
+                else:
+                    raise
+            if data:
+                streams[fd].append(data)
+            else:
+                del streams[fd]
+
+    def _next_signal_time(self, state):
+        """Time at which _enforce_timeout will send the next signal (infinity when done signalling)"""
+        if not state['timedout']:
+            return state['deadline']
+        elif not state['killed']:
+            return state['killtime']
         else:
-            self.log.debug("cmd ok %s: out %s err %s" % (self.command, out, err))
-        return out, err
+            return float('inf')
+
+    def _enforce_timeout(self, p, state, now):
+        """SIGTERM the process after the timeout, SIGKILL it kill_delay seconds later"""
+        sig = None
+        if not state['timedout'] and now >= state['deadline']:
+            self.log.debug("Timeout occured with cmd %s. took more than %i secs to complete. Sending SIGTERM." % (self.command, self.timeout))
+            state['timedout'] = True
+            state['killtime'] = now + self.kill_delay
+            sig = signal.SIGTERM
+        elif state['timedout'] and not state['killed'] and now >= state['killtime']:
+            self.log.debug("cmd %s still running %s secs after SIGTERM. Sending SIGKILL." % (self.command, self.kill_delay))
+            state['killed'] = True
+            sig = signal.SIGKILL
+
+        if sig is not None:
+            try:
+                os.kill(p.pid, sig)
+            except OSError, err:
+                if err.errno != errno.ESRCH:  # already gone
+                    raise
 
 
 # # Some basic non-hadoop commands
@@ -156,6 +391,13 @@ class IpAddrShow(Command):
         self.command = [ipCommand, "addr", "show"]
 
 
+class QstatFull(Command):
+    """Run qstat -f for jobid (eg for the walltime of the job)"""
+    def __init__(self, jobid):
+        Command.__init__(self)
+        self.command = ['qstat', '-f', jobid]
+
+
 class JavaCommand(Command):
     def __init__(self, opt):
         Command.__init__(self)
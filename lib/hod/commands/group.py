@@ -0,0 +1,188 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Run groups of commands concurrently
+
+@author: Stijn De Weirdt
+"""
+import threading
+import time
+
+from vsc import fancylogger
+
+
+COMMANDGROUP_MAXWORKERS = 4
+
+# command states
+WAITING = 'waiting'
+RUNNING = 'running'
+DONE = 'done'
+SKIPPED = 'skipped'
+
+
+class CommandGroup(object):
+    """
+    A set of named commands, each with optional dependencies (names of other commands in the group).
+    Commands whose dependencies are finished are run concurrently by at most maxworkers threads.
+    """
+    def __init__(self, maxworkers=COMMANDGROUP_MAXWORKERS, strict=False):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+
+        self.maxworkers = maxworkers
+        self.strict = strict  # skip commands when one of their dependencies failed
+
+        self.names = []  # in order of adding; also the order in which ready commands are picked
+        self.commands = {}
+        self.after = {}
+
+        self.state = {}
+        self.results = {}  # name: CommandResult (None when not run or failed to run)
+        self.walltime = None
+
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, command, name=None, after=None, timeout=None):
+        """Add command with name, to be run after the commands named in after. Returns the (unique) name."""
+        if name is None:
+            name = command.__class__.__name__
+        if name in self.commands:
+            name = "%s_%s" % (name, len(self.names))
+        if timeout is not None:
+            command.timeout = timeout
+        if after is None:
+            after = []
+        elif isinstance(after, basestring):
+            after = [after]
+
+        self.names.append(name)
+        self.commands[name] = command
+        self.after[name] = list(after)
+        self.state[name] = WAITING
+        self.log.debug("Added command %s name %s after %s" % (command, name, after))
+        return name
+
+    def check(self):
+        """Check for unknown dependencies and cycles. Returns True when ok."""
+        for name in self.names:
+            unknown = [x for x in self.after[name] if x not in self.commands]
+            if unknown:
+                self.log.error("Command %s depends on unknown commands %s" % (name, unknown))
+                return False
+
+        # remove commands without (remaining) dependencies until nothing is left
+        todo = dict([(name, set(self.after[name])) for name in self.names])
+        while todo:
+            free = [name for name, deps in todo.items() if not deps]
+            if not free:
+                self.log.error("Dependency cycle between commands %s" % todo.keys())
+                return False
+            for name in free:
+                del todo[name]
+            for deps in todo.values():
+                deps.difference_update(free)
+        return True
+
+    def failed(self, name):
+        """Command name was not run or did not end ok"""
+        res = self.results.get(name, None)
+        return res is None or not res.is_ok()
+
+    def _next(self):
+        """Return the name of the next command that can run, None if there is none. Call with lock held."""
+        for name in self.names:
+            if self.state[name] == WAITING and all([self.state[x] in (DONE, SKIPPED) for x in self.after[name]]):
+                return name
+        return None
+
+    def _run_one(self, name):
+        """Run a single command, unless a dependency failed in strict mode"""
+        failed_deps = [x for x in self.after[name] if self.failed(x)]
+        if self.strict and failed_deps:
+            self.log.error("Not running command %s: dependencies %s failed" % (name, failed_deps))
+            return SKIPPED, None
+
+        if failed_deps:
+            self.log.warn("Running command %s although dependencies %s failed" % (name, failed_deps))
+
+        command = self.commands[name]
+        try:
+            command.run()
+            result = command.result
+        except Exception:
+            self.log.exception("Failed to run command %s (%s)" % (name, command))
+            result = None
+        self.log.debug("Command %s done: %s" % (name, result))
+        return DONE, result
+
+    def _worker(self):
+        """Pick ready commands until all commands are running or finished"""
+        while True:
+            self._cond.acquire()
+            try:
+                name = self._next()
+                while name is None:
+                    if WAITING not in self.state.values():
+                        return
+                    self._cond.wait()
+                    name = self._next()
+                self.state[name] = RUNNING
+            finally:
+                self._cond.release()
+
+            state, result = self._run_one(name)
+
+            self._cond.acquire()
+            try:
+                self.state[name] = state
+                self.results[name] = result
+                self._cond.notify_all()
+            finally:
+                self._cond.release()
+
+    def run(self):
+        """Run all commands. Returns the dict with results per name."""
+        if not self.check():
+            self.log.error("Not running commands %s" % self.names)
+            return self.results
+
+        start = time.time()
+        nrworkers = max(1, min(self.maxworkers, len(self.names)))
+        self.log.debug("Running %s commands with %s workers" % (len(self.names), nrworkers))
+        if nrworkers == 1:
+            self._worker()
+        else:
+            threads = [threading.Thread(target=self._worker, name="%s-%s" % (self.__class__.__name__, x))
+                       for x in range(nrworkers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.walltime = time.time() - start
+        self.log.debug("Ran %s commands in %.3fs" % (len(self.names), self.walltime))
+        return self.results
@@ -35,8 +35,9 @@ class HadoopCommand(Command):
     def __init__(self, opt):
         Command.__init__(self)
 
-        cmds = ['hadoop', opt]
-        self.command = " ".join(cmds)
+        if not type(opt) in (list, tuple,):
+            opt = [opt]
+        self.command = ['hadoop'] + list(opt)
 
 
 class HadoopVersion(HadoopCommand):
@@ -48,8 +49,9 @@ class HbaseCommand(Command):
     def __init__(self, opt):
         Command.__init__(self)
 
-        cmds = ['hbase', opt]
-        self.command = " ".join(cmds)
+        if not type(opt) in (list, tuple,):
+            opt = [opt]
+        self.command = ['hbase'] + list(opt)
 
 
 class HbaseVersion(HbaseCommand):
@@ -57,6 +59,20 @@ class HbaseVersion(HbaseCommand):
         HbaseCommand.__init__(self, 'version')
 
 
+class HbaseShell(HbaseCommand):
+    """Run the hbase shell script scriptfile"""
+    def __init__(self, scriptfile):
+        HbaseCommand.__init__(self, ['shell', scriptfile])
+        self.shell = False
+
+
+class HbaseBulkLoad(HbaseCommand):
+    """Load the HFiles in hfiles (a directory in HDFS with a subdirectory per family) into table"""
+    def __init__(self, hfiles, table):
+        HbaseCommand.__init__(self, ['org.apache.hadoop.hbase.mapreduce.LoadIncrementalHFiles', hfiles, table])
+        self.shell = False
+
+
 class HadoopDaemon(Command):
     def __init__(self, daemon, hadoopcmd, args=[], start=True, cfg=None):
         Command.__init__(self)
@@ -71,7 +87,9 @@ class HadoopDaemon(Command):
         cmds += [hadoopcmd]
         cmds += args
 
-        self.command = " ".join(cmds)
+        self.command = cmds
+        self.hadoopcmd = hadoopcmd
+        self.start = start
 
 
 class NameNode(HadoopDaemon):
@@ -83,7 +101,93 @@ class NameNode(HadoopDaemon):
 class FormatHdfs(HadoopCommand):
     """Format the DFS filesystem command"""
     def __init__(self):
-        HadoopCommand.__init__(self, 'namenode -format')
+        HadoopCommand.__init__(self, ['namenode', '-format'])
+
+
+class SafemodeGet(HadoopCommand):
+    """Report the HDFS safemode state ('Safe mode is OFF' or 'Safe mode is ON')"""
+    def __init__(self):
+        HadoopCommand.__init__(self, ['dfsadmin', '-safemode', 'get'])
+
+
+class SafemodeEnter(HadoopCommand):
+    """Put HDFS in safemode (read-only)"""
+    def __init__(self):
+        HadoopCommand.__init__(self, ['dfsadmin', '-safemode', 'enter'])
+
+
+class SaveNamespace(HadoopCommand):
+    """Save the HDFS namespace to the name dirs (HDFS has to be in safemode)"""
+    def __init__(self):
+        HadoopCommand.__init__(self, ['dfsadmin', '-saveNamespace'])
+
+
+class JobList(HadoopCommand):
+    """List the running MapReduce jobs (starts with 'N jobs currently running')"""
+    def __init__(self):
+        HadoopCommand.__init__(self, ['job', '-list'])
+
+
+class RefreshQueues(HadoopCommand):
+    """Make the jobtracker reload the queue configuration (mapred-queue-acls.xml, eg the queue states)"""
+    def __init__(self):
+        HadoopCommand.__init__(self, ['mradmin', '-refreshQueues'])
+
+
+class HadoopFsCommand(HadoopCommand):
+    """hadoop fs command; the paths are passed as they are (never through the shell)"""
+    def __init__(self, opt):
+        HadoopCommand.__init__(self, ['fs'] + list(opt))
+        self.shell = False
+
+
+class HadoopLsR(HadoopFsCommand):
+    """Recursive listing of path (major: the major Hadoop version, -lsr before Hadoop 2)"""
+    def __init__(self, path, major=2, output_limit=512 * 1024 * 1024):
+        opt = ['-ls', '-R']
+        if major < 2:
+            opt = ['-lsr']
+        HadoopFsCommand.__init__(self, opt + [path])
+        self.output_limit = output_limit  # the complete listing is needed
+
+
+class HadoopMkdir(HadoopFsCommand):
+    """Make the directories paths and their parents (which -mkdir does without -p before Hadoop 2)"""
+    def __init__(self, paths, major=2):
+        opt = ['-mkdir', '-p']
+        if major < 2:
+            opt = ['-mkdir']
+        HadoopFsCommand.__init__(self, opt + list(paths))
+
+
+class HadoopRm(HadoopFsCommand):
+    """Remove file path from HDFS"""
+    def __init__(self, path):
+        HadoopFsCommand.__init__(self, ['-rm', path])
+
+
+class HadoopPut(HadoopFsCommand):
+    """
+    Copy local file src to dest in HDFS, overwrite dest (eg a partial copy of a previous attempt).
+    Before Hadoop 2, there is no -f and dest has to be removed first (see HadoopRm).
+    """
+    def __init__(self, src, dest, major=2):
+        opt = ['-put', '-f']
+        if major < 2:
+            opt = ['-put']
+        HadoopFsCommand.__init__(self, opt + [src, dest])
+
+
+class HadoopGet(HadoopFsCommand):
+    """Copy src in HDFS to local file dest"""
+    def __init__(self, src, dest):
+        HadoopFsCommand.__init__(self, ['-get', src, dest])
+
+
+class CodecCompress(HadoopCommand):
+    """Compress file fn into target, fn with the extension of a codec (eg data.snappy from data)"""
+    def __init__(self, target):
+        HadoopCommand.__init__(self, ['org.apache.hadoop.io.compress.CompressionCodecFactory', '-in', target])
 
 
 class DataNode(HadoopDaemon):
@@ -0,0 +1,42 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Choices and defaults of the options, shared by the options (hod.config.hodoption) and the modules using them.
+Kept apart, so parsing the options does not import the config of all work, nor the node, walltime and job modules.
+
+@author: Stijn De Weirdt
+"""
+import os
+
+
+COMPRESS_MODES = ['auto', 'benchmark', 'off']  # fastest native codec, fastest codec on this cluster, no compression
+HBASE_WORKLOADS = ['mixed', 'read', 'write']
+
+STORAGE_LAYOUTS = ['striped', 'single']  # data on all local disks, or only on the best one
+STORAGE_WEIGHTINGS = ['none', 'capacity', 'throughput']  # more data directories on the larger or faster disks
+
+DRAIN_LEAD = 900  # seconds to drain the running jobs before the stop
+
+JOBDIR_BASE = os.path.join(os.path.expanduser('~'), '.hod')
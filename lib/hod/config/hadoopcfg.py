@@ -25,6 +25,8 @@
 """
 @author: Stijn De Weirdt
 """
+import ctypes.util
+import glob
 import os
 from os.path import isfile
 import re
@@ -35,6 +37,36 @@ from hod.commands.hadoop import HadoopVersion
 from vsc.utils import fancylogger
 
 
+# # codec: (class, file extension)
+CODECS = {
+    'lz4': ('org.apache.hadoop.io.compress.Lz4Codec', '.lz4'),
+    'snappy': ('org.apache.hadoop.io.compress.SnappyCodec', '.snappy'),
+    'lzo': ('com.hadoop.compression.lzo.LzoCodec', '.lzo_deflate'),
+    'deflate': ('org.apache.hadoop.io.compress.DefaultCodec', '.deflate'),
+    'gzip': ('org.apache.hadoop.io.compress.GzipCodec', '.gz'),
+    'bzip2': ('org.apache.hadoop.io.compress.BZip2Codec', '.bz2'),
+}
+CODECS_FAST = ['lz4', 'snappy', 'lzo']  # fastest first; cheap enough to compress all map output
+# # per codec: the JNI symbol in libhadoop and the system library it needs (None: bundled in libhadoop)
+CODECS_NATIVE = {
+    'lz4': ('Java_org_apache_hadoop_io_compress_lz4', None),
+    'snappy': ('Java_org_apache_hadoop_io_compress_snappy', 'snappy'),
+    'deflate': ('Java_org_apache_hadoop_io_compress_zlib', 'z'),
+    'gzip': ('Java_org_apache_hadoop_io_compress_zlib', 'z'),
+    'bzip2': ('Java_org_apache_hadoop_io_compress_bzip2', 'bz2'),
+}
+_native_codecs = {}  # cache of the native codecs per hadoop home
+
+
+def find_native_lib(dirs, name):
+    """Path of shared library libname.so* in dirs, or the system library name (None if not found)"""
+    for directory in dirs:
+        libs = sorted(glob.glob(os.path.join(directory, "lib%s.so*" % name)))
+        if libs:
+            return libs[0]
+    return ctypes.util.find_library(name)
+
+
 class HadoopCfg:
     """Hadoop cfg class. Environment and xml cfg control"""
     def __init__(self):
@@ -219,6 +251,47 @@ class HadoopCfg:
         self.which_hadoop()
         self.hadoop_version()
 
+    def native_lib_dirs(self):
+        """Directories with the native libraries of hadoop (hadoop 1 has them in a per platform subdirectory)"""
+        dirs = []
+        if self.hadoophome:
+            native = os.path.join(self.hadoophome, 'lib', 'native')
+            dirs = [native] + sorted([x for x in glob.glob(os.path.join(native, '*')) if os.path.isdir(x)])
+        for variable in ('JAVA_LIBRARY_PATH', 'LD_LIBRARY_PATH'):
+            dirs += [x for x in os.environ.get(variable, '').split(':') if x and not x in dirs]
+        return dirs
+
+    def native_codecs(self):
+        """
+        The codecs (see CODECS) with native support in this hadoop: the JNI code in libhadoop and the library it uses.
+        The result is cached per hadoop home.
+        """
+        if self.hadoophome in _native_codecs:
+            return _native_codecs[self.hadoophome]
+
+        dirs = self.native_lib_dirs()
+        codecs = []
+        libhadoop = find_native_lib(dirs, 'hadoop')
+        if libhadoop and os.path.isfile(libhadoop):
+            symbols = open(libhadoop, 'rb').read()
+            for codec, (symbol, lib) in sorted(CODECS_NATIVE.items()):
+                if symbol in symbols and (lib is None or find_native_lib(dirs, lib)):
+                    codecs.append(codec)
+        else:
+            self.log.warn("No native hadoop library found in %s, only java codecs" % dirs)
+
+        # # hadoop-lzo: own native library and jar
+        jars = []
+        if self.hadoophome:
+            jars = glob.glob(os.path.join(self.hadoophome, 'lib', '*lzo*.jar'))
+        if jars and find_native_lib(dirs, 'gplcompression'):
+            codecs.append('lzo')
+
+        codecs.sort()
+        self.log.debug("Native codecs %s (libhadoop %s)" % (codecs, libhadoop))
+        _native_codecs[self.hadoophome] = codecs
+        return codecs
+
     def locate_start_stop_daemon(self):
         """Try to locate the start, stop and daemon scripts"""
         startname = "start-%s.sh" % self.name
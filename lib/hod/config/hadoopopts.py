@@ -476,7 +476,7 @@ class HadoopOpts(HadoopCfg):
         ## whitelist
         dest2whitereg = {
             'capacity-scheduler': [r'^mapred\.capacity-scheduler'],
-            'mapred-queue-acls': [r'^mapred\.queue.*?\.acl'],
+            'mapred-queue-acls': [r'^mapred\.queue.*?\.(acl|state)'],
             'hdfs-site': [r'^dfs\.'],
             'mapred-site': [r'^mapred(uce)?\.', r'^jetty\.connector', r'^tasktracker\.', r'^job\.end\.retry\.',
                             r'^hadoop\.job\.history', r'^io\.(sort|map)\.', r'^jobclient\.output\.filter',
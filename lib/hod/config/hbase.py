@@ -30,10 +30,11 @@ HDFS config and options
 
 import re
 import os
-from hod.config.customtypes import Servers, HdfsFs, ParamsDescr, Boolean
+from hod.config.customtypes import Servers, HdfsFs, ParamsDescr, Boolean, Arguments
 
 from hod.config.hadoopopts import HadoopOpts
 from hod.config.hadoopcfg import HadoopCfg
+from hod.config.choices import HBASE_WORKLOADS
 from hod.commands.hadoop import HbaseVersion
 
 
@@ -85,6 +86,18 @@ HBASE_OPTS = ParamsDescr({
 
     'hbase.client.scanner.caching': [100, 'Default 1 is too low'],
 
+    'hfile.block.cache.size': [None, 'Fraction of the regionserver heap for the block cache (reads).'],
+    'hbase.regionserver.global.memstore.upperLimit': [
+        None,
+        'Fraction of the regionserver heap for all memstores (writes); updates block and memstores are flushed'
+        ' above this limit.',
+    ],
+    'hbase.regionserver.global.memstore.lowerLimit': [
+        None,
+        'Fraction of the regionserver heap the forced memstore flushes bring the memstores back to.',
+    ],
+    'hbase.regionserver.handler.count': [None, 'Number of RPC handler threads of the regionserver.'],
+
     # # 'mapred.mapred.child.java.opts':[,'']
 })
 
@@ -98,9 +111,150 @@ HBASE_ENV_OPTS = ParamsDescr({
 
     'HBASE_MANAGE_ZK': [Boolean(True), 'Use HBase ZooKeeper (true) or external one (false)'],
     'HBASE_HEAPSIZE': [None, 'HBase heapsize'],
+    'HBASE_REGIONSERVER_OPTS': [None, 'Java options of the regionserver (heap and garbage collection)'],
 })
 
 
+ZOOKEEPER_QUORUM_SIZES = [1, 3, 5]
+ZOOKEEPER_QUORUM_NODES = [(20, 5), (5, 3)]  # (minimal number of nodes, quorum size) for the automatic quorum size
+ZOOKEEPER_MYID = 'myid'
+
+
+def zookeeper_quorum_size(nodes, requested=0):
+    """
+    Number of zookeeper quorum members for nodes: requested (one of ZOOKEEPER_QUORUM_SIZES) or picked from
+    ZOOKEEPER_QUORUM_NODES, but never more than the nodes without the master (unless there is only one)
+    """
+    if requested in ZOOKEEPER_QUORUM_SIZES:
+        size = requested
+    else:
+        size = ([x[1] for x in ZOOKEEPER_QUORUM_NODES if nodes >= x[0]] + [1])[0]
+    available = max(nodes - 1, 1)
+    return max([x for x in ZOOKEEPER_QUORUM_SIZES if x <= min(size, available)])
+
+
+def zookeeper_ranks(size, masterrank, quorum, racks=None):
+    """
+    The ranks of the quorum members: not the master rank (with the hbase master, namenode and jobtracker), spread
+    evenly over the other ranks and round robin over their racks (racks: the rack of each rank, if known)
+    """
+    candidates = [x for x in range(size) if x != masterrank] or [masterrank]
+    if racks:
+        perrack = {}
+        order = []
+        for rank in candidates:
+            if not racks[rank] in perrack:
+                order.append(racks[rank])
+            perrack.setdefault(racks[rank], []).append(rank)
+        candidates = []
+        while any(perrack.values()):
+            candidates += [perrack[x].pop(0) for x in order if perrack[x]]
+        return sorted(candidates[:quorum])
+    step = float(len(candidates)) / quorum
+    return sorted(set([candidates[int(x * step)] for x in range(quorum)]))
+
+
+# # fraction of the regionserver heap for (block cache, memstore upper limit, memstore lower limit) per workload;
+# # hbase refuses to start when the block cache and the memstore upper limit take more than 80% of the heap
+HBASE_HEAP_SPLIT = {
+    'read': (0.55, 0.25, 0.2),
+    'mixed': (0.4, 0.4, 0.35),
+    'write': (0.25, 0.55, 0.5),
+}
+HBASE_HANDLERS_PER_CORE = {'read': 8, 'mixed': 5, 'write': 3}  # writes hold their payload in the heap
+HBASE_HANDLERS_MIN = 10  # the hbase default
+HBASE_HANDLERS_MAX = 200
+HBASE_HANDLER_HEAP = 32  # MB of regionserver heap per handler for the requests in flight
+HBASE_HEAP_MIN = 1024  # MB
+HBASE_HEAP_MAX = 31 * 1024  # MB, largest heap with compressed object pointers (and bearable CMS pauses)
+HBASE_OS_RESERVE = (0.1, 1024)  # (fraction, minimum MB) of the memory kept for the OS and the page cache
+HBASE_DAEMON_HEAP = 1000  # MB, HBASE_HEAPSIZE for the hbase master and zookeeper
+HBASE_NEWGEN = (1.0 / 8, 128, 1024)  # (fraction of the heap, minimum MB, maximum MB) of the young generation
+
+MB = 1024 ** 2
+
+
+def java_heap(opts):
+    """The maximum heap in MB set with -Xmx in the java options opts (None if not set)"""
+    reg = re.search(r"-Xmx(\d+)([kKmMgG]?)", "%s" % opts)
+    if not reg:
+        return None
+    size, unit = int(reg.group(1)), reg.group(2).lower()
+    return {'k': size / 1024, 'm': size, 'g': size * 1024}.get(unit, size / MB)
+
+
+def regionserver_heap(memory, colocated):
+    """
+    (heap in MB, reason) of the regionserver on a node with memory MB: what remains after HBASE_OS_RESERVE
+    and the heaps of the colocated daemons (list of (name, MB)), between HBASE_HEAP_MIN and HBASE_HEAP_MAX
+    """
+    reserve = max(int(memory * HBASE_OS_RESERVE[0]), HBASE_OS_RESERVE[1])
+    used = sum([x[1] for x in colocated])
+    heap = memory - reserve - used
+    reason = "%d MB memory - %d MB for the OS" % (memory, reserve)
+    if colocated:
+        reason += " - %s" % " - ".join(["%d MB %s" % (x[1], x[0]) for x in colocated])
+    if heap > HBASE_HEAP_MAX:
+        reason += ", at most %d MB" % HBASE_HEAP_MAX
+    elif heap < HBASE_HEAP_MIN:
+        reason += ", at least %d MB (the node is overcommitted)" % HBASE_HEAP_MIN
+    return min(max(heap, HBASE_HEAP_MIN), HBASE_HEAP_MAX), reason
+
+
+def regionserver_handlers(cores, heap, workload):
+    """
+    (handler count, reason): HBASE_HANDLERS_PER_CORE of the workload, no more than the heap can hold requests
+    for (HBASE_HANDLER_HEAP per handler), between HBASE_HANDLERS_MIN and HBASE_HANDLERS_MAX
+    """
+    handlers = min(cores * HBASE_HANDLERS_PER_CORE[workload], heap / HBASE_HANDLER_HEAP)
+    handlers = min(max(handlers, HBASE_HANDLERS_MIN), HBASE_HANDLERS_MAX)
+    reason = "%d per core for %s workload on %d cores, %d MB heap per handler, between %d and %d" % \
+        (HBASE_HANDLERS_PER_CORE[workload], workload, cores, HBASE_HANDLER_HEAP, HBASE_HANDLERS_MIN,
+         HBASE_HANDLERS_MAX)
+    return handlers, reason
+
+
+def regionserver_gc(heap, blockcache, lowerlimit):
+    """
+    (java options, reason) for a regionserver with heap MB: fixed heap, CMS with a young generation of
+    HBASE_NEWGEN and the concurrent collection starting when the old generation fills past the block cache and
+    the flushed memstores (the long lived data), before the memstores reach their upper limit
+    """
+    newgen = min(max(int(heap * HBASE_NEWGEN[0]), HBASE_NEWGEN[1]), HBASE_NEWGEN[2])
+    occupancy = min(int(round((blockcache + lowerlimit) * 100)) + 5, 90)
+    opts = Arguments([
+        '-Xms%dm' % heap, '-Xmx%dm' % heap, '-Xmn%dm' % newgen,
+        '-XX:+UseParNewGC', '-XX:+UseConcMarkSweepGC', '-XX:+CMSParallelRemarkEnabled',
+        '-XX:CMSInitiatingOccupancyFraction=%d' % occupancy, '-XX:+UseCMSInitiatingOccupancyOnly',
+    ])
+    reason = "%d MB young generation, CMS starts at %d%% (block cache + memstore lower limit + 5%%)" % \
+        (newgen, occupancy)
+    return opts, reason
+
+
+def regionserver_sizing(memory, colocated, cores, workload='mixed'):
+    """
+    The regionserver params and env params (ParamsDescr, with the derivation as description) for a node with
+    memory MB, the colocated daemon heaps (list of (name, MB)), cores and the workload (one of HBASE_WORKLOADS)
+    """
+    if not workload in HBASE_HEAP_SPLIT:
+        workload = HBASE_WORKLOADS[0]
+    heap, heap_reason = regionserver_heap(memory, colocated)
+    blockcache, upperlimit, lowerlimit = HBASE_HEAP_SPLIT[workload]
+    split_reason = "%s workload: %d%% block cache, %d%% memstore of the %d MB heap" % \
+        (workload, blockcache * 100, upperlimit * 100, heap)
+    handlers, handlers_reason = regionserver_handlers(cores, heap, workload)
+    opts, gc_reason = regionserver_gc(heap, blockcache, lowerlimit)
+
+    return ParamsDescr({
+        'hfile.block.cache.size': [blockcache, split_reason],
+        'hbase.regionserver.global.memstore.upperLimit': [upperlimit, split_reason],
+        'hbase.regionserver.global.memstore.lowerLimit': [lowerlimit, split_reason],
+        'hbase.regionserver.handler.count': [handlers, handlers_reason],
+        'HBASE_REGIONSERVER_OPTS': [opts, "heap %d MB: %s; %s" % (heap, heap_reason, gc_reason)],
+    })
+
+
 class HbaseCfg(HadoopCfg):
     """Hbase cfg"""
     def __init__(self):
@@ -38,6 +38,7 @@ from hod.config.hadoopcfg import HadoopCfg
 HDFS_OPTS = ParamsDescr({
     'dfs.name.dir': [Directories([None]), 'Determines where on the local filesystem the DFS name node should store the name table(fsimage). If this is a comma-delimited list of kindoflist then the name table is replicated in all of the kindoflist, for redundancy. def ${hadoop.tmp.dir}/dfs/name'],
     'dfs.data.dir': [Directories([None]), 'Determines where on the local filesystem an DFS data node should store its blocks. If this is a comma-delimited list of kindoflist, then data will be stored in all named kindoflist, typically on different devices. Directories that do not exist are ignored. def ${hadoop.tmp.dir}/dfs/data'],
+    'dfs.datanode.du.reserved': [None, 'Reserved space in bytes per volume. Always leave this much space free for non dfs use.'],
 
     'dfs.datanode.address': [HostnamePort(':50090'), 'The address where the datanode server will listen to. If the port is 0 then the server will start on a free port.'],
     'dfs.datanode.ipc.address': [HostnamePort(':50020'), 'The datanode ipc server address and port. If the port is 0 then the server will start on a free port.'],
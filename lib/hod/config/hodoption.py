@@ -30,6 +30,9 @@ import os
 
 from vsc.utils.generaloption import GeneralOption
 
+from hod.config.choices import COMPRESS_MODES, DRAIN_LEAD, HBASE_WORKLOADS, JOBDIR_BASE
+from hod.config.choices import STORAGE_LAYOUTS, STORAGE_WEIGHTINGS
+
 
 class HodOption(GeneralOption):
     def rm_options(self):
@@ -52,6 +55,7 @@ class HodOption(GeneralOption):
         """Make the action related options"""
         opts = {"create": ("Create and submit new HOD job", None, "store_true", False, 'C'),
                 "showall": ("Show info on all found HOD jobs (this is the default action)", None, "store_true", True),
+                "show": ("Show info and the live status of HOD job JOBID", "string", "store", ''),
                 # "showjob":("Show info for HOD job JOBID", "string", "store", ''),
                 # "removejob":("Remove HOD job JOBID", "string", "store", ''),
                 }
@@ -65,6 +69,16 @@ class HodOption(GeneralOption):
     def hdfs_options(self):
         """Some hdfs presets"""
         opts = {'off': ("Don't start HDFS", None, "store_true", False),
+                'persistent': ("Keep HDFS for the next jobs: the namenode data in this shared directory, "
+                               "the blocks on the local disks", "string", "store", ''),
+                'persistent-force': ("Start the persistent HDFS also when its manifest is of a job that is not known "
+                                     "to be gone", None, "store_true", False),
+                'dataset-size': ("Size (in GB) of the dataset, to pick the replication and the block size", "int",
+                                 "store", 0),
+                'stage-in': ("Copy SRC on the shared filesystem to DEST in HDFS with all nodes once HDFS is ready "
+                             "(comma separated SRC:DEST)", "strlist", "store", []),
+                'stage-out': ("Copy SRC in HDFS to DEST on the shared filesystem with all nodes before HDFS is stopped "
+                              "(comma separated SRC:DEST)", "strlist", "store", []),
                 }
         descr = ['HDFS', 'Provide HDFS related options']
         prefix = 'hdfs'
@@ -75,7 +89,11 @@ class HodOption(GeneralOption):
 
     def mapred_options(self):
         """Some mapred presets"""
-        opts = {'off': ("Don't start MapRed (MR1)", None, "store_true", False)}
+        opts = {'off': ("Don't start MapRed (MR1)", None, "store_true", False),
+                'compress': ("Compress the map output with the fastest native codec (auto, recommended), with the "
+                             "fastest codec in a rough check on the nodes (benchmark) or not (off)", "choice", "store",
+                             COMPRESS_MODES[0], COMPRESS_MODES),
+                }
         descr = ['MapReduce', 'Provide MapReduce (MR1) related options']
         prefix = 'mr1'
 
@@ -99,7 +117,25 @@ class HodOption(GeneralOption):
         opts = {
             'envclass': ("Use HodJob class to create working enviromnet", "string", "store", ""),
             'envscript': ("Use script to create working enviromnet", "string", "store", ""),
+            'envsnapshot': ("Resolve the modules of the job at submission, the job sources the resulting environment",
+                            None, "store_true", True),
             'script': ("Run this script as start of local client screen session", "string", "store", ''),
+            'jobdir': ("Base directory of the per job directories (with eg the control endpoint)", "string", "store",
+                       JOBDIR_BASE),
+            'sample-interval': ("Seconds between resource samples of the nodes and daemons (0 disables sampling)",
+                                "int", "store", 60),
+            'storage-probe': ("MB written to probe the write throughput of the local disks (0 disables the probe)",
+                              "int", "store", 0),
+            'storage-layout': ("Data (HDFS blocks and shuffle) on all local disks or only on the best one", "choice",
+                               "store", STORAGE_LAYOUTS[0], STORAGE_LAYOUTS),
+            'storage-weighting': ("Weigh the mapred local dirs per disk by free space or probed write throughput (HDFS: Hadoop 2 only)",
+                                  "choice", "store", STORAGE_WEIGHTINGS[0], STORAGE_WEIGHTINGS),
+            'topology-map': ("Site switch map: a host (pattern) and its rack (eg /switch1/rack1) per line", "string",
+                             "store", ''),
+            'drain-time': ("Seconds to drain the running jobs before the stop at the end of the walltime", "int",
+                           "store", DRAIN_LEAD),
+            'bundle': ("Start the ranks from this bundle (built with hod_bundle.py), copied to node-local tmp",
+                       "string", "store", ''),
         }
         descr = ['HOD', 'Provide HOD related options']
         prefix = 'hod'
@@ -112,6 +148,12 @@ class HodOption(GeneralOption):
         """Some hbase presets"""
         opts = {'on': ("Start HBase", None, "store_true", False),
                 'module': ("Use HBase module version", "string", "store", "0.90.4-cdh3u3"),
+                'zookeeper-quorum': ("Members of the zookeeper quorum: 1, 3 or 5 (0: by the number of nodes)", "int",
+                                     "store", 0),
+                'workload': ("Read/write mix that sizes the regionserver block cache, memstore and handlers", "choice",
+                             "store", HBASE_WORKLOADS[0], HBASE_WORKLOADS),
+                'tables': ("JSON file with the tables to create pre-split over the regionservers once the hbase master is "
+                           "ready, and the HFiles to bulk load into them", "string", "store", None),
                 }
         descr = ['HBase', 'Provide HBase related options']
         prefix = 'hbase'
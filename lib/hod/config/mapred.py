@@ -52,9 +52,16 @@ MAPRED_OPTS = ParamsDescr({
     'mapred.map.tasks.speculative.exectution': [Boolean(True), 'If true, then multiple instances of some map tasks may be executed in parallel.'],
     'mapred.reduce.tasks.speculative.exectution': [Boolean(True), 'If true, then multiple instances of some reduce tasks may be executed in parallel.'],
     'mapred.reduce.parallel.copies': [5, 'The default number of parallel transfers run by reduce during the copy(shuffle) phase.'],
-    'mapred.compress.map.output': [],
+    'mapred.compress.map.output': [None, 'Compress the map output (the intermediate data of the shuffle).'],
+    'mapred.map.output.compression.codec': [None, 'The codec of the map output.'],
 })
 
+
+def tasktracker_slots(cores):
+    """The (map, reduce) task slots of a tasktracker on a node with cores usable cores"""
+    mapfactor = 2
+    return int(cores / 2), int(mapfactor * 1.75)  # avg 2 cores per map task
+
 MAPRED_SECURITY_SERVICE = ParamsDescr({
     'security.inter.tracker.protocol.acl': [UserGroup(), 'ACL for InterTrackerProtocol, used by the tasktrackers to communicate with the jobtracker.'],
     'security.job.submission.protocol.acl': [UserGroup(), 'ACL for JobSubmissionProtocol, used by job clients to communciate with the jobtracker for job submission, querying job status etc.'],
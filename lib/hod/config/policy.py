@@ -0,0 +1,129 @@
+# #
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+# #
+# #
+"""
+HDFS policy: replication, block size and namenode handlers from the shape of the cluster
+
+The choices are passed to all work as shared params; the reasons end up in the description of the
+params in the generated config.
+
+@author: Stijn De Weirdt
+"""
+import math
+
+from vsc import fancylogger
+
+from hod.config.customtypes import ParamsDescr
+from hod.node import select_storage
+
+
+POLICY_REPLICATION_MAX = 3
+POLICY_CAPACITY_FILL = 0.5  # fraction of the free local disk the replicated dataset may fill (room for output and shuffle)
+POLICY_BLOCK_DEFAULT = 128 * 1024 * 1024
+POLICY_BLOCK_MIN = 64 * 1024 * 1024
+POLICY_BLOCK_MAX = 1024 * 1024 * 1024
+POLICY_BLOCKS_PER_NODE = 32  # blocks (ie map tasks) of the dataset per datanode: a few waves of maps per node
+POLICY_HANDLERS_MIN = 10  # the hadoop default
+POLICY_HANDLERS_MAX = 200
+
+GB = 1024.0 ** 3
+MB = 1024.0 ** 2
+
+_log = fancylogger.getLogger('policy', fname=False)
+
+
+def node_capacity(descr, layout='striped'):
+    """Free bytes on the local disks for data of the node with Node description descr"""
+    storage = descr.get('storage', [])
+    dirs = select_storage(storage, 'data')
+    if layout == 'single':
+        dirs = dirs[:1]
+    free = dict([(x['directory'], x['free']) for x in storage])
+    return sum([free.get(x, 0) for x in dirs])
+
+
+def choose_replication(datanodes, capacity, dataset=0):
+    """
+    (replication, reason): as many replicas as possible (up to POLICY_REPLICATION_MAX, for read parallelism
+    and to survive a lost node), but the replicated dataset has to fit in the free local disk capacity
+    """
+    if datanodes <= 1:
+        return 1, "single datanode"
+    replication = min(datanodes, POLICY_REPLICATION_MAX)
+    reason = "%d datanodes" % datanodes
+    if dataset:
+        fill = capacity * POLICY_CAPACITY_FILL
+        fitting = replication
+        while fitting > 1 and dataset * fitting > fill:
+            fitting -= 1
+        if fitting < replication:
+            reason += ", but %d replicas of the %.0f GB dataset do not fit in %d%% of the %.0f GB free local disk" % \
+                (replication, dataset / GB, POLICY_CAPACITY_FILL * 100, capacity / GB)
+            replication = fitting
+        else:
+            reason += ", %d replicas of the %.0f GB dataset fill %.0f%% of the %.0f GB free local disk" % \
+                (replication, dataset / GB, 100.0 * dataset * replication / max(capacity, 1), capacity / GB)
+    return replication, reason
+
+
+def choose_block_size(datanodes, dataset=0):
+    """
+    (block size, reason): about POLICY_BLOCKS_PER_NODE blocks of the dataset per datanode,
+    a power of 2 between POLICY_BLOCK_MIN and POLICY_BLOCK_MAX
+    """
+    if not dataset:
+        return POLICY_BLOCK_DEFAULT, "dataset size unknown, default %d MB" % (POLICY_BLOCK_DEFAULT / MB)
+    target = float(dataset) / (max(datanodes, 1) * POLICY_BLOCKS_PER_NODE)
+    block = POLICY_BLOCK_MIN
+    while block < target and block < POLICY_BLOCK_MAX:
+        block *= 2
+    reason = "%.0f GB dataset in %d blocks per datanode on %d datanodes" % \
+        (dataset / GB, math.ceil(dataset / float(block) / max(datanodes, 1)), datanodes)
+    return block, reason
+
+
+def choose_namenode_handlers(datanodes):
+    """(handler count, reason): 20 * ln(number of datanodes)"""
+    handlers = int(20 * math.log(max(datanodes, 1)))
+    handlers = min(max(handlers, POLICY_HANDLERS_MIN), POLICY_HANDLERS_MAX)
+    return handlers, "20 * ln(%d datanodes), between %d and %d" % (datanodes, POLICY_HANDLERS_MIN, POLICY_HANDLERS_MAX)
+
+
+def hdfs_policy(datanodes, capacity, dataset=0):
+    """
+    The params (ParamsDescr) for datanodes with a total of capacity bytes free local disk and a dataset
+    of dataset bytes (0 if unknown)
+    """
+    replication, rep_reason = choose_replication(datanodes, capacity, dataset)
+    block, block_reason = choose_block_size(datanodes, dataset)
+    handlers, handlers_reason = choose_namenode_handlers(datanodes)
+    params = ParamsDescr({
+        'dfs.replication': [replication, 'FINAL Default block replication. HOD policy: %s' % rep_reason],
+        'dfs.block.size': [block, 'Default block size for new files. HOD policy: %s' % block_reason],
+        'dfs.namenode.handler.count': [handlers, 'Namenode RPC server threads. HOD policy: %s' % handlers_reason],
+    })
+    _log.info("HDFS policy: replication %s (%s), block size %d MB (%s), namenode handlers %s (%s)" %
+              (replication, rep_reason, block / MB, block_reason, handlers, handlers_reason))
+    return params
@@ -0,0 +1,241 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Control endpoint of a running HOD job
+
+The master listens on a TCP socket; the endpoint (host, port and auth token) is written to the
+job directory, readable only by the user. The protocol is one JSON request line and one JSON reply line
+per connection, eg
+    {"token": "...", "command": "extend", "seconds": 3600}
+    {"ok": true, "command": "extend"}
+
+Each connection is handled in its own thread, so queries (eg status) are answered immediately, also while
+the master is busy (eg starting services). Actions (stop, extend, drain) change the state of the job:
+they are queued for the master (see serve), which passes them to all ranks.
+
+@author: Stijn De Weirdt
+"""
+import Queue
+import binascii
+import json
+import os
+import select
+import socket
+import threading
+
+from vsc import fancylogger
+
+
+CONTROL_ENDPOINT = 'control.json'
+CONTROL_ACTIONS = ['stop', 'extend', 'drain']
+CONTROL_TIMEOUT = 10  # seconds for a client to send its request or for the server to reply
+CONTROL_REQUEST_MAX = 64 * 1024
+CONTROL_STOP_CHECK = 0.5  # seconds between checks of the thread for stop
+
+
+class ControlError(Exception):
+    """Failure to reach the control endpoint or an error reply"""
+
+
+def _read_line(conn, maxsize=None):
+    """Read from conn up to (and without) the first newline"""
+    data = ''
+    while '\n' not in data:
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+        if maxsize is not None and len(data) > maxsize:
+            raise ValueError("Request larger than %s bytes" % maxsize)
+    return data.split('\n', 1)[0]
+
+
+class ControlServer(object):
+    """Control endpoint on the master"""
+    def __init__(self, jobdir):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+
+        self.jobdir = jobdir
+        self.endpoint = os.path.join(jobdir, CONTROL_ENDPOINT)
+        self.token = binascii.hexlify(os.urandom(16))
+        self.sock = None
+        self.queries = {}  # query name: function(request) returning the reply dict (called in the thread)
+        self.actions = Queue.Queue()
+        self._thread = None
+        self._stopping = False
+
+    def add_query(self, name, func):
+        """Answer query name with func(request)"""
+        self.queries[name] = func
+
+    def start(self):
+        """Listen on a free port on all interfaces and write the endpoint file"""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('', 0))
+        self.sock.listen(16)
+        port = self.sock.getsockname()[1]
+
+        endpoint = {
+            'host': socket.getfqdn(),
+            'port': port,
+            'token': self.token,
+            'pid': os.getpid(),
+        }
+        # # the token is the authentication, only the user can read it
+        fd = os.open(self.endpoint, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+        os.write(fd, json.dumps(endpoint))
+        os.close(fd)
+        self.log.info("Control endpoint %s:%s written to %s" % (endpoint['host'], port, self.endpoint))
+
+        self._thread = threading.Thread(target=self._accept, name='control')
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop listening and remove the endpoint file"""
+        self._stopping = True
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        if os.path.exists(self.endpoint):
+            os.remove(self.endpoint)
+
+    def serve(self, timeout):
+        """Wait up to timeout seconds for an action request. Returns it (without token), or None."""
+        try:
+            return self.actions.get(timeout=timeout)
+        except Queue.Empty:
+            return None
+
+    def _accept(self):
+        """Handle the connections until stop"""
+        while not self._stopping:
+            try:
+                ready, _, _ = select.select([self.sock], [], [], CONTROL_STOP_CHECK)
+            except select.error:
+                continue  # EINTR
+            if not ready:
+                continue
+
+            conn, addr = self.sock.accept()
+            # # a slow or stuck client does not hold up the other requests
+            thread = threading.Thread(target=self._serve_conn, args=(conn, addr), name='control %s:%s' % addr[:2])
+            thread.setDaemon(True)
+            thread.start()
+
+    def _serve_conn(self, conn, addr):
+        """Handle the request on connection conn, queue it if it is an action"""
+        action = None
+        try:
+            conn.settimeout(CONTROL_TIMEOUT)
+            action = self.handle(conn, addr)
+        except Exception:
+            self.log.exception("Failed to handle control request from %s" % (addr,))
+        conn.close()
+        if action is not None:
+            self.actions.put(action)
+
+    def handle(self, conn, addr):
+        """Handle one request on conn. Returns the request if it is an action."""
+        action = None
+        try:
+            request = json.loads(_read_line(conn, maxsize=CONTROL_REQUEST_MAX))
+            if not isinstance(request, dict):
+                raise ValueError("Request is not a JSON object")
+        except (ValueError, socket.error), err:
+            self.log.warn("Invalid control request from %s: %s" % (addr, err))
+            reply = {'ok': False, 'error': 'invalid request: %s' % err}
+        else:
+            command = request.pop('command', None)
+            if request.pop('token', None) != self.token:
+                self.log.warn("Control request %s from %s with invalid token" % (command, addr))
+                reply = {'ok': False, 'error': 'invalid token'}
+            elif command in CONTROL_ACTIONS:
+                reply = self.check_action(command, request)
+                if reply['ok']:
+                    self.log.info("Control action %s %s from %s" % (command, request, addr))
+                    request['command'] = command
+                    action = request
+            elif command in self.queries:
+                try:
+                    reply = self.queries[command](request)
+                    reply.setdefault('ok', True)
+                except Exception, err:
+                    self.log.exception("Control query %s failed" % command)
+                    reply = {'ok': False, 'error': 'query %s failed: %s' % (command, err)}
+            else:
+                reply = {'ok': False, 'error': 'unknown command %s (known: %s)' %
+                         (command, ', '.join(CONTROL_ACTIONS + sorted(self.queries.keys())))}
+            reply['command'] = command
+
+        try:
+            conn.sendall(json.dumps(reply) + '\n')
+        except socket.error, err:
+            self.log.warn("Failed to reply to control request from %s: %s" % (addr, err))
+        return action
+
+    def check_action(self, command, request):
+        """Validate the arguments of action command"""
+        if command == 'extend':
+            try:
+                request['seconds'] = int(request.get('seconds', None))
+            except (TypeError, ValueError):
+                return {'ok': False, 'error': 'extend needs an integer number of seconds'}
+        return {'ok': True}
+
+
+def read_endpoint(jobdir):
+    """The endpoint dict of the job in jobdir"""
+    fn = os.path.join(jobdir, CONTROL_ENDPOINT)
+    try:
+        return json.loads(open(fn).read())
+    except (IOError, ValueError), err:
+        raise ControlError("No valid control endpoint %s: %s" % (fn, err))
+
+
+def control_request(jobdir, command, **kwargs):
+    """Send command (with kwargs as arguments) to the job in jobdir, return the reply dict"""
+    endpoint = read_endpoint(jobdir)
+    request = dict(kwargs)
+    request.update({'command': command, 'token': endpoint['token']})
+
+    try:
+        conn = socket.create_connection((endpoint['host'], endpoint['port']), CONTROL_TIMEOUT)
+    except socket.error, err:
+        raise ControlError("Failed to connect to control endpoint %s:%s: %s" % (endpoint['host'], endpoint['port'], err))
+    try:
+        conn.sendall(json.dumps(request) + '\n')
+        reply = _read_line(conn)
+    finally:
+        conn.close()
+
+    try:
+        return json.loads(reply)
+    except ValueError:
+        raise ControlError("Invalid reply %r from control endpoint" % reply)
@@ -0,0 +1,188 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+The work types HOD can distribute, and how they depend on each other
+
+Every entry of WORK_REGISTRY declares a work type:
+    name: the name of the work (the name of its class)
+    work: the import path of the work class (module.class); only imported on the ranks that run the work
+    options: (option, value) pairs that all have to hold for the work to be started
+    provides: the shared params the work sets for the others (eg the namenode address)
+    needs: the shared params the work can't do without; the shared params of their providers are passed on
+    uses: the work whose configuration it picks up if it is there (eg the hbase jars for mapred)
+    ready: the work that has to be ready (if it is there) before this work starts
+    placement: the HadoopMaster method that returns the master rank and all ranks of the work
+    shared: the HadoopMaster method that returns the shared dict of the work for its master rank
+
+resolve orders the enabled work such that every work comes after the work it needs and uses, and
+groups it in start waves: all work of a wave starts together, once the work of the previous waves is ready.
+
+Other packages add work types with an entry point in the WORK_ENTRY_POINTS group that loads the registry
+entry (a dict as above), eg in their setup.py
+    entry_points={'hod.work': ['Spark = hodspark.registry:SPARK_ENTRY']}
+
+@author: Stijn De Weirdt
+"""
+import sys
+
+from vsc import fancylogger
+
+
+WORK_ENTRY_POINTS = 'hod.work'
+WORK_ENTRY_KEYS = ['name', 'work', 'options', 'provides', 'needs', 'uses', 'ready', 'placement', 'shared']
+SERVICES = ['Hdfs', 'Hbase', 'Mapred']
+WORK_REGISTRY = [
+    {'name': 'Hdfs', 'work': 'hod.work.hdfs.Hdfs', 'options': [('hdfs_off', False)],
+     'provides': ['fs.default.name'], 'needs': [], 'uses': [], 'ready': [],
+     'placement': 'select_hdfs_ranks', 'shared': 'shared_Hdfs'},
+    {'name': 'Hbase', 'work': 'hod.work.hbase.Hbase', 'options': [('hbase_on', True)],
+     'provides': [], 'needs': ['fs.default.name'], 'uses': [], 'ready': ['Hdfs'],
+     'placement': 'select_hbasemaster_ranks', 'shared': 'shared_Hbase'},
+    {'name': 'Mapred', 'work': 'hod.work.mapred.Mapred', 'options': [('mr1_off', False), ('yarn_on', False)],
+     'provides': ['mapred.job.tracker'], 'needs': ['fs.default.name'], 'uses': ['Hbase'], 'ready': ['Hdfs'],
+     'placement': 'select_mapred_ranks', 'shared': 'shared_Mapred'},
+    {'name': 'LocalClient', 'work': 'hod.work.client.LocalClient', 'options': [],
+     'provides': [], 'needs': [], 'uses': SERVICES, 'ready': SERVICES,
+     'placement': 'select_client_ranks', 'shared': 'shared_LocalClient'},
+    {'name': 'RemoteClient', 'work': 'hod.work.client.RemoteClient', 'options': [],
+     'provides': [], 'needs': [], 'uses': SERVICES, 'ready': SERVICES,
+     'placement': 'select_client_ranks', 'shared': 'shared_RemoteClient'},
+]
+
+
+_log = fancylogger.getLogger('distribution', fname=False)
+
+
+def work_name(work):
+    """The name of work, a work class or its import path"""
+    if isinstance(work, basestring):
+        return work.split('.')[-1]
+    return work.__name__
+
+
+def work_class(work):
+    """The work class of work, a work class or its import path (imports its module)"""
+    if isinstance(work, basestring):
+        modname, name = work.rsplit('.', 1)
+        __import__(modname)
+        return getattr(sys.modules[modname], name)
+    return work
+
+
+def plugin_entries():
+    """The registry entries of the WORK_ENTRY_POINTS entry points of the installed packages"""
+    try:
+        import pkg_resources  # slow to import and scans all of sys.path: only when the distribution is made
+    except ImportError:
+        return []
+    entries = []
+    for entry_point in pkg_resources.iter_entry_points(WORK_ENTRY_POINTS):
+        try:
+            entry = entry_point.load()
+        except Exception, err:
+            _log.error("Failed to load work entry point %s: %s" % (entry_point, err))
+            continue
+        missing = [x for x in WORK_ENTRY_KEYS if not x in entry]
+        if missing:
+            _log.error("Invalid work entry point %s: no %s" % (entry_point, missing))
+            continue
+        entries.append(entry)
+    return entries
+
+
+def work_registry():
+    """WORK_REGISTRY and the work of the plugins (a plugin can't replace the work of the registry)"""
+    registry = list(WORK_REGISTRY)
+    names = [x['name'] for x in registry]
+    for entry in plugin_entries():
+        if entry['name'] in names:
+            _log.error("Plugin work %s (%s) ignored: already in the registry" % (entry['name'], entry['work']))
+            continue
+        _log.debug("Plugin work %s (%s)" % (entry['name'], entry['work']))
+        registry.append(entry)
+        names.append(entry['name'])
+    return registry
+
+
+def enabled_work(registry, options):
+    """The entries of registry with all their (option, value) pairs set in options"""
+    return [x for x in registry if all([getattr(options, opt) == value for opt, value in x['options']])]
+
+
+def providers(entries):
+    """Map of the shared params to the name of the entry that provides them"""
+    provided = {}
+    for entry in entries:
+        for param in entry['provides']:
+            provided[param] = entry['name']
+    return provided
+
+
+def dependencies(entry, entries):
+    """The names of the entries (of entries) that entry needs, uses or waits for"""
+    present = [x['name'] for x in entries]
+    provided = providers(entries)
+    deps = [provided[x] for x in entry['needs'] if x in provided]
+    deps += [x for x in entry['uses'] + entry['ready'] if x in present]
+    return sorted(set(deps) - set([entry['name']]))
+
+
+def resolve(entries):
+    """
+    (ordered entries, start waves, dropped) for the enabled entries:
+        the entries in the order of the dependencies (registry order otherwise)
+        start waves: map of name to the start wave, one after the waves of the work it waits for
+        dropped: (name, reason) of the entries that miss a needed param or have cyclic dependencies
+    """
+    dropped = []
+    entries = list(entries)
+    missing = True
+    while missing:
+        provided = providers(entries)
+        missing = [(x, [p for p in x['needs'] if not p in provided]) for x in entries]
+        missing = [(x, params) for x, params in missing if params]
+        for entry, params in missing:
+            dropped.append((entry['name'], "no work provides %s" % params))
+            entries.remove(entry)
+
+    deps = dict([(x['name'], dependencies(x, entries)) for x in entries])
+    ordered = []
+    todo = list(entries)
+    while todo:
+        done = [x['name'] for x in ordered]
+        free = [x for x in todo if all([d in done for d in deps[x['name']]])]
+        if not free:
+            for entry in todo:
+                dropped.append((entry['name'], "cyclic dependencies %s" % deps[entry['name']]))
+            break
+        ordered.append(free[0])
+        todo.remove(free[0])
+
+    waves = {}
+    names = [x['name'] for x in ordered]
+    for entry in ordered:
+        waits = [waves[x] for x in entry['ready'] if x in names]
+        waves[entry['name']] = max([x + 1 for x in waits] + [0])
+    return ordered, waves, dropped
@@ -0,0 +1,131 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Snapshot of the environment the module commands of a job set up
+
+Module commands (eg Lmod on a shared filesystem) take seconds each and hit the metadata servers, in the
+job script and again for the client environment. The commands are run once at submission instead: the
+variables they set, change or unset are written as a flat script, that is sourced instead of running the
+commands. The script checks that the directories the snapshot refers to (JAVA_HOME, EBROOT*, ...) exist
+and runs the module commands if they don't (eg software reinstalled since the submission).
+
+The snapshot is named after its content, so identical submissions share it.
+
+@author: Stijn De Weirdt
+"""
+import hashlib
+import os
+import pipes
+import re
+import subprocess
+
+from vsc import fancylogger
+
+
+ENV_SNAPSHOT_PREFIX = 'envsnapshot'
+ENV_SNAPSHOT_SHELL = 'bash'
+ENV_SNAPSHOT_MARKER = '## HOD environment snapshot'
+ENV_SNAPSHOT_IGNORE = ['_', 'PWD', 'OLDPWD', 'SHLVL']  # set by the shell itself, not the module commands
+ENV_SNAPSHOT_DIRS = re.compile(r'^(JAVA_HOME|EBROOT\w+|\w+_HOME)$')  # variables with a directory to validate
+ENV_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')  # (not eg exported bash functions BASH_FUNC_module%%)
+
+_log = fancylogger.getLogger('envsnapshot', fname=False)
+
+
+def resolve(commands, environ=None):
+    """Run the shell commands (eg module load ...) on top of environment environ (default os.environ)
+        returns dict with the variables they set or changed and list of the variables they unset,
+        None if a command fails
+    """
+    if environ is None:
+        environ = os.environ
+    # # the environment before the commands is taken in the same shell (eg without what its startup files set)
+    marker = "printf '\\0%s\\0'" % ENV_SNAPSHOT_PREFIX
+    script = "\n".join(["env -0", marker, "set -e"] + commands + [marker, "env -0"])
+    try:
+        # # no stdin: bash sources ~/.bashrc when its stdin is a socket (as if started by sshd)
+        proc = subprocess.Popen([ENV_SNAPSHOT_SHELL, '-c', script], env=environ, stdin=open(os.devnull),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = proc.communicate()
+    except OSError, err:
+        _log.error("Failed to run %s for the environment snapshot: %s" % (ENV_SNAPSHOT_SHELL, err))
+        return None
+    if proc.returncode:
+        _log.error("Failed to resolve the environment of %s (exitcode %s): %s" % (commands, proc.returncode, err))
+        return None
+
+    parts = out.split('\0%s\0' % ENV_SNAPSHOT_PREFIX)
+    old, new = [dict([x.split('=', 1) for x in part.split('\0') if '=' in x]) for part in (parts[0], parts[-1])]
+    names = [x for x in set(new.keys() + old.keys()) if ENV_NAME.match(x) and not x in ENV_SNAPSHOT_IGNORE]
+    changed = dict([(x, new[x]) for x in names if x in new and new[x] != old.get(x, None)])
+    removed = sorted([x for x in names if not x in new])
+    return changed, removed
+
+
+def validate(changed):
+    """The directories of the snapshot (JAVA_HOME, EBROOT*, ...) and the ones that don't exist"""
+    dirs = sorted([value for name, value in changed.items() if ENV_SNAPSHOT_DIRS.match(name)])
+    return dirs, [x for x in dirs if not os.path.isdir(x)]
+
+
+def snapshot_script(commands, changed, removed):
+    """Lines of the script that sets up the snapshot if its directories exist, or runs commands otherwise"""
+    dirs, _ = validate(changed)
+    check = ' && '.join(['[ -d %s ]' % pipes.quote(x) for x in dirs]) or 'true'
+    lines = ["%s of: %s" % (ENV_SNAPSHOT_MARKER, '; '.join(commands)), "if %s; then" % check]
+    lines += ["    export %s=%s" % (name, pipes.quote(changed[name])) for name in sorted(changed)]
+    lines += ["    unset %s" % name for name in removed]
+    lines += ["else"] + ["    %s" % x for x in commands] + ["fi"]
+    return lines
+
+
+def make_snapshot(commands, basedir, extra=None):
+    """Resolve the commands and write the snapshot script (with lines extra appended) in basedir
+        returns the filename, None if the commands fail or the snapshot is not valid
+    """
+    resolved = resolve(commands)
+    if resolved is None:
+        return None
+    changed, removed = resolved
+    _, missing = validate(changed)
+    if missing:
+        _log.error("Not using the environment snapshot of %s: missing directories %s" % (commands, missing))
+        return None
+
+    content = "\n".join(snapshot_script(commands, changed, removed) + (extra or []) + [''])
+    fn = os.path.join(basedir, "%s.%s.sh" % (ENV_SNAPSHOT_PREFIX, hashlib.md5(content).hexdigest()))
+    try:
+        if not os.path.isdir(basedir):
+            os.makedirs(basedir, 0700)
+        if not os.path.exists(fn):
+            tmpfn = "%s.%s" % (fn, os.getpid())
+            open(tmpfn, 'w').write(content)
+            os.rename(tmpfn, fn)
+    except (IOError, OSError), err:
+        _log.error("Failed to write the environment snapshot %s: %s" % (fn, err))
+        return None
+    _log.debug("Environment snapshot of %s in %s (%s variables set, %s unset)" %
+               (commands, fn, len(changed), len(removed)))
+    return fn
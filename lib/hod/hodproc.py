@@ -26,17 +26,28 @@
 
 @author: Stijn De Weirdt
 """
+import os
+import socket
+import time
+
 from hod.mpiservice import MpiService
+from hod.control import ControlServer
+from hod.jobdir import job_dir, job_id
+from hod.persistent import PersistentHdfs
+from hod.sampler import MetricsSeries, METRICS_CSV
+from hod.status import StatusModel, STATUS_SNAPSHOT
+from hod.staging import parse_stage
+from hod.tables import load_tables
+from hod.topology import parse_switch_map, rack_table
+from hod.walltime import StopDurations, remaining_walltime, STOP_DURATIONS
 
 from hod.work.work import TestWorkA, TestWorkB
-from hod.work.mapred import Mapred
-from hod.work.hdfs import Hdfs
-from hod.work.hbase import Hbase
-from hod.work.client import LocalClient, RemoteClient
+from hod.distribution import work_registry, enabled_work, providers, resolve
 
 
 from hod.config.customtypes import HostnamePort, HdfsFs, ParamsDescr
 from hod.config.hodoption import HodOption
+from hod.config.policy import hdfs_policy, node_capacity
 
 
 class Master(MpiService):
@@ -54,53 +65,102 @@ class Master(MpiService):
         self.dists.append([TestWorkB, allranks[lim:]])
 
 
-class Slave(MpiService):
-    """Basic Slave"""
+class HodService(MpiService):
+    """MpiService with the hod options"""
     def __init__(self, options):
         MpiService.__init__(self)
         self.options = options
 
+    def run_dist(self):
+        """Run the work, sampling resources and probing the disks as set by the hod options"""
+        self.init_sampler(self.options.options.hod_sample_interval)
+        self.storage_probe = self.options.options.hod_storage_probe
+        MpiService.run_dist(self)
+
+
+class Slave(HodService):
+    """Basic Slave"""
+
 
-class HadoopMaster(MpiService):
+class HadoopMaster(HodService):
     """Basic Master Hdfs and MR1"""
     def __init__(self, options):
-        MpiService.__init__(self)
-        self.options = options
+        HodService.__init__(self, options)
+        self.jobdir = None
+
+    def start_control(self):
+        """Start the status model and the control endpoint in the job directory, look up the walltime end"""
+        self.jobdir = job_dir(basedir=self.options.options.hod_jobdir, create=True)
+        remaining = remaining_walltime()
+        if remaining is not None:
+            self.walltime_end = time.time() + remaining
+        self.drain_lead = self.options.options.hod_drain_time
+        self.stopdurations = StopDurations(os.path.join(self.options.options.hod_jobdir, STOP_DURATIONS))
+        self.status = StatusModel(job_id(), snapshot=os.path.join(self.jobdir, STATUS_SNAPSHOT))
+        if self.sampler is not None:
+            self.metrics = MetricsSeries(os.path.join(self.jobdir, METRICS_CSV))
+        self.control_server = ControlServer(self.jobdir)
+        self.control_server.add_query('status', self.status.query)
+        try:
+            self.control_server.start()
+        except (OSError, IOError, socket.error):
+            self.log.exception("Failed to start control endpoint in %s. No control possible." % self.jobdir)
+            self.control_server = None
 
     def distribution(self):
-        """Master makes the distribution"""
+        """Master makes the distribution: the enabled work of the work registry, in the order of its dependencies"""
         self.dists = []
 
-        # # parse the options first
-        if self.options.options.hdfs_off:
-            self.log.info("HDFS off option set.")
-        else:
-            self.distribution_HDFS()
-
-        # # if HBase is required, start it before MR; so the MR can use the HBase confs and jars
-        if self.options.options.hbase_on:
-            self.log.debug("HBase on, starting before MapRed")
-            self.distribution_Hbase()
-
-        if self.options.options.mr1_off:
-            self.log.info("Mapred off option set.")
-        else:
-            if self.options.options.yarn_on:
-                self.log.info("YARN on option set. Not enabling Mapred")
-            else:
-                self.distribution_Mapred()
+        enabled = enabled_work(work_registry(), self.options.options)
+        if self.options.options.hdfs_persistent:
+            persistent = PersistentHdfs(self.options.options.hdfs_persistent)
+            in_use = persistent.in_use(force=self.options.options.hdfs_persistent_force)
+            if in_use:
+                # # the work that needs HDFS is dropped by resolve
+                self.log.error("Work Hdfs not distributed: persistent HDFS %s %s (see --hdfs-persistent-force)" %
+                               (self.options.options.hdfs_persistent, in_use))
+                enabled = [x for x in enabled if x['name'] != 'Hdfs']
+        entries, waves, dropped = resolve(enabled)
+        for name, reason in dropped:
+            self.log.error("Work %s not distributed: %s" % (name, reason))
+
+        shared = {}
+        provided = providers(entries)
+        for entry in entries:
+            masterrank, ranks = getattr(self, entry['placement'])()
+            wshared = getattr(self, entry['shared'])(masterrank, ranks)
+            # # the shared params of the providers of the needed params, then the own ones
+            params = ParamsDescr({})
+            for name in sorted(set([provided[x] for x in entry['needs']])):
+                params.update(shared[name]['params'])
+            params.update(wshared.get('params', ParamsDescr({})))
+            wshared['params'] = params
+            # # eg enable the hdfs hbase tuning
+            wshared['other_work'] = dict([(x['name'], True) for x in entries if x is not entry])
+            wshared['start_wave'] = waves[entry['name']]
+            self.log.debug("Distribution of %s on ranks %s (start wave %s)" % (entry['name'], ranks, waves[entry['name']]))
+            shared[entry['name']] = wshared
+            self.dists.append([entry['work'], ranks, wshared])
 
         if self.options.options.yarn_on:
             self.distribution_Yarn()
 
-        # # generate client configs
-        self.make_client()
-
-    def make_client(self):
-        """Create the client configs"""
-        # # recreate the job environment
+        storage = {'layout': self.options.options.hod_storage_layout,
+                   'weighting': self.options.options.hod_storage_weighting}
+        switchmap = None
+        if self.options.options.hod_topology_map:
+            switchmap = parse_switch_map(self.options.options.hod_topology_map)
+        topology = rack_table(self.allnodes, switchmap)
+        for wrk in self.dists:
+            wrk[2]['storage'] = storage
+            if topology:
+                wrk[2]['topology'] = topology
+
+    def client_environment(self):
+        """The job environment for the clients (None if not provided)"""
+        environment = None
         if self.options.options.hod_envclass:
-            from hod.rmscheduler.hodjob import Job
+            from hod.rmscheduler.job import Job
             job = Job.get_job(self.options.options.hod_envclass, self.options)
             environment = "\n".join(job.generate_environment())
             self.log.debug('Generated environment %s from option hod_envclass %s' % (environment, self.options.options.hod_envclass))
@@ -113,90 +173,70 @@ class HadoopMaster(MpiService):
                                    self.options.options.hod_envscript)
         else:
             self.log.debug('No environment provided.')
-            environment = None
+        return environment
 
-        # # local client config
-        shared_localclient = {'environment': environment}
+    def shared_LocalClient(self, masterrank, ranks):
+        """Shared for the local client config: the job environment and the script"""
+        shared_localclient = {'environment': self.client_environment()}
         if self.options.options.hod_script:
             shared_localclient[
                 'work_script'] = self.options.options.hod_script
             self.log.debug('set shared work_script from option %s' %
                            self.options.options.hod_script)
+        return shared_localclient
 
-        client_ranks = [0]  # only on one rank
-        self.dists.append([LocalClient, client_ranks, shared_localclient])
-
-        # # client with socks access
-        shared_remoteclient = {'environment': environment}
-        client_ranks = [0]  # only on one rank
-        self.dists.append([RemoteClient, client_ranks, shared_remoteclient])
+    def shared_RemoteClient(self, masterrank, ranks):
+        """Shared for the client with socks access: the job environment"""
+        return {'environment': self.client_environment()}
 
-    def distribution_HDFS(self):
-        """HDFS distribution. Should be one of the first, sets the namenode"""
+    def shared_Hdfs(self, masterrank, ranks):
+        """Shared for HDFS: the namenode on masterrank and the params of the HDFS policy for the datanodes"""
         network_index = self.select_network()
 
-        # # namenode on rank 0, jobtracker of last one
-        nn_rank, hdfs_ranks = self.select_hdfs_ranks()
         nn_param = [HdfsFs(
-            "%s:8020" % self.allnodes[nn_rank]['network'][network_index][0]),
-            'Namenode on rank %s network_index %s' % (nn_rank, network_index)]
+            "%s:8020" % self.allnodes[masterrank]['network'][network_index][0]),
+            'Namenode on rank %s network_index %s' % (masterrank, network_index)]
 
         sharedhdfs = {'params': ParamsDescr({'fs.default.name': nn_param})}
-        self.dists.append([Hdfs, hdfs_ranks, sharedhdfs])
+        # # the datanodes are on all ranks but the namenode (unless there is only one)
+        datanodes = [x for x in ranks if x != masterrank] or [masterrank]
+        capacity = sum([node_capacity(self.allnodes[x], self.options.options.hod_storage_layout) for x in datanodes])
+        dataset = self.options.options.hdfs_dataset_size * 1024 ** 3
+        sharedhdfs['params'].update(hdfs_policy(len(datanodes), capacity, dataset))
+        if self.options.options.hdfs_persistent:
+            sharedhdfs['persistent'] = self.options.options.hdfs_persistent
+        if self.options.options.hdfs_stage_in or self.options.options.hdfs_stage_out:
+            sharedhdfs['stage'] = {
+                'in': parse_stage(self.options.options.hdfs_stage_in),
+                'out': parse_stage(self.options.options.hdfs_stage_out),
+            }
+            sharedhdfs['stage_basedir'] = self.options.options.hod_jobdir
+        return sharedhdfs
 
     def distribution_Yarn(self):
         """Yarn distribution. Reuse HDFS namenode"""
         self.log.error("Not implemented")
 
-    def distribution_Mapred(self):
-        """Mapred distribution. Reuse HDFS namenode"""
+    def shared_Mapred(self, masterrank, ranks):
+        """Shared for Mapred: the jobtracker on masterrank"""
         network_index = self.select_network()
-        sharedhdfs = None
-        for d in self.dists:
-            if d[0].__name__ == 'Hdfs':
-                sharedhdfs = d[2]
-                break
-        if sharedhdfs:
-            self.log.debug("Found Hdfs work in dists with shared params %s" %
-                           (sharedhdfs['params']))
-        else:
-            self.log.error(
-                "No previous Hdfs work found in dists %s" % self.dists)
-
-        jt_rank, mapred_ranks = self.select_mapred_ranks()
         jt_param = [HostnamePort(
-            "%s:9000" % self.allnodes[jt_rank]['network'][network_index][0]),
-            'Jobtracker on rank %s network_index %s' % (jt_rank, network_index)]
+            "%s:9000" % self.allnodes[masterrank]['network'][network_index][0]),
+            'Jobtracker on rank %s network_index %s' % (masterrank, network_index)]
 
         sharedmapred = {'params': ParamsDescr(
             {'mapred.job.tracker': jt_param})}
-        sharedmapred['params'].update(sharedhdfs['params'])
-        self.dists.append([Mapred, mapred_ranks, sharedmapred])
-
-    def distribution_Hbase(self):
-        """HBase distribution. Reuse HDFS namenode"""
-        sharedhdfs = None
-        for d in self.dists:
-            # # enable hdfs hbase tuning
-            d[2].setdefault('other_work', {})
-            d[2]['other_work'].setdefault('Hbase', True)
-            self.log.debug("Set shared Hbase for %s to true" % d[0].__name__)
-
-            if d[0].__name__ == 'Hdfs':
-                sharedhdfs = d[2]
-
-        if sharedhdfs:
-            self.log.debug("Found Hdfs work in dists with shared params %s" %
-                           (sharedhdfs['params']))
-        else:
-            self.log.error(
-                "No previous Hdfs work found in dists %s" % self.dists)
-
-        hm_rank, hm_ranks = self.select_hbasemaster_ranks()
+        sharedmapred['compress'] = self.options.options.mr1_compress
+        return sharedmapred
 
+    def shared_Hbase(self, masterrank, ranks):
+        """Shared for HBase: the zookeeper, regionserver sizing and table options"""
         sharedhbase = {'params': ParamsDescr({})}
-        sharedhbase['params'].update(sharedhdfs['params'])
-        self.dists.append([Hbase, hm_ranks, sharedhbase])
+        sharedhbase['zookeeper_quorum'] = self.options.options.hbase_zookeeper_quorum
+        sharedhbase['workload'] = self.options.options.hbase_workload
+        if self.options.options.hbase_tables:
+            sharedhbase['tables'] = load_tables(self.options.options.hbase_tables)
+        return sharedhbase
 
     def select_network(self):
         """Given the network info collected in self.allnodes[x]['network'], return the index of the network to use"""
@@ -244,3 +284,7 @@ class HadoopMaster(MpiService):
 
         self.log.debug("Simple hbase distribution: hm is first of allranks and all slaves are regioserver: %s , %s" % (rank, allranks))
         return rank, allranks
+
+    def select_client_ranks(self):
+        """return the client rank (the first one) as only rank"""
+        return 0, [0]
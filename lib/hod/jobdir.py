@@ -0,0 +1,73 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Per-job directory, shared between the job and the user (eg for the control endpoint)
+
+@author: Stijn De Weirdt
+"""
+import os
+import socket
+
+from hod.config.choices import JOBDIR_BASE
+
+
+def job_id():
+    """Id of the current job: the resource manager job id, or host.pid outside a job"""
+    jobid = os.environ.get('PBS_JOBID', None)
+    if not jobid:
+        jobid = "%s.%s" % (socket.gethostname().split('.')[0], os.getpid())
+    return jobid
+
+
+def job_dir(jobid=None, basedir=None, create=False):
+    """The job directory basedir/jobid (basedir defaults to ~/.hod)"""
+    if basedir is None:
+        basedir = JOBDIR_BASE
+    if jobid is None:
+        jobid = job_id()
+    path = os.path.join(basedir, jobid)
+    if create and not os.path.isdir(path):
+        os.makedirs(path, 0700)
+    return path
+
+
+def list_jobs(basedir=None):
+    """The job ids with a job directory in basedir"""
+    if basedir is None:
+        basedir = JOBDIR_BASE
+    if not os.path.isdir(basedir):
+        return []
+    return sorted([x for x in os.listdir(basedir) if os.path.isdir(os.path.join(basedir, x))])
+
+
+def find_job(jobid, basedir=None):
+    """Full job id of the job with a job directory for jobid (eg 123 for 123.master.domain), None if not found"""
+    jobs = list_jobs(basedir)
+    if jobid in jobs:
+        return jobid
+    candidates = [x for x in jobs if x.startswith("%s." % jobid)]
+    if len(candidates) == 1:
+        return candidates[0]
+    return None
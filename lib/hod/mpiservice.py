@@ -29,10 +29,16 @@
 import time
 from mpi4py import MPI
 
+from hod.distribution import work_class, work_name
 from hod.node import Node
+from hod.sampler import Sampler, aggregate
+from hod.timeline import Timeline
+from hod.walltime import ShutdownPlan, DRAIN_LEAD
 from vsc import fancylogger
 
 MASTERRANK = 0
+CONTROL_TAG = 1000  # MPI tag of the control messages
+CONTROL_POLL = 0.1  # seconds between checks for a control message on the slaves
 
 
 class MpiService:
@@ -59,9 +65,20 @@ class MpiService:
         self.tempcomm = []
 
         self.active_work = []
+        self.timeline = Timeline()  # shared with the active work
+        self.control_server = None  # control endpoint (hod.control.ControlServer) on the master
+        self.status = None  # status model (hod.status.StatusModel) on the master
+        self.reported_daemons = {}  # daemon status last sent to the master (see report_status)
+        self.sampler = None  # resource sampler (hod.sampler.Sampler), see init_sampler
+        self.metrics = None  # metrics time series (hod.sampler.MetricsSeries) on the master
+        self.walltime_end = None  # end of the walltime of the job (on the master; None if unknown)
+        self.drain_lead = DRAIN_LEAD
+        self.stopdurations = None  # measured stop durations (hod.walltime.StopDurations) on the master
+        self.shutdown = None  # shutdown schedule (hod.walltime.ShutdownPlan) on the master, see plan_shutdown
 
         self.dists = None
         self.thisnode = None
+        self.storage_probe = 0  # MB written to probe the local disks (see hod.node.Node), passed to the work
 
         if initcomm:
             self.log.debug(
@@ -86,7 +103,7 @@ class MpiService:
             self.barrier('Start ')
 
         # # init all nodes from original COMM_WORLD
-        self.thisnode = Node()
+        self.thisnode = Node(storage_probe=self.storage_probe)
         self.collect_nodes()
 
         self.dists = None
@@ -264,17 +281,140 @@ class MpiService:
             self.log.debug("Distributed dists %s from masterrank %s" %
                            (self.dists, self.masterrank))
         else:
-            self.dists = self.comm.bcast(root=self.masterrank)
+            self.dists = self.comm.bcast(None, root=self.masterrank)
             self.log.debug("Received dists %s from masterrank %s" %
                            (self.dists, self.masterrank))
 
+    def start_control(self):
+        """Start the control endpoint (master only, see wait_control)"""
+
+    def stop_control(self):
+        """Stop the control endpoint"""
+        if self.control_server is not None:
+            self.control_server.stop()
+            self.control_server = None
+
+    def wait_control(self, timeout):
+        """
+        Wait up to timeout seconds for a control request and pass it on to all ranks.
+        Returns the request dict; command 'continue' if there was none, 'done' when the master has no more work.
+        """
+        if self.rank == self.masterrank:
+            if not self.active_work:
+                request = {'command': 'done'}
+            else:
+                request = None
+                if self.shutdown is not None:
+                    request = self.shutdown.due()
+                    timeout = self.shutdown.timeout(timeout)
+                if request is None:
+                    if self.control_server is None:
+                        time.sleep(timeout)
+                    else:
+                        request = self.control_server.serve(timeout)
+                if request is None:
+                    request = {'command': 'continue'}
+
+            for rank in range(self.size):
+                if rank != self.masterrank:
+                    self.comm.send(request, dest=rank, tag=CONTROL_TAG)
+        else:
+            # # poll, a blocking receive keeps a core busy in most MPI implementations
+            req = self.comm.irecv(source=self.masterrank, tag=CONTROL_TAG)
+            while True:
+                flag, request = req.test()
+                if flag:
+                    break
+                time.sleep(CONTROL_POLL)
+        return request
+
+    def plan_shutdown(self):
+        """Plan the drain and stop requests (master only) that end all work before the walltime ends"""
+        if self.walltime_end is None:
+            self.log.info("Walltime end unknown, no shutdown planned")
+            return
+        names = [act_work.__class__.__name__ for act_work in self.active_work]
+        stop_lead = 0
+        if self.stopdurations is not None:
+            stop_lead = sum([self.stopdurations.lead(name) for name in names])
+        self.shutdown = ShutdownPlan(self.walltime_end, stop_lead, drain_lead=self.drain_lead)
+        self.log.info("Planned shutdown of work %s (stop lead %ds): %s" % (names, stop_lead, self.shutdown.info()))
+        if self.status is not None:
+            self.status.set_shutdown(self.shutdown.info())
+
+    def record_stop(self, act_work):
+        """Record how long the stop of act_work took (master only), to plan the shutdown of the next jobs"""
+        name = act_work.__class__.__name__
+        duration = self.timeline.duration("%s stop" % name)
+        if self.stopdurations is not None and duration is not None:
+            self.stopdurations.record(name, duration)
+
+    def update_work_status(self, act_work, state=None):
+        """Update act_work (and its state, if not None) in the status model (master only)"""
+        if self.status is None:
+            return
+        info = {'started': act_work.work_start_time, 'max_age': act_work.work_max_age}
+        if state is not None:
+            info['state'] = state
+        self.status.update_work(act_work.__class__.__name__, **info)
+
+    def report_status(self):
+        """Send the changes in the daemon status and the daemon events of this rank to the master (collective)"""
+        daemons = {}
+        events = []
+        for act_work in self.active_work:
+            for info in act_work.daemon_status():
+                daemons["%s/%s" % (info['work'], info['daemon'])] = info
+            for event in act_work.watchdog.pop_events():
+                event['work'] = act_work.__class__.__name__
+                events.append(event)
+
+        changes = dict([(key, info) for key, info in daemons.items() if self.reported_daemons.get(key, None) != info])
+        changes.update(dict([(key, None) for key in self.reported_daemons if not key in daemons]))
+        self.reported_daemons = daemons
+
+        allchanges = self.comm.gather((changes, events), root=self.masterrank)
+        if self.status is not None:
+            for rank, (rankchanges, rankevents) in enumerate(allchanges):
+                self.status.update_daemons(rank, rankchanges)
+                for event in rankevents:
+                    self.log.warn("Daemon event on rank %s: %s" % (rank, event))
+                self.status.add_events(rank, rankevents)
+            # # eg extend changes the max_age
+            for act_work in self.active_work:
+                self.update_work_status(act_work)
+            self.status.write_snapshot()
+
+    def init_sampler(self, interval):
+        """Sample resources (every interval seconds, at least once per wait iteration); 0 disables sampling"""
+        if interval > 0:
+            self.sampler = Sampler()
+            self.wait_iter_sleep = min(self.wait_iter_sleep, interval)
+            self.log.debug("Sampling every %s seconds" % self.wait_iter_sleep)
+
+    def sample_metrics(self):
+        """Sample this node and its daemons, aggregate on the master (collective, all ranks, after report_status)"""
+        if self.sampler is None:
+            return
+        pids = dict([(key, info['pid']) for key, info in self.reported_daemons.items() if info['alive']])
+        samples = self.comm.gather(self.sampler.sample(pids), root=self.masterrank)
+        if self.metrics is not None:
+            self.metrics.append(aggregate(samples))
+
     def run_dist(self):
         """Make communicators for dists and execute the work there"""
+        if self.rank == self.masterrank:
+            self.start_control()
+
         if self.dists is None:
             self.log.debug("No dists found. Running distribution and spread.")
             self.distribution()
             self.spread()
 
+        if self.status is not None:
+            self.status.set_ranks(self.allnodes)
+            self.status.set_dists(self.dists)
+
         # Based on initial dist, create the groups and communicators and map with work
         self.log.debug("Starting the distribution.")
         for wrk in self.dists:
@@ -308,23 +448,53 @@ class MpiService:
             else:
                 self.tempcomm.append(newcomm)
 
+                # # the work class (and its config) is only imported on the ranks that run it
+                self.timeline.start("%s import" % work_name(w_type))
+                w_type = work_class(w_type)
+                self.timeline.end("%s import" % work_name(w_type))
                 self.log.debug("work %s for ranks %s shared %s" %
                                (w_type.__name__, w_ranks, w_shared))
                 tmp = w_type(w_ranks, w_shared)
+                tmp.timeline = self.timeline
+                tmp.storage_probe = self.storage_probe
+                tmp.start_wave = w_shared.get('start_wave', 0)
                 self.log.debug("work %s begin" % (w_type.__name__))
                 tmp.work_begin(newcomm)
                 # # adding started work
                 self.active_work.append(tmp)
 
-        for act_work in self.active_work:
-            self.log.debug("work %s start" % (act_work.__class__.__name__))
-            act_work.do_work_start()
+        # # all work of a start wave is started before any waits for its readiness, so its daemons come up in
+        # # parallel; the next wave (eg mapred and hbase need a running hdfs) starts once all ranks are done
+        waves = sorted(set([len(wrk) == 3 and wrk[2].get('start_wave', 0) or 0 for wrk in self.dists]))
+        for wave in waves:
+            works = [x for x in self.active_work if x.start_wave == wave]
+            for act_work in works:
+                self.log.debug("work %s start (wave %s)" % (act_work.__class__.__name__, wave))
+                self.update_work_status(act_work, 'starting')
+                act_work.do_work_start()
+            for act_work in works:
+                if act_work.do_work_ready():
+                    self.update_work_status(act_work, 'running')
+                else:
+                    self.update_work_status(act_work, 'notready')
+            self.barrier("Start wave %s done" % wave)
+
+        self.log.info("Startup timeline of rank %s:\n%s" % (self.rank, self.timeline.summary()))
+        if self.rank == self.masterrank:
+            self.plan_shutdown()
+        self.report_status()
+        self.sample_metrics()
+        if self.status is not None:
+            self.status.set_state('running')
 
         # # all work is started now
-        while len(self.active_work):
+        draining = False
+        done = False
+        while not done:
             self.log.debug(
                 "amount of active work %s" % (len(self.active_work)))
-            for act_work in self.active_work:
+            # # reverse order: dependent work (eg mapred and hbase) is stopped before the work it depends on (hdfs)
+            for act_work in self.active_work[::-1]:
 
                 cleanup = act_work.do_work_wait(
                 )  # wait returns wheter or not to cleanup
@@ -333,16 +503,51 @@ class MpiService:
                 if cleanup:
                     self.log.debug(
                         "work %s stop" % (act_work.__class__.__name__))
+                    self.update_work_status(act_work, 'stopping')
                     act_work.do_work_stop()
+                    if self.rank == self.masterrank:
+                        self.record_stop(act_work)
                     self.log.debug(
                         "work %s end" % (act_work.__class__.__name__))
                     act_work.work_end()
+                    self.update_work_status(act_work, 'stopped')
 
                     self.log.debug("Removing %s from active_work" % act_work)
                     self.active_work.remove(act_work)
             if len(self.active_work):
-                self.log.debug('Still %s active work left. sleeping %s seconds' % (len(self.active_work), self.wait_iter_sleep))
-                time.sleep(self.wait_iter_sleep)
+                self.log.debug('Still %s active work left. waiting %s seconds for control requests' %
+                               (len(self.active_work), self.wait_iter_sleep))
             else:
-                self.log.debug('No more active work, not going to sleep.')
+                self.log.debug('No more active work, not going to wait.')
+
+            # # all ranks go through here in lockstep: the master sends one control message per iteration
+            request = self.wait_control(self.wait_iter_sleep)
+            command = request['command']
+            self.report_status()
+            self.sample_metrics()
+            if command == 'done':
+                done = True
+                if self.active_work:
+                    self.log.error("Master is done, but still active work %s on rank %s" %
+                                   (self.active_work, self.rank))
+            elif command != 'continue':
+                self.log.info("Control request %s on rank %s" % (request, self.rank))
+                for act_work in self.active_work:
+                    act_work.control(request)
+                if command == 'drain':
+                    draining = True
+                if self.status is not None and command in ('stop', 'drain',):
+                    self.status.set_state({'stop': 'stopping', 'drain': 'draining'}[command])
+
+            if draining and not done:
+                drained = all([act_work.work_drained() for act_work in self.active_work])
+                if self.comm.allreduce(drained, op=MPI.LAND):
+                    self.log.info("All work drained, stopping")
+                    draining = False
+                    for act_work in self.active_work:
+                        act_work.control({'command': 'stop'})
         self.log.debug("No more active work left.")
+        if self.status is not None:
+            self.status.set_state('done')
+            self.status.write_snapshot()
+        self.stop_control()
@@ -35,6 +35,8 @@ import netifaces
 import netaddr
 import struct
 import multiprocessing
+import tempfile
+import time
 
 from vsc.utils.affinity import sched_getaffinity
 from vsc import fancylogger
@@ -122,10 +124,196 @@ def get_memory():
     return memory
 
 
+# # filesystems on local disks; tmpfs is local memory, the network filesystems are never used for data
+LOCAL_FSTYPES = ['ext2', 'ext3', 'ext4', 'xfs', 'btrfs', 'jfs', 'reiserfs', 'zfs', 'overlay']
+NETWORK_FSTYPES = ['nfs', 'nfs4', 'lustre', 'gpfs', 'panfs', 'beegfs', 'cifs', 'smbfs', 'ceph', 'glusterfs', 'afs']
+MEMORY_FSTYPES = ['tmpfs']
+STORAGE_MIN_FREE = 2 ** 30  # bytes, a local disk with less free space is not used
+STORAGE_CANDIDATES = ['TMPDIR', 'VSC_SCRATCH_NODE']  # environment variables with preferred (writable) directories
+STORAGE_DIRS = ['/tmp', '/var/tmp', '/dev/shm']  # writable directories on common mount points
+STORAGE_SYSTEM = ['/proc', '/sys', '/dev', '/run', '/boot']  # mount points below these are not used (except STORAGE_DIRS)
+
+STORAGE_STRIPE_MAX = 4  # data directories per disk with weighted striping
+STORAGE_RESERVED_FRACTION = 0.05  # of the smallest data disk, reserved for non-HDFS data (eg shuffle data)
+STORAGE_RESERVED_MAX = 50 * 2 ** 30
+
+_throughput = {}  # write throughput per directory, the probe only runs once per process
+
+
+def get_mounts(mounts_fn='/proc/mounts'):
+    """List of (device, mountpoint, fstype) of the mounted filesystems"""
+    res = []
+    for line in open(mounts_fn).read().split('\n'):
+        fields = line.split()
+        if len(fields) < 3:
+            continue
+        # # spaces and other special characters are escaped as octal
+        device, mountpoint = [re.sub(r"\\([0-7]{3})", lambda x: chr(int(x.group(1), 8)), x) for x in fields[:2]]
+        res.append((device, mountpoint, fields[2]))
+    return res
+
+
+def block_rotational(device):
+    """True if the block device (eg /dev/sda1) is rotational, False if not (eg SSD); None if unknown"""
+    if not device.startswith('/dev/'):
+        return None
+    sysdir = os.path.join('/sys/class/block', os.path.basename(os.path.realpath(device)))
+    if os.path.exists(os.path.join(sysdir, 'partition')):
+        sysdir = os.path.dirname(os.path.realpath(sysdir))
+    try:
+        return open(os.path.join(sysdir, 'queue', 'rotational')).read().strip() == '1'
+    except IOError:
+        return None
+
+
+def probe_throughput(directory, size):
+    """Write throughput in MB/s of size MB written (and synced) to a file in directory"""
+    if not directory in _throughput:
+        block = '\0' * 2 ** 20
+        fh, fn = tempfile.mkstemp(prefix='hodprobe', dir=directory)
+        try:
+            start = time.time()
+            for _ in range(size):
+                os.write(fh, block)
+            os.fsync(fh)
+            _throughput[directory] = size / max(time.time() - start, 1e-6)
+        finally:
+            os.close(fh)
+            os.remove(fn)
+        log.debug("Write throughput of %s: %.1f MB/s" % (directory, _throughput[directory]))
+    return _throughput[directory]
+
+
+def get_storage(probe=0, mounts_fn='/proc/mounts'):
+    """
+    Describe the filesystems with a writable directory: directory, mountpoint, device, fstype, size and free (bytes),
+    local, rotational and (if probe MB are written) the write throughput in MB/s
+    """
+    mounts = {}
+    for device, mountpoint, fstype in get_mounts(mounts_fn):
+        if fstype in LOCAL_FSTYPES + NETWORK_FSTYPES + MEMORY_FSTYPES:
+            mounts[mountpoint] = (device, fstype)  # the last mount on a mountpoint hides the previous ones
+
+    candidates = [os.environ[x] for x in STORAGE_CANDIDATES if os.environ.get(x, None)]
+    candidates += STORAGE_DIRS
+    candidates += [x for x in sorted(mounts.keys()) if not [y for y in STORAGE_SYSTEM if (x + '/').startswith(y + '/')]]
+
+    storage = []
+    devs = []
+    for directory in candidates:
+        directory = os.path.realpath(directory)
+        if not os.path.isdir(directory) or not os.access(directory, os.W_OK | os.X_OK):
+            continue
+        mountpoint = max([x for x in mounts if directory == x or directory.startswith(x.rstrip('/') + '/')] or [None])
+        if mountpoint is None:
+            continue
+        st_dev = os.stat(directory).st_dev
+        if st_dev in devs:
+            continue  # first writable directory per filesystem
+        devs.append(st_dev)
+
+        device, fstype = mounts[mountpoint]
+        vfs = os.statvfs(directory)
+        info = {
+            'directory': directory,
+            'mountpoint': mountpoint,
+            'device': device,
+            'fstype': fstype,
+            'size': vfs.f_blocks * vfs.f_frsize,
+            'free': vfs.f_bavail * vfs.f_frsize,
+            'local': not (fstype in NETWORK_FSTYPES or ':' in device or device.startswith('//')),
+            'rotational': block_rotational(device),
+            'throughput': None,
+        }
+        if probe and info['local'] and not fstype in MEMORY_FSTYPES:
+            try:
+                info['throughput'] = probe_throughput(directory, probe)
+            except (IOError, OSError):
+                log.exception("Failed to probe the write throughput of %s" % directory)
+        storage.append(info)
+
+    log.debug("Collected storage %s" % storage)
+    return storage
+
+
+_storage_cache = {}  # probe: storage of this node, see local_storage
+
+
+def local_storage(probe=0):
+    """
+    get_storage of this node, collected once per process (and probe): every work of the process sees the same disks
+    (the probe results are noisy) and the disks are probed only once
+    """
+    if not probe in _storage_cache:
+        _storage_cache[probe] = get_storage(probe=probe)
+    return [dict(x) for x in _storage_cache[probe]]
+
+
+def select_storage(storage, purpose, minfree=STORAGE_MIN_FREE):
+    """
+    Directories for purpose from storage (as returned by get_storage)
+        data: all local disks (eg HDFS data and mapred local dirs), fastest first
+        base: the fastest local disk (eg for the logs)
+        control: memory (tmpfs) for small control files (eg pid files)
+    Without suitable local disk, the temporary directory is used, or memory if that is on a network filesystem.
+    """
+    memory = [x for x in storage if x['fstype'] in MEMORY_FSTYPES]
+    if purpose == 'control' and memory:
+        return [memory[0]['directory']]
+
+    disks = [x for x in storage if x['fstype'] in LOCAL_FSTYPES and x['local'] and x['free'] >= minfree]
+    # # non-rotational first, then fastest (if probed), then most free space
+    disks.sort(key=lambda x: (x['rotational'] is not False, -(x['throughput'] or 0), -x['free']))
+    dirs = [x['directory'] for x in disks]
+
+    if not dirs:
+        tmpdir = os.path.realpath(tempfile.gettempdir())
+        tmpinfo = [x for x in storage if x['directory'] == tmpdir]
+        if memory and tmpinfo and not tmpinfo[0]['local']:
+            log.warn("No local disk and temporary dir %s is on %s, using memory for %s" %
+                     (tmpdir, tmpinfo[0]['fstype'], purpose))
+            dirs = [memory[0]['directory']]
+        else:
+            log.warn("No local disk found in storage %s, using temporary dir %s for %s" % (storage, tmpdir, purpose))
+            dirs = [tmpdir]
+
+    if purpose in ('base', 'control',):
+        dirs = dirs[:1]
+    log.debug("Selected directories %s for %s" % (dirs, purpose))
+    return dirs
+
+
+def storage_weights(storage, dirs, weighting='none', maxdirs=STORAGE_STRIPE_MAX):
+    """
+    Number of data directories for each of the directories dirs (from storage, as returned by get_storage):
+    relative to the free space (capacity weighting) or write throughput (throughput weighting) of the disks.
+    mapred uses its directories round robin, so a disk with 2 directories gets twice the data.
+    """
+    info = dict([(x['directory'], x) for x in storage])
+    key = {'capacity': 'free', 'throughput': 'throughput'}.get(weighting, None)
+    values = [info.get(x, {}).get(key, None) for x in dirs]
+    if key is None or not values or None in values or min(values) <= 0:
+        if key is not None:
+            log.warn("No %s for all of %s, no weighting" % (key, dirs))
+        return dict([(x, 1) for x in dirs])
+
+    low = min(values)
+    return dict([(x, int(min(maxdirs, round(value / float(low))))) for x, value in zip(dirs, values)])
+
+
+def storage_reserved(storage, dirs, fraction=STORAGE_RESERVED_FRACTION, maximum=STORAGE_RESERVED_MAX):
+    """Bytes to reserve per volume for non-HDFS data on the disks of directories dirs: fraction of the smallest disk"""
+    sizes = [x['size'] for x in storage if x['directory'] in dirs]
+    if not sizes:
+        return 0
+    return int(min(maximum, fraction * min(sizes)))
+
+
 class Node(object):
     """Detect localnode properties"""
-    def __init__(self):
+    def __init__(self, storage_probe=0):
         self.log = fancylogger.getLogger(name=self.__class__.__name__, fname=False)
+        self.storage_probe = storage_probe  # MB written to probe the write throughput of the local disks (0: no probe)
         self.fqdn = 'localhost' # base fqdn hostname
         self.network = [] # all possible IPs
 
@@ -136,6 +324,7 @@ class Node(object):
         self.topology = [0] # default topology plain set
 
         self.memory = {}
+        self.storage = []
 
     def __str__(self):
         return "FQDN %s PID %s" % (self.fqdn, self.pid)
@@ -151,6 +340,7 @@ class Node(object):
         self.cores = len(self.usablecores)
 
         self.memory = get_memory()
+        self.storage = local_storage(probe=self.storage_probe)
 
         if ret:
             descr = {
@@ -161,6 +351,7 @@ class Node(object):
                 'usablecores': self.usablecores,
                 'topology': self.topology,
                 'memory': self.memory,
+                'storage': self.storage,
             }
             return descr
 
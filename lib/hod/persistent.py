@@ -0,0 +1,236 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Persistent HDFS across HOD jobs
+
+The namenode image and edits are kept in a directory on a shared filesystem, the datanode blocks in
+a fixed directory on the local disks of the nodes. A manifest in the shared directory records the
+namespace and the hosts that held the blocks, so the next job can pick quickly (without starting
+anything) how to continue:
+    reuse: the namespace is valid and all hosts with blocks are in this job
+    partial: some of the hosts with blocks are in this job; the files with blocks on the other hosts
+             are missing blocks (and have to be staged in again)
+    format: no valid namespace, or none of the hosts with blocks is in this job
+A manifest of a job that is still running (or that the resource manager does not know to be gone) is
+refused: the namenodes of both jobs would write the same namespace.
+
+Hadoop 1 records the namespaceID in the VERSION file of every storage directory. Hadoop 2 records the
+clusterID in the VERSION file of the namenode and datanode storage, and the namespaceID of a datanode
+per block pool (current/BP-*/current/VERSION).
+
+@author: Stijn De Weirdt
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+from vsc import fancylogger
+
+from hod.commands.command import QstatFull
+from hod.jobdir import job_id
+
+
+PERSISTENT_MANIFEST = 'hod-hdfs.json'
+PERSISTENT_NAME_DIR = 'name'
+PERSISTENT_MODES = ['reuse', 'partial', 'format']
+PERSISTENT_IDS = ['namespaceID', 'clusterID']  # the ids of the namespace (clusterID: Hadoop 2)
+
+QSTAT_JOB_STATE_REGEX = re.compile(r"^\s*job_state\s*=\s*(\w+)", re.M)
+QSTAT_UNKNOWN_REGEX = re.compile(r"Unknown Job Id", re.I)
+
+
+def read_version(directory):
+    """The properties in the VERSION file of HDFS storage directory (empty dict if there is none)"""
+    props = {}
+    try:
+        for line in open(os.path.join(directory, 'current', 'VERSION')):
+            line = line.strip()
+            if line and not line.startswith('#') and '=' in line:
+                key, value = line.split('=', 1)
+                props[key.strip()] = value.strip()
+    except IOError:
+        pass
+    return props
+
+
+def storage_ids(directory):
+    """
+    The ids (see PERSISTENT_IDS) of HDFS storage directory: dict with the clusterID (Hadoop 2, None if there is none)
+    and the list of namespaceIDs (of the block pools of a Hadoop 2 datanode)
+    """
+    version = read_version(directory)
+    versions = [version] + [read_version(x) for x in sorted(glob.glob(os.path.join(directory, 'current', 'BP-*')))]
+    return {
+        'clusterID': version.get('clusterID', None),
+        'namespaceID': [x['namespaceID'] for x in versions if x.get('namespaceID', None)],
+    }
+
+
+def job_gone(jobid):
+    """True if job jobid ended, False if the resource manager still has it, None if it can't tell (eg no qstat)"""
+    qstat = QstatFull(jobid)
+    qstat.run()
+    if qstat.result is None:
+        return None
+    if qstat.result.is_ok():
+        state = QSTAT_JOB_STATE_REGEX.search(qstat.result.out)
+        if state is None:
+            return None
+        return state.group(1) == 'C'  # completed (and kept by the server)
+    if QSTAT_UNKNOWN_REGEX.search(qstat.result.out + qstat.result.err):
+        return True
+    return None
+
+
+class PersistentHdfs(object):
+    """Persistent HDFS in shared directory"""
+    def __init__(self, directory):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        self.directory = os.path.realpath(directory)
+        self.name_dir = os.path.join(self.directory, PERSISTENT_NAME_DIR)
+        self.manifest_fn = os.path.join(self.directory, PERSISTENT_MANIFEST)
+
+    def key(self):
+        """Short key of this persistent HDFS, for the names of the local block directories"""
+        return hashlib.md5(self.directory).hexdigest()[:8]
+
+    def load(self):
+        """The manifest (empty dict if there is none)"""
+        try:
+            return json.load(open(self.manifest_fn))
+        except (IOError, ValueError):
+            return {}
+
+    def save(self, manifest):
+        """Write the manifest (atomically)"""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, 0700)
+        tmpfn = "%s.tmp" % self.manifest_fn
+        fh = open(tmpfn, 'w')
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+        fh.close()
+        os.rename(tmpfn, self.manifest_fn)
+
+    def in_use(self, force=False):
+        """
+        Why this HDFS can't be started (None if it can): the manifest is of a running job that is not known to be gone.
+        With force, only warn (eg the job is gone, but the resource manager can't tell).
+        """
+        manifest = self.load()
+        jobid = manifest.get('jobid', None)
+        if manifest.get('state', None) != 'running' or jobid == job_id():
+            return None
+        gone = job_gone(jobid)
+        if gone:
+            return None
+        reason = "in use by job %s (%s)" % (jobid, ['still running', 'unknown state'][gone is None])
+        if force:
+            self.log.warn("Persistent HDFS %s %s, forced start" % (self.directory, reason))
+            return None
+        return reason
+
+    def check(self, hosts):
+        """
+        Pick how to continue with the datanodes on hosts.
+        Returns dict with mode (see PERSISTENT_MODES), the namespaceID and clusterID to keep (None for format)
+        and the missing hosts
+        """
+        res = {'mode': 'format', 'namespaceID': None, 'clusterID': None, 'missing': []}
+        version = read_version(self.name_dir)
+        namespaceid = version.get('namespaceID', None)
+        if not namespaceid or not glob.glob(os.path.join(self.name_dir, 'current', 'fsimage*')):
+            self.log.info("No valid namespace in %s, format" % self.name_dir)
+            return res
+
+        manifest = self.load()
+        for name in PERSISTENT_IDS:
+            if manifest.get(name, None) and version.get(name, None) and manifest[name] != version[name]:
+                self.log.warn("%s %s in %s is not the %s of the manifest, format" %
+                              (name, version[name], self.name_dir, manifest[name]))
+                return res
+        if manifest.get('state', None) == 'running' or not manifest.get('clean', True):
+            self.log.warn("Job %s did not stop cleanly, the edits will be replayed" % manifest.get('jobid', None))
+
+        previous = manifest.get('hosts', [])
+        missing = [x for x in previous if not x in hosts]
+        if previous and len(missing) == len(previous):
+            self.log.info("None of the hosts %s with blocks is in this job, format" % previous)
+            return res
+
+        res['namespaceID'] = namespaceid
+        res['clusterID'] = version.get('clusterID', None)
+        res['missing'] = missing
+        if missing:
+            res['mode'] = 'partial'
+            self.log.warn("Hosts %s with blocks are not in this job, partial reuse" % missing)
+        else:
+            res['mode'] = 'reuse'
+        self.log.info("Persistent HDFS %s: %s" % (self.directory, res))
+        return res
+
+    def start(self, jobid, mode):
+        """Record that job jobid uses this HDFS"""
+        manifest = self.load()
+        manifest.update({'jobid': jobid, 'state': 'running', 'mode': mode, 'started': time.time()})
+        self.save(manifest)
+
+    def stop(self, hosts, clean=True):
+        """Record the stop, with the hosts that hold the blocks now; clean: the namespace was saved"""
+        manifest = self.load()
+        manifest.update({
+            'state': 'stopped',
+            'clean': clean,
+            'stopped': time.time(),
+            'hosts': sorted(hosts),
+        })
+        version = read_version(self.name_dir)
+        manifest.update(dict([(x, version.get(x, None)) for x in PERSISTENT_IDS]))
+        self.save(manifest)
+
+
+def check_data_dir(directory, namespaceid, clusterid=None):
+    """
+    Remove the blocks in data directory directory if they are of another namespace; True if removed.
+    The blocks are only removed when the directory has an id that differs: the clusterID (Hadoop 2) or the
+    namespaceID (Hadoop 1, or of the block pools on Hadoop 2). With namespaceid None (format), all blocks are removed.
+    """
+    ids = storage_ids(directory)
+    if namespaceid is None:
+        other = ids['clusterID'] or ids['namespaceID']
+    elif clusterid is not None and ids['clusterID'] is not None:
+        other = ids['clusterID'] != clusterid and ids['clusterID']
+    else:
+        other = ids['namespaceID'] and not namespaceid in ids['namespaceID'] and ids['namespaceID']
+    if not other:
+        return False
+    fancylogger.getLogger('persistent', fname=False).warn(
+        "Removing blocks in %s of namespace %s (not %s %s)" % (directory, other, namespaceid, clusterid))
+    shutil.rmtree(directory)
+    os.makedirs(directory, 0700)
+    return True
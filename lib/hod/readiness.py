@@ -0,0 +1,202 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Readiness of started services: probes and waiting for them with exponential backoff
+
+@author: Stijn De Weirdt
+"""
+import errno
+import glob
+import os
+import re
+import socket
+import time
+
+from vsc import fancylogger
+
+
+READY_TIMEOUT = 300  # seconds per condition, from the start of the wait
+READY_DELAY_MIN = 0.1  # first delay between checks
+READY_DELAY_MAX = 10  # delays double up to this
+PROBE_CONNECT_TIMEOUT = 1
+
+
+class Probe(object):
+    """Base probe: check returns True when ready"""
+    def __init__(self, name):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        self.name = name
+
+    def check(self):
+        self.log.error("Not implemented check")
+        return False
+
+    def __str__(self):
+        return "%s %s" % (self.__class__.__name__, self.name)
+
+
+class PortProbe(Probe):
+    """Ready when host:port accepts a TCP connection"""
+    def __init__(self, host, port, name=None):
+        if host in (None, '0.0.0.0'):
+            host = 'localhost'
+        self.host = host
+        self.port = int(port)
+        if name is None:
+            name = "%s:%s" % (self.host, self.port)
+        Probe.__init__(self, name)
+
+    def check(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(PROBE_CONNECT_TIMEOUT)
+        try:
+            try:
+                sock.connect((self.host, self.port))
+                return True
+            except (socket.error, socket.timeout), err:
+                self.log.debug("Connect to %s:%s failed: %s" % (self.host, self.port, err))
+                return False
+        finally:
+            sock.close()
+
+
+class PidProbe(Probe):
+    """Ready when pidfile exists and the process with that pid is alive"""
+    def __init__(self, pidfile, name=None):
+        self.pidfile = pidfile
+        if name is None:
+            name = os.path.basename(pidfile)
+        Probe.__init__(self, name)
+
+    def pid(self):
+        """Pid from the pidfile (None if no valid pidfile)"""
+        try:
+            return int(open(self.pidfile).read().strip())
+        except (IOError, ValueError):
+            return None
+
+    def check(self):
+        pid = self.pid()
+        if pid is None:
+            return False
+        try:
+            os.kill(pid, 0)
+        except OSError, err:
+            return err.errno == errno.EPERM  # exists, but not ours
+        return True
+
+
+class LogProbe(Probe):
+    """Ready when the regex pattern appears in (one of) the files matching the glob logpattern"""
+    def __init__(self, logpattern, pattern, name=None):
+        self.logpattern = logpattern
+        self.regex = re.compile(pattern)
+        self.offsets = {}  # only read new data on each check
+        if name is None:
+            name = "%s in %s" % (pattern, os.path.basename(logpattern))
+        Probe.__init__(self, name)
+
+    def check(self):
+        for fn in glob.glob(self.logpattern):
+            try:
+                fh = open(fn)
+                fh.seek(self.offsets.get(fn, 0))
+                data = fh.read()
+                fh.close()
+            except IOError:
+                continue
+            # # restart from the beginning of the last incomplete line
+            self.offsets[fn] = self.offsets.get(fn, 0) + data.rfind('\n') + 1
+            if self.regex.search(data):
+                return True
+        return False
+
+
+class CommandProbe(Probe):
+    """Ready when command runs successfully and (if pattern is set) its output matches pattern"""
+    def __init__(self, command, pattern=None, name=None):
+        self.command = command
+        self.regex = None
+        if pattern is not None:
+            self.regex = re.compile(pattern)
+        if name is None:
+            name = "%s" % (command,)
+        Probe.__init__(self, name)
+
+    def check(self):
+        out, _ = self.command.run()
+        if not self.command.result.is_ok():
+            return False
+        return self.regex is None or self.regex.search(out) is not None
+
+
+class Readiness(object):
+    """
+    Readiness conditions to wait for.
+    The conditions are checked in the order they were added; a condition is only checked
+    once all previous ones are ready (eg don't run a command probe before the port is up).
+    """
+    def __init__(self, delay_min=READY_DELAY_MIN, delay_max=READY_DELAY_MAX):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        self.conditions = []  # list of (probe, timeout)
+        self.delay_min = delay_min
+        self.delay_max = delay_max
+        self.ready = {}  # probe name: seconds to become ready
+
+    def add(self, probe, timeout=READY_TIMEOUT):
+        """Add probe with timeout seconds (from the start of wait) to become ready"""
+        self.conditions.append((probe, timeout))
+
+    def __len__(self):
+        return len(self.conditions)
+
+    def wait(self, timeline=None, prefix=''):
+        """
+        Wait for all conditions, with exponential backoff between checks.
+        Ready times are added to timeline as 'prefix probename'.
+        Returns the list of probe names that were not ready before their timeout.
+        """
+        start = time.time()
+        failed = []
+        for probe, timeout in self.conditions:
+            deadline = start + timeout
+            delay = self.delay_min
+            while True:
+                if probe.check():
+                    now = time.time()
+                    self.ready[probe.name] = now - start
+                    self.log.debug("%s ready after %.2f seconds" % (probe, now - start))
+                    if timeline is not None:
+                        timeline.add(("%s ready %s" % (prefix, probe.name)).strip(), start, now)
+                    break
+
+                now = time.time()
+                if now >= deadline:
+                    self.log.error("%s not ready after %s seconds" % (probe, timeout))
+                    failed.append(probe.name)
+                    break
+                time.sleep(min(delay, deadline - now))
+                delay = min(delay * 2, self.delay_max)
+        return failed
@@ -30,10 +30,14 @@
 import os
 import sys
 
-from hod.rmscheduler.job import Job
+from hod.rmscheduler.job import Job, job_name
 from hod.rmscheduler.resourcemanagerscheduler import ResourceManagerScheduler
 
 from hod.config.hodoption import HodOption
+from hod.control import control_request, ControlError, CONTROL_ENDPOINT
+from hod.envsnapshot import make_snapshot
+from hod.jobdir import find_job, job_dir, list_jobs
+from hod.status import format_status
 
 
 class HodJob(Job):
@@ -49,10 +53,14 @@ class HodJob(Job):
         super(HodJob, self).__init__(options)
 
         self.exeout = None
+        self.envsnapshot = None
 
         # TODO abs path?
         self.pythonexe = 'python'
         self.hodexe, self.hodpythonpath = self.get_hod()
+        if self.options.options.hod_bundle:
+            # # the bundle (on the shared filesystem) is run instead of hod_main and copies itself to node-local tmp
+            self.hodexe = os.path.abspath(self.options.options.hod_bundle)
         self.hodargs = self.options.generate_cmd_line(ignore='^(%s)_' % '|'.join(self.OPTION_IGNORE_PREFIX))
 
         self.hodenvvarprefix = ['HADOOP', 'JAVA', 'HOD', 'MAPRED', 'HDFS']
@@ -86,6 +94,22 @@ class HodJob(Job):
         self.log.debug("Using default class ResourceManagerScheduler.")
         self.type_class = ResourceManagerScheduler
 
+    def generate_script(self):
+        """Build the submit script, with the environment snapshot of the modules made now"""
+        modules = self.generate_modules()
+        if modules and self.options.options.hod_envsnapshot:
+            self.envsnapshot = make_snapshot(modules, self.options.options.hod_jobdir,
+                                             extra=self.generate_extra_environment())
+        super(HodJob, self).generate_script()
+
+    def generate_environment(self):
+        """Source the environment snapshot (if any), with the module commands in case it is gone"""
+        script_env = super(HodJob, self).generate_environment()
+        if self.envsnapshot is None:
+            return script_env
+        return ["if [ -r %s ]; then" % self.envsnapshot, "    . %s" % self.envsnapshot, "else"] + \
+            ["    %s" % x for x in script_env] + ["fi"]
+
     def get_hod(self, exe_name='hod_main'):
         """Get the full path of the exe_name
              -look in bin or bin / .. / hod /
@@ -115,6 +139,20 @@ class HodJob(Job):
 
         return fn, hodpythondir
 
+    def live_status(self, jobid):
+        """Status of the running HOD cluster of job jobid, queried through its control endpoint"""
+        fulljobid = find_job(jobid, basedir=self.options.options.hod_jobdir)
+        if fulljobid is None:
+            return "No job directory for job %s" % jobid
+
+        try:
+            reply = control_request(job_dir(fulljobid, basedir=self.options.options.hod_jobdir), 'status')
+        except ControlError, err:
+            return "No live status for job %s: %s" % (fulljobid, err)
+        if not reply.get('ok', False):
+            return "Status query for job %s failed: %s" % (fulljobid, reply.get('error', 'unknown error'))
+        return format_status(reply)
+
     def run(self):
         """Do stuff based upon options"""
         options_dict = self.options.dict_by_prefix()
@@ -129,9 +167,13 @@ class HodJob(Job):
         elif actions.get('show', None):
             msg = self.type.state()
             print msg
+            print self.live_status(actions['show'])
         elif actions.get('showall', False):  # should be True
             msg = self.type.state()
             print msg
+            for jobid in list_jobs(self.options.options.hod_jobdir):
+                if os.path.exists(os.path.join(job_dir(jobid, basedir=self.options.options.hod_jobdir), CONTROL_ENDPOINT)):
+                    print self.live_status(jobid)
         else:
             self.log.error("Unknown action in actions %s" % actions)
 
@@ -178,8 +220,12 @@ class MympirunHod(HodJob):
 
         exe.extend(self.hodargs)
 
-        # pass the classname so the environment can be re-setup
-        exe.append("--hod-envclass=%s" % self.__class__.__name__)
+        if self.envsnapshot is None:
+            # pass the classname so the environment can be re-setup
+            exe.append("--hod-envclass=%s" % job_name(self.__class__))
+        else:
+            # the clients source the snapshot instead of running the module commands again
+            exe.append("--hod-envscript=%s" % self.envsnapshot)
 
         self.log.debug("Generated exe %s" % exe)
         return [" ".join(exe)]
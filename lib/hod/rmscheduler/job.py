@@ -27,7 +27,37 @@
 @author: Stijn De Weirdt
 """
 from vsc.utils.fancylogger import getLogger
-from vsc.utils.missing import get_subclasses
+
+# # name to import path of the job classes; get_job only imports the module of the requested class
+JOB_CLASSES = {
+    'HodJob': 'hod.rmscheduler.hodjob.HodJob',
+    'MympirunHod': 'hod.rmscheduler.hodjob.MympirunHod',
+    'EasybuildMMHod': 'hod.rmscheduler.hodjob.EasybuildMMHod',
+    'PbsEBMMHod': 'hod.rmscheduler.hodjob.PbsEBMMHod',
+}
+
+
+def job_class(classname):
+    """The job class for classname: a name in JOB_CLASSES or the import path (module.class) of a job class"""
+    path = JOB_CLASSES.get(classname, classname)
+    if not isinstance(path, basestring) or not '.' in path:
+        return None
+    modname, name = path.rsplit('.', 1)
+    try:
+        module = __import__(modname, fromlist=[name])
+    except ImportError, err:
+        getLogger().error("Failed to import job class %s from %s: %s" % (name, modname, err))
+        return None
+    return getattr(module, name, None)
+
+
+def job_name(cls):
+    """The name get_job knows cls by: its name in JOB_CLASSES or its import path"""
+    path = "%s.%s" % (cls.__module__, cls.__name__)
+    if JOB_CLASSES.get(cls.__name__, None) == path:
+        return cls.__name__
+    return path
+
 
 class Job(object):
     def __init__(self, options):
@@ -116,19 +146,15 @@ class Job(object):
         self.log.debug("Going to generate string for modules %s" % allmods)
         return ['module %s' % (" ".join(md)) for md in allmods]
 
-    @classmethod
-    def _is_job_for(cls, name):
-        """Returns True if this class implements something that can handle 'name'"""
-        return cls.__name__ == name
-
     @staticmethod
     def get_job(classname, options):
         """
         This is a job factory.
 
-        Returns an instance of classname initialized with options
+        Returns an instance of classname (see job_class) initialized with options
         """
-        for cls in get_subclasses(Job):
-            if cls._is_job_for(classname):
-                return cls(options)
-        getLogger().error("No job class found for %s", classname)
+        cls = job_class(classname)
+        if cls is None:
+            getLogger().error("No job class found for %s", classname)
+            return None
+        return cls(options)
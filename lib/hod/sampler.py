@@ -0,0 +1,265 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Resource sampling of the nodes and the daemons from /proc, and the cluster metrics time series
+
+Every rank samples its node and the daemons it started (see Sampler); the master aggregates the
+samples of all ranks per metric (min, mean, max, standard deviation and top N ranks, see aggregate)
+and appends them to a CSV time series in the job directory (see MetricsSeries).
+bin/hod_metrics.py summarizes a time series (see summarize).
+
+@author: Stijn De Weirdt
+"""
+import csv
+import math
+import os
+import time
+
+from vsc import fancylogger
+
+
+PROCDIR = '/proc'
+SYSBLOCKDIR = '/sys/block'
+METRICS_CSV = 'metrics.csv'
+METRICS_FIELDS = ['time', 'metric', 'count', 'min', 'mean', 'max', 'std', 'minrank', 'maxrank', 'top']
+METRICS_TOPN = 3
+SECTOR_SIZE = 512
+MB = 1024.0 * 1024
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def read_cpu(procdir=PROCDIR):
+    """(busy, total) cpu time in ticks over all cpus"""
+    fields = [int(x) for x in open(os.path.join(procdir, 'stat')).readline().split()[1:]]
+    total = sum(fields[:8])  # guest time is included in user time
+    idle = fields[3] + fields[4]  # idle + iowait
+    return total - idle, total
+
+
+def read_meminfo(procdir=PROCDIR):
+    """(used, total) memory in bytes"""
+    info = {}
+    for line in open(os.path.join(procdir, 'meminfo')):
+        name, value = line.split(':', 1)
+        info[name] = int(value.split()[0]) * 1024
+    available = info.get('MemAvailable', None)
+    if available is None:
+        available = info['MemFree'] + info.get('Cached', 0) + info.get('Buffers', 0)
+    return info['MemTotal'] - available, info['MemTotal']
+
+
+def read_diskstats(procdir=PROCDIR, sysblockdir=SYSBLOCKDIR):
+    """(read, written) bytes of all disks (no partitions, loop or ram devices)"""
+    read = written = 0
+    for line in open(os.path.join(procdir, 'diskstats')):
+        fields = line.split()
+        name = fields[2]
+        if name.startswith('loop') or name.startswith('ram') or not os.path.exists(os.path.join(sysblockdir, name)):
+            continue
+        read += int(fields[5]) * SECTOR_SIZE
+        written += int(fields[9]) * SECTOR_SIZE
+    return read, written
+
+
+def read_netdev(procdir=PROCDIR):
+    """(received, transmitted) bytes of all interfaces except lo"""
+    rx = tx = 0
+    for line in open(os.path.join(procdir, 'net', 'dev')).readlines()[2:]:
+        name, data = line.split(':', 1)
+        if name.strip() == 'lo':
+            continue
+        fields = data.split()
+        rx += int(fields[0])
+        tx += int(fields[8])
+    return rx, tx
+
+
+def read_pid(pid, procdir=PROCDIR):
+    """(cpu ticks, rss bytes, read bytes, written bytes) of process pid; None if it does not exist"""
+    try:
+        stat = open(os.path.join(procdir, str(pid), 'stat')).read()
+    except IOError:
+        return None
+    fields = stat[stat.rindex(')') + 2:].split()  # the command can contain spaces
+    ticks = int(fields[11]) + int(fields[12])  # utime + stime
+    rss = int(fields[21]) * PAGE_SIZE
+
+    read = written = None
+    try:
+        for line in open(os.path.join(procdir, str(pid), 'io')):
+            name, value = line.split(':', 1)
+            if name == 'read_bytes':
+                read = int(value)
+            elif name == 'write_bytes':
+                written = int(value)
+    except IOError:
+        pass  # eg not allowed
+    return ticks, rss, read, written
+
+
+class Sampler(object):
+    """Samples the node and a set of daemons; rates are computed from the previous sample"""
+    def __init__(self, procdir=PROCDIR, sysblockdir=SYSBLOCKDIR):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        self.procdir = procdir
+        self.sysblockdir = sysblockdir
+        self.previous = None  # (time, node counters, {daemon: (pid, counters)})
+
+    def sample(self, daemons):
+        """
+        Sample the node and the daemons {name: pid}.
+        Returns dict metric name: value (rates only from the second sample on):
+            node.cpu (%), node.mem (%), node.load, node.disk_read, node.disk_write, node.net_rx, node.net_tx (MB/s)
+            <daemon>.cpu (% of one core), <daemon>.rss (MB), <daemon>.io_read, <daemon>.io_write (MB/s)
+        """
+        now = time.time()
+        try:
+            node = read_cpu(self.procdir) + read_diskstats(self.procdir, self.sysblockdir) + read_netdev(self.procdir)
+            memused, memtotal = read_meminfo(self.procdir)
+            load = float(open(os.path.join(self.procdir, 'loadavg')).read().split()[0])
+        except (IOError, OSError, ValueError, IndexError, KeyError):
+            self.log.exception("Failed to sample node")
+            return {}
+
+        pids = {}
+        for name, pid in daemons.items():
+            if pid is not None:
+                counters = read_pid(pid, self.procdir)
+                if counters is not None:
+                    pids[name] = (pid, counters)
+
+        metrics = {
+            'node.mem': 100.0 * memused / memtotal,
+            'node.load': load,
+        }
+        for name, (pid, counters) in pids.items():
+            metrics['%s.rss' % name] = counters[1] / MB
+
+        if self.previous is not None:
+            ptime, pnode, ppids = self.previous
+            dt = now - ptime
+            if node[1] > pnode[1]:
+                metrics['node.cpu'] = 100.0 * (node[0] - pnode[0]) / (node[1] - pnode[1])
+            for idx, name in [(2, 'disk_read'), (3, 'disk_write'), (4, 'net_rx'), (5, 'net_tx')]:
+                metrics['node.%s' % name] = (node[idx] - pnode[idx]) / MB / dt
+
+            for name, (pid, counters) in pids.items():
+                if not name in ppids or ppids[name][0] != pid:
+                    continue  # new or restarted daemon
+                pcounters = ppids[name][1]
+                metrics['%s.cpu' % name] = 100.0 * (counters[0] - pcounters[0]) / CLK_TCK / dt
+                for idx, metric in [(2, 'io_read'), (3, 'io_write')]:
+                    if counters[idx] is not None and pcounters[idx] is not None:
+                        metrics['%s.%s' % (name, metric)] = (counters[idx] - pcounters[idx]) / MB / dt
+
+        self.previous = (now, node, pids)
+        return metrics
+
+
+def aggregate(samples, topn=METRICS_TOPN):
+    """
+    Aggregate the samples (list with the metrics dict of each rank) per metric.
+    Returns dict metric: dict with count, min, mean, max, std, minrank, maxrank and top (list of (rank, value))
+    """
+    values = {}
+    for rank, metrics in enumerate(samples):
+        for name, value in (metrics or {}).items():
+            values.setdefault(name, []).append((value, rank))
+
+    res = {}
+    for name, vals in values.items():
+        vals.sort(reverse=True)
+        count = len(vals)
+        mean = sum([x[0] for x in vals]) / count
+        res[name] = {
+            'count': count,
+            'min': vals[-1][0],
+            'mean': mean,
+            'max': vals[0][0],
+            'std': math.sqrt(sum([(x[0] - mean) ** 2 for x in vals]) / count),
+            'minrank': vals[-1][1],
+            'maxrank': vals[0][1],
+            'top': [(rank, value) for value, rank in vals[:topn]],
+        }
+    return res
+
+
+class MetricsSeries(object):
+    """CSV time series of aggregated metrics: one row per metric per sample time"""
+    def __init__(self, filename):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        self.filename = filename
+
+    def append(self, aggregates, when=None):
+        """Append the aggregates (as returned by aggregate)"""
+        if when is None:
+            when = time.time()
+        new = not os.path.exists(self.filename)
+        try:
+            fh = open(self.filename, 'a')
+            writer = csv.writer(fh)
+            if new:
+                writer.writerow(METRICS_FIELDS)
+            for name in sorted(aggregates):
+                agg = aggregates[name]
+                top = ' '.join(["%s:%.2f" % x for x in agg['top']])
+                writer.writerow(["%.0f" % when, name, agg['count']] +
+                                ["%.3f" % agg[x] for x in ('min', 'mean', 'max', 'std')] +
+                                [agg['minrank'], agg['maxrank'], top])
+            fh.close()
+        except IOError:
+            self.log.exception("Failed to append metrics to %s" % self.filename)
+
+
+def summarize(filename, topn=METRICS_TOPN):
+    """
+    Summary per metric of a metrics time series: samples, mean, peak (and its rank), imbalance
+    (average max/mean over the samples) and the ranks that were most often in the top N (the hotspots).
+    """
+    metrics = {}
+    for row in csv.DictReader(open(filename)):
+        summ = metrics.setdefault(row['metric'], {'samples': 0, 'mean': 0.0, 'peak': None, 'peakrank': None,
+                                                  'imbalance': 0.0, 'hotspots': {}})
+        summ['samples'] += 1
+        summ['mean'] += float(row['mean'])
+        if summ['peak'] is None or float(row['max']) > summ['peak']:
+            summ['peak'] = float(row['max'])
+            summ['peakrank'] = int(row['maxrank'])
+        if float(row['mean']) > 0:
+            summ['imbalance'] += float(row['max']) / float(row['mean'])
+        else:
+            summ['imbalance'] += 1
+        for top in row['top'].split():
+            rank = int(top.split(':')[0])
+            summ['hotspots'][rank] = summ['hotspots'].get(rank, 0) + 1
+
+    for summ in metrics.values():
+        summ['mean'] /= summ['samples']
+        summ['imbalance'] /= summ['samples']
+        hotspots = sorted(summ['hotspots'].items(), key=lambda x: (-x[1], x[0]))
+        summ['hotspots'] = hotspots[:topn]
+    return metrics
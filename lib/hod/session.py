@@ -0,0 +1,361 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Named shell sessions in a pseudo terminal
+
+The session runs a shell in a pty. All its output is logged, commands are confirmed by reading
+a completion marker from the output, and the session can be attached to through a unix socket
+(see bin/hod_attach.py).
+
+@author: Stijn De Weirdt
+"""
+import errno
+import fcntl
+import os
+import pty
+import pwd
+import random
+import re
+import select
+import socket
+import subprocess
+import sys
+import tempfile
+import termios
+import threading
+import time
+import tty
+
+from vsc import fancylogger
+
+
+CLIENT_SESSION_DEFAULT = 'HODclient'
+SESSION_SHELL = ['/bin/bash', '-i']
+SESSION_TIMEOUT = 60  # seconds to wait for a completion marker
+SESSION_READ_SIZE = 4096
+SESSION_SOCKET_SUFFIX = '.sock'
+DETACH_KEY = '\x1d'  # ctrl-]
+
+
+def session_dir():
+    """Directory with the session sockets of the current user (node local, like the screen sockets)"""
+    user = pwd.getpwuid(os.getuid())[0]
+    return os.path.join(tempfile.gettempdir(), 'hod-%s' % user, 'sessions')
+
+
+def session_socket(name, sessiondir=None):
+    """Socket of session name"""
+    if sessiondir is None:
+        sessiondir = session_dir()
+    return os.path.join(sessiondir, "%s%s" % (name, SESSION_SOCKET_SUFFIX))
+
+
+def list_sessions(sessiondir=None):
+    """Names of the sessions with a socket in sessiondir"""
+    if sessiondir is None:
+        sessiondir = session_dir()
+    if not os.path.isdir(sessiondir):
+        return []
+    return sorted([fn[:-len(SESSION_SOCKET_SUFFIX)] for fn in os.listdir(sessiondir)
+                   if fn.endswith(SESSION_SOCKET_SUFFIX)])
+
+
+def _set_controlling_tty():
+    """preexec_fn: make the pty (stdin) the controlling terminal of a new session, for job control"""
+    os.setsid()
+    fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+
+
+class PtySession(object):
+    """A named shell session in a pty"""
+    def __init__(self, name, logfn=None, sessiondir=None, shell=None):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+
+        self.name = name
+        self.logfn = logfn
+        self.sockfn = session_socket(name, sessiondir=sessiondir)
+        if shell is None:
+            shell = SESSION_SHELL
+        self.shell = shell
+
+        self.proc = None
+        self.master = None
+        self.server = None
+        self.clients = []
+        self.logfh = None
+
+        # # markers are printed by printf from separate words, so the echo of the typed command never matches
+        self.marker = 'HOD%06x' % random.randint(0, 0xffffff)
+        self.marker_reg = re.compile(r"%s_(\d+)_(\d+)" % self.marker)
+        self.marker_counter = 0
+        self.markers = {}  # marker id: exitcode
+        self._scanned = ''  # tail of the output, so markers split over reads are found
+
+        self._cond = threading.Condition()
+        self._thread = None
+        self._wakeup = None  # pipe to interrupt the relay thread
+        self._stopping = False
+
+    def start(self):
+        """Start the shell and the relay thread. Returns True on success."""
+        sockdir = os.path.dirname(self.sockfn)
+        try:
+            if not os.path.isdir(sockdir):
+                os.makedirs(sockdir, 0700)
+            if os.path.exists(self.sockfn):
+                self.log.warn("Removing existing socket %s for session %s" % (self.sockfn, self.name))
+                os.remove(self.sockfn)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(self.sockfn)
+            os.chmod(self.sockfn, 0600)
+            self.server.listen(5)
+        except (OSError, IOError, socket.error):
+            self.log.exception("Failed to create socket %s for session %s" % (self.sockfn, self.name))
+            return False
+
+        if self.logfn:
+            try:
+                self.logfh = open(self.logfn, 'a')
+            except IOError:
+                self.log.exception("Failed to open log %s for session %s. Not logging." % (self.logfn, self.name))
+
+        (self.master, slave) = pty.openpty()
+        try:
+            self.proc = subprocess.Popen(self.shell, stdin=slave, stdout=slave, stderr=slave, close_fds=True,
+                                         preexec_fn=_set_controlling_tty)
+        except OSError:
+            self.log.exception("Failed to start shell %s for session %s" % (self.shell, self.name))
+            os.close(slave)
+            return False
+        os.close(slave)
+
+        self._wakeup = os.pipe()
+        self._thread = threading.Thread(target=self._relay, name="session-%s" % self.name)
+        self._thread.setDaemon(True)
+        self._thread.start()
+        self.log.debug("Started session %s shell %s pid %s socket %s log %s" %
+                       (self.name, self.shell, self.proc.pid, self.sockfn, self.logfn))
+        return True
+
+    def is_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def send(self, txt):
+        """Type txt in the session"""
+        self.log.debug("Sending %r to session %s" % (txt, self.name))
+        while txt:
+            written = os.write(self.master, txt)
+            txt = txt[written:]
+
+    def run(self, command, wait=True, timeout=SESSION_TIMEOUT):
+        """
+        Run command in the session.
+            wait: confirm the command finished, return its exitcode
+            not wait: only confirm the command started (eg a long running script), return 0
+        Returns None when no confirmation was seen within timeout seconds.
+        """
+        self.marker_counter += 1
+        markerid = self.marker_counter
+        marker_cmd = self._marker_command(markerid)
+        if wait:
+            self.send("%s\n%s\n" % (command, marker_cmd))
+        else:
+            self.send("%s; %s\n" % (marker_cmd, command))
+
+        ec = self.wait_marker(markerid, timeout=timeout)
+        if ec is None:
+            self.log.error("No confirmation for command %s in session %s after %s seconds" %
+                           (command, self.name, timeout))
+        elif wait:
+            self.log.debug("Command %s in session %s finished with exitcode %s" % (command, self.name, ec))
+        else:
+            self.log.debug("Command %s in session %s started" % (command, self.name))
+            ec = 0
+        return ec
+
+    def mark(self):
+        """Type a marker command (runs after whatever runs now), return its id without waiting for it"""
+        self.marker_counter += 1
+        self.send("%s\n" % self._marker_command(self.marker_counter))
+        return self.marker_counter
+
+    def _marker_command(self, markerid):
+        """Command that prints marker markerid with the exitcode of the previous command"""
+        return "printf '%%s_%%s_%%s\\n' %s %s $?" % (self.marker, markerid)
+
+    def is_marked(self, markerid):
+        """Has marker markerid been seen"""
+        return markerid in self.markers
+
+    def wait_marker(self, markerid, timeout=SESSION_TIMEOUT):
+        """Wait for marker markerid, return the exitcode it reported (None on timeout)"""
+        deadline = time.time() + timeout
+        self._cond.acquire()
+        try:
+            while markerid not in self.markers:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self.is_alive():
+                    return None
+                self._cond.wait(remaining)
+            return self.markers[markerid]
+        finally:
+            self._cond.release()
+
+    def stop(self, timeout=10):
+        """Exit the shell (kill it after timeout seconds), stop relaying and remove the socket"""
+        if self.proc is None:
+            return
+        if self.is_alive():
+            self.log.debug("Stopping session %s" % self.name)
+            try:
+                self.send("exit\n")
+            except OSError:
+                pass
+            deadline = time.time() + timeout
+            while self.is_alive() and time.time() < deadline:
+                time.sleep(0.1)
+            if self.is_alive():
+                self.log.warn("Session %s shell did not exit after %s seconds, killing it" % (self.name, timeout))
+                os.kill(self.proc.pid, 9)
+                self.proc.wait()
+
+        self._stopping = True
+        if self._thread is not None:
+            os.write(self._wakeup[1], 'x')
+            self._thread.join(timeout)
+
+    def _scan(self, data):
+        """Look for completion markers in the output"""
+        txt = self._scanned + data
+        found = dict([(int(x), int(y)) for x, y in self.marker_reg.findall(txt)])
+        self._scanned = txt[-128:]
+        if found:
+            self._cond.acquire()
+            try:
+                self.markers.update(found)
+                self._cond.notify_all()
+            finally:
+                self._cond.release()
+
+    def _output(self, data):
+        """Log, scan and forward output of the shell"""
+        if self.logfh is not None:
+            self.logfh.write(data)
+            self.logfh.flush()
+        self._scan(data)
+        for client in self.clients[:]:
+            try:
+                client.sendall(data)
+            except socket.error:
+                self._drop_client(client)
+
+    def _drop_client(self, client):
+        self.log.debug("Client detached from session %s" % self.name)
+        self.clients.remove(client)
+        client.close()
+
+    def _relay(self):
+        """Relay between the pty, the log and the attached clients until the shell exits or stop is called"""
+        master_open = True
+        while master_open and not self._stopping:
+            fds = [self.master, self.server, self._wakeup[0]] + self.clients
+            try:
+                ready, _, _ = select.select(fds, [], [])
+            except select.error, err:
+                if err.args[0] == errno.EINTR:
+                    continue
+                raise
+
+            for fd in ready:
+                if fd == self.master:
+                    try:
+                        data = os.read(self.master, SESSION_READ_SIZE)
+                    except OSError:
+                        data = ''  # EIO: shell exited
+                    if data:
+                        self._output(data)
+                    else:
+                        master_open = False
+                elif fd == self.server:
+                    client, _ = self.server.accept()
+                    self.log.debug("Client attached to session %s" % self.name)
+                    self.clients.append(client)
+                elif fd == self._wakeup[0]:
+                    os.read(self._wakeup[0], 1)
+                elif fd in self.clients:  # might have been dropped while forwarding output
+                    try:
+                        data = fd.recv(SESSION_READ_SIZE)
+                    except socket.error:
+                        data = ''
+                    if data:
+                        self.send(data)
+                    else:
+                        self._drop_client(fd)
+
+        self.log.debug("Relay of session %s ended" % self.name)
+        self._cond.acquire()
+        self._cond.notify_all()  # wake up any waiters, the shell is gone
+        self._cond.release()
+
+        for client in self.clients[:]:
+            self._drop_client(client)
+        self.server.close()
+        try:
+            os.remove(self.sockfn)
+        except OSError:
+            pass
+        os.close(self.master)
+        if self.logfh is not None:
+            self.logfh.close()
+
+
+def attach(sockfn):
+    """Attach the current terminal to the session with socket sockfn, until DETACH_KEY is typed"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(sockfn)
+
+    stdin = sys.stdin.fileno()
+    is_tty = os.isatty(stdin)
+    if is_tty:
+        old = termios.tcgetattr(stdin)
+        tty.setraw(stdin)
+    try:
+        sock.sendall('\n')  # get a fresh prompt
+        while True:
+            ready, _, _ = select.select([stdin, sock], [], [])
+            if sock in ready:
+                data = sock.recv(SESSION_READ_SIZE)
+                if not data:
+                    break
+                os.write(sys.stdout.fileno(), data)
+            if stdin in ready:
+                data = os.read(stdin, SESSION_READ_SIZE)
+                if not data or DETACH_KEY in data:
+                    break
+                sock.sendall(data)
+    finally:
+        if is_tty:
+            termios.tcsetattr(stdin, termios.TCSADRAIN, old)
+        sock.close()
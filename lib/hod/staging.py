@@ -0,0 +1,225 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Stage datasets between the shared filesystem and HDFS
+
+A stage pair SRC:DEST copies the file or directory tree SRC to DEST: from the shared filesystem into
+HDFS (stage-in, once HDFS is ready) or from HDFS to the shared filesystem (stage-out, before HDFS is
+stopped). The master lists the files and spreads them over the ranks, balanced by the number of
+blocks; every rank copies its files with a few concurrent hadoop fs commands.
+
+A manifest records the copied files: every rank appends the files it copied to its own part of the
+manifest, so a copy that was interrupted (eg by the end of the walltime) continues with the files that
+are not copied yet. The stage-out manifest is next to the destination (DEST.hodstage.json), the stage-in
+manifest in the base of the job directories (the source may be read-only).
+
+@author: Stijn De Weirdt
+"""
+import getpass
+import hashlib
+import json
+import os
+import posixpath
+import re
+import time
+
+from vsc import fancylogger
+
+
+STAGE_DIRECTIONS = ['in', 'out']
+STAGE_MANIFEST_SUFFIX = '.hodstage.json'
+STAGE_IN_PREFIX = 'hodstage-in.'  # manifests of the stage-in pairs in the base of the job directories
+STAGE_BLOCK = 64 * 1024 * 1024  # weight of the files: number of blocks of this size
+STAGE_COPY_TIMEOUT = 6 * 3600  # seconds per file
+HDFS_HOME_BASE = '/user'  # hadoop default parent of the user home directories
+HDFS_URI_REGEX = re.compile(r'^[a-zA-Z][\w+.-]*://[^/]*')  # scheme and authority of a qualified path
+
+
+def parse_stage(specs):
+    """List of (source, destination) from the SRC:DEST stage specs"""
+    pairs = []
+    for spec in specs:
+        if not ':' in spec:
+            fancylogger.getLogger('staging', fname=False).error("Invalid stage %s, not SRC:DEST" % spec)
+            continue
+        source, dest = spec.split(':', 1)
+        pairs.append((source, dest))
+    return pairs
+
+
+def stage_shared(direction, source, dest, basedir):
+    """The path of the manifest of the stage pair (without suffix): in basedir for stage-in, next to dest otherwise"""
+    if direction == 'in':
+        return os.path.join(basedir, "%s%s" % (STAGE_IN_PREFIX, hashlib.md5("%s:%s" % (source, dest)).hexdigest()))
+    return dest
+
+
+def local_files(top):
+    """Sorted list of (relative path, size) of the files in top (relative path '' if top is a file)"""
+    if os.path.isfile(top):
+        return [('', os.path.getsize(top))]
+    files = []
+    for dirpath, _, filenames in os.walk(top):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            files.append((os.path.relpath(path, top), os.path.getsize(path)))
+    files.sort()
+    return files
+
+
+def hdfs_home():
+    """Default HDFS home directory of the current user"""
+    return posixpath.join(HDFS_HOME_BASE, getpass.getuser())
+
+
+def parse_hdfs_ls(out, top, home=None):
+    """
+    Sorted list of (relative path, size) of the files in the recursive listing out of top
+    (hadoop fs -ls -R output: permissions replication owner group size date time path)
+
+    Hadoop 2 lists the paths as given, Hadoop 1 lists them absolute, so a relative top is
+    also looked for in the HDFS home directory home (default: hdfs_home()).
+    Paths only match top on a path boundary, scheme and authority are ignored.
+    """
+    base = top.rstrip('/') or '/'
+    prefixes = [base]
+    if not base.startswith('/'):
+        if home is None:
+            home = hdfs_home()
+        prefixes.append(posixpath.join(home, base))
+
+    files = []
+    for line in out.splitlines():
+        fields = line.split(None, 7)
+        if len(fields) != 8 or fields[0].startswith('d') or not fields[4].isdigit():
+            continue
+        path = HDFS_URI_REGEX.sub('', fields[7])
+        for prefix in prefixes:
+            if path == prefix:
+                relpath = ''
+            elif path.startswith(prefix.rstrip('/') + '/'):
+                relpath = path[len(prefix.rstrip('/')) + 1:]
+            else:
+                continue
+            files.append((relpath, int(fields[4])))
+            break
+    files.sort()
+    return files
+
+
+def stage_path(top, relpath):
+    """Path of relpath in top"""
+    if relpath:
+        return os.path.join(top, relpath)
+    return top
+
+
+def assign(files, nr, block=STAGE_BLOCK):
+    """Spread the (relative path, size) files over nr ranks, largest first to the least loaded rank"""
+    load = [0] * nr
+    assigned = [[] for _ in range(nr)]
+    for relpath, size in sorted(files, key=lambda x: x[1], reverse=True):
+        weight = max(1, (size + block - 1) // block)
+        rank = load.index(min(load))
+        assigned[rank].append((relpath, size))
+        load[rank] += weight
+    return assigned
+
+
+def throughput(size, seconds):
+    """MB/s"""
+    if seconds <= 0:
+        return 0.0
+    return size / (1024.0 * 1024) / seconds
+
+
+class StageManifest(object):
+    """The copied files of a stage pair"""
+    def __init__(self, shared):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        self.filename = "%s%s" % (shared.rstrip('/'), STAGE_MANIFEST_SUFFIX)
+
+    def part(self, rank):
+        """The part of the manifest that rank appends to"""
+        return "%s.%s" % (self.filename, rank)
+
+    def parts(self):
+        """The existing parts"""
+        dirname, basename = os.path.split(self.filename)
+        prefix = "%s." % basename
+        try:
+            names = os.listdir(dirname or '.')
+        except OSError:
+            return []
+        return [os.path.join(dirname, x) for x in sorted(names) if x.startswith(prefix) and x[len(prefix):].isdigit()]
+
+    def load(self):
+        """Dict with the manifest; 'done' maps the copied relative paths to their size"""
+        try:
+            manifest = json.load(open(self.filename))
+        except (IOError, ValueError):
+            manifest = {}
+        manifest.setdefault('done', {})
+        for part in self.parts():
+            for line in open(part):
+                try:
+                    relpath, size = json.loads(line)
+                except ValueError:
+                    continue  # line of an interrupted append
+                manifest['done'][relpath] = size
+        return manifest
+
+    def todo(self, files, existing):
+        """The (relative path, size) files that are not copied yet: not in the manifest or not as destination"""
+        done = self.load()['done']
+        existing = dict(existing)
+        return [(relpath, size) for relpath, size in files
+                if not (done.get(relpath, None) == size and existing.get(relpath, None) == size)]
+
+    def record(self, rank, relpath, size):
+        """Record that rank copied relpath"""
+        try:
+            fh = open(self.part(rank), 'a')
+            fh.write("%s\n" % json.dumps([relpath, size]))
+            fh.close()
+        except IOError, err:
+            self.log.warn("Failed to record %s in manifest %s: %s" % (relpath, self.part(rank), err))
+
+    def save(self, **info):
+        """Merge the parts into the manifest and add info (eg the state and the throughput)"""
+        manifest = self.load()
+        manifest.update(info)
+        tmpfn = "%s.tmp" % self.filename
+        try:
+            fh = open(tmpfn, 'w')
+            json.dump(manifest, fh, indent=1, sort_keys=True)
+            fh.close()
+            os.rename(tmpfn, self.filename)
+        except (IOError, OSError), err:
+            self.log.warn("Failed to write manifest %s: %s" % (self.filename, err))
+            return manifest
+        for part in self.parts():
+            os.remove(part)
+        return manifest
@@ -0,0 +1,209 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Status model of a running HOD job, kept by the master
+
+The model holds the job state, the ranks, the distribution of the work and the state of the
+daemons on all ranks. It is updated incrementally (see MpiService.report_status), answers the
+status query of the control endpoint and is dumped as JSON snapshot in the job directory.
+
+@author: Stijn De Weirdt
+"""
+import copy
+import json
+import os
+import threading
+import time
+
+from vsc import fancylogger
+
+from hod.distribution import work_name
+
+
+STATUS_SNAPSHOT = 'status.json'
+STATUS_EVENTS_KEEP = 100  # last daemon events kept in the model
+STATUS_EVENTS_SHOW = 10  # last daemon events in the text format
+
+
+class StatusModel(object):
+    """Thread safe status model: updated by the master, queried by the control endpoint thread"""
+    def __init__(self, jobid, snapshot=None):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        self.lock = threading.Lock()
+        self.snapshot = snapshot
+
+        now = time.time()
+        self.data = {
+            'jobid': jobid,
+            'state': 'starting',
+            'started': now,
+            'updated': now,
+            'ranks': {},  # rank: node info
+            'work': {},  # work name: ranks, state
+            'daemons': {},  # rank: {daemon key: daemon info}
+            'shutdown': {},  # planned time of the walltime end and of the drain and stop requests
+            'events': [],  # daemon events (eg crashed, restarted, see hod.watchdog), oldest first
+        }
+
+    def _update(self, func, *args):
+        """Run func(data, *args) with the lock held"""
+        self.lock.acquire()
+        try:
+            func(self.data, *args)
+            self.data['updated'] = time.time()
+        finally:
+            self.lock.release()
+
+    def set_state(self, state):
+        """Set the job state (starting, running, draining, stopping, done)"""
+        def func(data):
+            data['state'] = state
+        self._update(func)
+
+    def set_ranks(self, allnodes):
+        """Set the node info of all ranks (from MpiService.allnodes)"""
+        def func(data):
+            for rank, node in enumerate(allnodes):
+                data['ranks'][str(rank)] = {'fqdn': node['fqdn'], 'cores': node['cores'], 'pid': node['pid']}
+        self._update(func)
+
+    def set_dists(self, dists):
+        """Set the planned work and its ranks (from MpiService.dists)"""
+        def func(data):
+            for wrk in dists:
+                data['work'][work_name(wrk[0])] = {'ranks': list(wrk[1]), 'state': 'planned'}
+        self._update(func)
+
+    def set_shutdown(self, shutdown):
+        """Set the planned shutdown (see hod.walltime.ShutdownPlan.info)"""
+        def func(data):
+            data['shutdown'] = dict(shutdown)
+        self._update(func)
+
+    def update_work(self, name, **kwargs):
+        """Update the info of work name (eg state, started, max_age)"""
+        def func(data):
+            work = data['work'].setdefault(name, {})
+            if 'state' in kwargs and kwargs['state'] != work.get('state', None):
+                work['since'] = time.time()
+            work.update(kwargs)
+        self._update(func)
+
+    def update_daemons(self, rank, changes):
+        """Apply changes {daemon key: info or None (removed)} of the daemons on rank"""
+        if not changes:
+            return
+
+        def func(data):
+            daemons = data['daemons'].setdefault(str(rank), {})
+            for key, info in changes.items():
+                if info is None:
+                    daemons.pop(key, None)
+                else:
+                    daemons[key] = info
+        self._update(func)
+
+    def add_events(self, rank, events):
+        """Add the daemon events of rank"""
+        if not events:
+            return
+
+        def func(data):
+            for event in events:
+                event = dict(event)
+                event['rank'] = rank
+                data['events'].append(event)
+            del data['events'][:-STATUS_EVENTS_KEEP]
+        self._update(func)
+
+    def query(self, request=None):
+        """Copy of the model, with the uptimes and remaining times computed now"""
+        self.lock.acquire()
+        try:
+            res = copy.deepcopy(self.data)
+        finally:
+            self.lock.release()
+
+        now = time.time()
+        res['now'] = now
+        res['uptime'] = now - res['started']
+        for work in res['work'].values():
+            if 'started' in work:
+                work['uptime'] = now - work['started']
+                if 'max_age' in work:
+                    work['remaining'] = work['max_age'] - work['uptime']
+        res['shutdown_in'] = dict([(key, when - now) for key, when in res['shutdown'].items()])
+        for daemons in res['daemons'].values():
+            for info in daemons.values():
+                if info.get('alive', False) and info.get('started', None):
+                    info['uptime'] = now - info['started']
+        return res
+
+    def write_snapshot(self):
+        """Write the model as JSON to the snapshot file (atomically)"""
+        if self.snapshot is None:
+            return
+        tmpfn = "%s.tmp" % self.snapshot
+        try:
+            fh = open(tmpfn, 'w')
+            json.dump(self.query(), fh, indent=1, sort_keys=True)
+            fh.close()
+            os.rename(tmpfn, self.snapshot)
+        except (IOError, OSError):
+            self.log.exception("Failed to write status snapshot %s" % self.snapshot)
+
+
+def format_status(status):
+    """Human readable text of a status (as returned by StatusModel.query)"""
+    txt = ["Job %s: %s (uptime %ds)" % (status['jobid'], status['state'], status['uptime'])]
+    shutdown_in = status.get('shutdown_in', {})
+    if shutdown_in:
+        txt.append("  walltime ends in %ds: %s" % (shutdown_in['end'],
+                   ', '.join(["%s in %ds" % (x, shutdown_in[x]) for x in ('drain', 'stop') if x in shutdown_in])))
+    for name, work in sorted(status['work'].items()):
+        extra = ''
+        if 'remaining' in work:
+            extra = ' remaining %ds' % work['remaining']
+        txt.append("  work %s: %s on ranks %s%s" % (name, work.get('state', '?'), work.get('ranks', '?'), extra))
+    for rank, daemons in sorted(status['daemons'].items(), key=lambda x: int(x[0])):
+        fqdn = status['ranks'].get(rank, {}).get('fqdn', '?')
+        for key, info in sorted(daemons.items()):
+            state = 'alive' if info['alive'] else 'DEAD'
+            ports = ' '.join(["%s" % info['ports'][x] for x in sorted(info['ports'])])
+            uptime = ''
+            if 'uptime' in info:
+                uptime = ' uptime %ds' % info['uptime']
+            restarts = ''
+            if info.get('restarts', 0) or info.get('lost', 0):
+                restarts = ' restarts %s lost %ds' % (info['restarts'], info['lost'])
+            txt.append("  rank %s %s %s: %s pid %s%s heap %s ports %s%s" %
+                       (rank, fqdn, key, state, info['pid'], uptime, info['heap'], ports, restarts))
+    for event in status.get('events', [])[-STATUS_EVENTS_SHOW:]:
+        extra = ''
+        if 'latency' in event:
+            extra = ' latency %.1fs lost %.1fs' % (event['latency'], event['lost'])
+        txt.append("  event %s rank %s %s/%s: %s%s" % (time.strftime('%H:%M:%S', time.localtime(event['time'])),
+                   event['rank'], event.get('work', '?'), event['daemon'], event['event'], extra))
+    return "\n".join(txt)
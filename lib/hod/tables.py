@@ -0,0 +1,120 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Create HBase tables pre-split over the regionservers and bulk load HFiles into them
+
+The table spec file is a JSON list of tables:
+    {"name": "events", "families": ["d"], "keys": "hex", "regions_per_server": 2, "hfiles": "/staged/events"}
+keys is the layout of the row keys the regions are split on: 'hex' (uniform hex strings, eg hashed keys),
+'decimal' (zero padded numbers of 'width' digits) or an explicit list of split keys. hfiles is a directory in
+HDFS with HFiles in a subdirectory per family (eg a stage-in destination), loaded once the table exists.
+
+@author: Stijn De Weirdt
+"""
+import json
+import re
+
+from vsc import fancylogger
+
+
+TABLE_KEYS = ['hex', 'decimal']
+TABLE_DECIMAL_WIDTH = 10
+TABLE_REGIONS_PER_SERVER = 1
+TABLE_SCRIPT = 'hodtables.rb'
+TABLE_SERVERS_WAIT = 300  # seconds to wait for all regionservers to register with the master
+TABLE_SERVERS_POLL = 10
+TABLE_LOAD_TIMEOUT = 3600  # seconds per bulk load (HFiles that span several regions are split first)
+TABLE_FLUSHED = 'HOD flushed all tables'
+TABLE_FLUSH_SCRIPT = """admin = org.apache.hadoop.hbase.client.HBaseAdmin.new(org.apache.hadoop.hbase.HBaseConfiguration.create)
+admin.listTables.each { |table| admin.flush(table.getNameAsString) }
+puts '%s'
+exit
+""" % TABLE_FLUSHED
+
+_log = fancylogger.getLogger('tables', fname=False)
+
+
+def load_tables(filename):
+    """The valid table specs (list of dicts) from the JSON table spec file filename"""
+    try:
+        specs = json.load(open(filename))
+    except (IOError, OSError, ValueError), err:
+        _log.error("Failed to load the HBase table specs from %s: %s" % (filename, err))
+        return []
+    if not isinstance(specs, list):
+        specs = [specs]
+
+    tables = []
+    for spec in specs:
+        if not isinstance(spec, dict) or not spec.get('name', None) or not spec.get('families', None):
+            _log.error("Invalid HBase table spec %s in %s: no name or families" % (spec, filename))
+            continue
+        keys = spec.setdefault('keys', TABLE_KEYS[0])
+        if not isinstance(keys, list) and not keys in TABLE_KEYS:
+            _log.error("Invalid keys %s of HBase table %s: one of %s or a list" % (keys, spec['name'], TABLE_KEYS))
+            continue
+        spec.setdefault('regions_per_server', TABLE_REGIONS_PER_SERVER)
+        tables.append(spec)
+    return tables
+
+
+def split_keys(keys, regions, width=TABLE_DECIMAL_WIDTH):
+    """The regions - 1 split keys for the keys layout (one of TABLE_KEYS), or keys itself for a list of keys"""
+    if isinstance(keys, list):
+        return sorted(keys)
+    if keys == 'hex':
+        return ['%08x' % (x * 2 ** 32 / regions) for x in range(1, regions)]
+    return ['%0*d' % (width, x * 10 ** width / regions) for x in range(1, regions)]
+
+
+def ruby_string(txt):
+    """txt as a single quoted string for the hbase shell"""
+    return "'%s'" % txt.replace('\\', '\\\\').replace("'", "\\'")
+
+
+def create_table(spec, servers):
+    """The hbase shell command to create the table of spec, pre-split over servers regionservers"""
+    regions = max(servers * spec['regions_per_server'], 1)
+    families = ', '.join(['{NAME => %s}' % ruby_string(x) for x in spec['families']])
+    keys = split_keys(spec['keys'], regions, spec.get('width', TABLE_DECIMAL_WIDTH))
+    cmd = "create %s, %s" % (ruby_string(spec['name']), families)
+    if keys:
+        cmd += ", {SPLITS => [%s]}" % ', '.join([ruby_string(x) for x in keys])
+    return cmd
+
+
+def tables_script(tables, servers):
+    """The hbase shell script to create tables; an existing table is left as it is"""
+    lines = [create_table(spec, servers) for spec in tables]
+    lines.append('exit')
+    return "\n".join(lines) + "\n"
+
+
+def live_servers(status):
+    """The number of live regionservers in the output of the hbase shell status command (None if not found)"""
+    reg = re.search(r"(\d+)\s+(?:live\s+)?servers", status)
+    if reg:
+        return int(reg.group(1))
+    return None
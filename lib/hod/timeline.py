@@ -0,0 +1,89 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Timeline of the startup (and other phases) of the services
+
+@author: Stijn De Weirdt
+"""
+import os
+import time
+
+from vsc import fancylogger
+
+
+def process_start(pid='self'):
+    """Start time (epoch) of process pid from /proc (None if unknown)"""
+    try:
+        # # the command name (2nd field) can contain spaces, the start time is the 20th field after it
+        stat = open('/proc/%s/stat' % pid).read()
+        ticks = int(stat[stat.rindex(')') + 2:].split()[19])
+        btime = [int(x.split()[1]) for x in open('/proc/stat').readlines() if x.startswith('btime')][0]
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+    return btime + float(ticks) / os.sysconf('SC_CLK_TCK')
+
+
+class Timeline(object):
+    """Ordered named events with start and end time"""
+    def __init__(self, t0=None):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        if t0 is None:
+            t0 = time.time()
+        self.t0 = t0
+        self.events = []  # list of [name, start, end]; end is None while running
+
+    def start(self, name):
+        """Start event name now"""
+        self.events.append([name, time.time(), None])
+
+    def end(self, name):
+        """End the last started event with name now. Returns its duration."""
+        for event in reversed(self.events):
+            if event[0] == name and event[2] is None:
+                event[2] = time.time()
+                return event[2] - event[1]
+        self.log.error("No running event %s to end" % name)
+
+    def add(self, name, start, end=None):
+        """Add event name with start and end time"""
+        if end is None:
+            end = time.time()
+        self.events.append([name, start, end])
+
+    def duration(self, name):
+        """Duration of the last finished event name (None if there is none)"""
+        for event in reversed(self.events):
+            if event[0] == name and event[2] is not None:
+                return event[2] - event[1]
+
+    def summary(self):
+        """Text overview: start and end relative to t0, and duration per event"""
+        txt = ["%-8s %-8s %-8s %s" % ('start', 'end', 'duration', 'event')]
+        for name, start, end in self.events:
+            if end is None:
+                txt.append("%8.2f %-8s %-8s %s" % (start - self.t0, '-', '-', name))
+            else:
+                txt.append("%8.2f %8.2f %8.2f %s" % (start - self.t0, end - self.t0, end - start, name))
+        return "\n".join(txt)
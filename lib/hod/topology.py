@@ -0,0 +1,137 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Rack awareness: map the hosts of the job to racks, for HDFS replica placement and MapReduce locality
+
+The rack of a node comes from the site switch map (first matching line), or else from the topology
+levels the node reports (eg [1, 3] gives /1/3). The mapping is written as a static table in the
+config dir, with all names and addresses of each node; hadoop 2 loads the table once in a hash map
+(TableMapping), hadoop 1 runs the script next to it, that looks up each host in a dict.
+
+Switch map: one host (fqdn, short name or address; shell wildcards allowed) and rack per line, eg
+    node1[0-9]*.cluster  /switch1/rack1
+    10.1.2.*             /switch1/rack2
+
+@author: Stijn De Weirdt
+"""
+import fnmatch
+import os
+import stat
+import sys
+
+from vsc import fancylogger
+
+
+TOPOLOGY_DEFAULT_RACK = '/default-rack'  # the hadoop default
+TOPOLOGY_TABLE = 'topology.table'
+TOPOLOGY_SCRIPT = 'topology.py'
+
+TOPOLOGY_SCRIPT_TXT = """#!%(python)s
+# Generated by HOD: the rack of each host argument, from the table next to this script
+import os
+import sys
+table = {}
+for line in open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '%(table)s')):
+    fields = line.split()
+    if len(fields) == 2:
+        table[fields[0]] = fields[1]
+sys.stdout.write(' '.join([table.get(x, '%(default)s') for x in sys.argv[1:]]) + '\\n')
+"""
+
+_log = fancylogger.getLogger('topology', fname=False)
+
+
+def parse_switch_map(fn):
+    """List of (host pattern, rack) from switch map file fn"""
+    res = []
+    for line in open(fn):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        fields = line.split()
+        if len(fields) != 2 or not fields[1].startswith('/'):
+            _log.warn("Ignoring invalid line %s in switch map %s" % (line, fn))
+            continue
+        res.append((fields[0], fields[1]))
+    return res
+
+
+def node_names(descr):
+    """The names and addresses of a node (with Node description descr), without loopback"""
+    names = [descr['fqdn'], descr['fqdn'].split('.')[0]]
+    for hostname, addr, _, _ in descr.get('network', []):
+        if addr.startswith('127.'):
+            continue
+        names += [hostname, hostname.split('.')[0], addr]
+    res = []
+    for name in names:
+        if name and not name in res:
+            res.append(name)
+    return res
+
+
+def node_rack(descr, switchmap=None):
+    """Rack of the node with Node description descr"""
+    names = node_names(descr)
+    for pattern, rack in switchmap or []:
+        if any([fnmatch.fnmatch(x, pattern) for x in names]):
+            return rack
+    levels = descr.get('topology', [])
+    if not levels:
+        return TOPOLOGY_DEFAULT_RACK
+    return '/' + '/'.join(["%s" % x for x in levels])
+
+
+def rack_table(allnodes, switchmap=None):
+    """Dict with the rack of all names and addresses of all nodes (None if all nodes are in one rack)"""
+    table = {}
+    racks = set()
+    for descr in allnodes:
+        rack = node_rack(descr, switchmap)
+        racks.add(rack)
+        for name in node_names(descr):
+            table[name] = rack
+    if len(racks) < 2:
+        _log.info("All nodes in rack %s, no rack awareness" % list(racks))
+        return None
+    _log.info("Nodes in %d racks %s" % (len(racks), sorted(racks)))
+    return table
+
+
+def write_topology(confdir, table):
+    """Write the table and the script to confdir; returns their paths"""
+    tablefn = os.path.join(confdir, TOPOLOGY_TABLE)
+    fh = open(tablefn, 'w')
+    for name in sorted(table):
+        fh.write("%s %s\n" % (name, table[name]))
+    fh.close()
+
+    scriptfn = os.path.join(confdir, TOPOLOGY_SCRIPT)
+    fh = open(scriptfn, 'w')
+    fh.write(TOPOLOGY_SCRIPT_TXT % {'python': sys.executable, 'table': TOPOLOGY_TABLE,
+                                    'default': TOPOLOGY_DEFAULT_RACK})
+    fh.close()
+    os.chmod(scriptfn, stat.S_IRWXU)
+    return tablefn, scriptfn
@@ -0,0 +1,192 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Walltime of the HOD job and the shutdown schedule planned from it
+
+The resource manager kills the job at the end of its walltime, so the master plans the shutdown
+backwards from that moment: first drain (no new work, wait for the running jobs), then stop all work
+(which flushes and stages out data before stopping the daemons). The lead time of the stop is based
+on the stop durations measured in previous jobs.
+
+@author: Stijn De Weirdt
+"""
+import json
+import os
+import re
+import time
+
+from vsc import fancylogger
+
+from hod.commands.command import QstatFull
+from hod.config.choices import DRAIN_LEAD
+
+
+WALLTIME_ENV = 'PBS_WALLTIME'  # requested walltime in seconds, set by torque
+JOBID_ENV = 'PBS_JOBID'
+
+SHUTDOWN_MARGIN = 120  # seconds between the planned end of the stop and the end of the walltime
+STOP_LEAD_DEFAULT = 120  # seconds to stop a work that has no measured stop duration
+STOP_LEAD_FACTOR = 1.5  # safety factor on the measured stop durations
+
+STOP_DURATIONS = 'stop_durations.json'
+STOP_DURATIONS_KEEP = 5  # measured stop durations kept per work
+
+QSTAT_ATTR_REGEX = re.compile(r"^\s*([\w.]+)\s*=\s*(.*?)\s*$", re.M)
+
+PROCESS_START = time.time()  # close enough to the start of the process
+
+_log = fancylogger.getLogger('walltime', fname=False)
+
+
+def parse_walltime(txt):
+    """Seconds in walltime txt ([[HH:]MM:]SS or a number of seconds)"""
+    seconds = 0
+    for part in txt.strip().split(':'):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def qstat_remaining(out):
+    """Remaining walltime in seconds from qstat -f output out (None if not found)"""
+    attrs = dict(QSTAT_ATTR_REGEX.findall(out))
+    try:
+        if 'Walltime.Remaining' in attrs:
+            return int(attrs['Walltime.Remaining'])
+        if 'Resource_List.walltime' in attrs:
+            used = parse_walltime(attrs.get('resources_used.walltime', '0'))
+            return parse_walltime(attrs['Resource_List.walltime']) - used
+    except ValueError:
+        _log.warning("Failed to parse the walltime in qstat attributes %s" % attrs)
+    return None
+
+
+def remaining_walltime(jobid=None, started=None):
+    """
+    Remaining walltime of job jobid (default from the environment) in seconds, None if unknown.
+    qstat is asked first; the fallback is the walltime in the environment minus the time since started
+    (default: the start of this process; the time before that is covered by the shutdown margin).
+    """
+    if jobid is None:
+        jobid = os.environ.get(JOBID_ENV, None)
+    if jobid:
+        qstat = QstatFull(jobid)
+        out, _ = qstat.run()
+        if qstat.result is not None and qstat.result.is_ok():
+            remaining = qstat_remaining(out)
+            if remaining is not None:
+                _log.debug("Remaining walltime of job %s from qstat: %s" % (jobid, remaining))
+                return remaining
+        _log.debug("No walltime of job %s from qstat" % jobid)
+
+    walltime = os.environ.get(WALLTIME_ENV, None)
+    if walltime:
+        if started is None:
+            started = PROCESS_START
+        try:
+            remaining = parse_walltime(walltime) - (time.time() - started)
+            _log.debug("Remaining walltime from %s %s: %s" % (WALLTIME_ENV, walltime, remaining))
+            return remaining
+        except ValueError:
+            _log.warning("Failed to parse %s %s" % (WALLTIME_ENV, walltime))
+
+    _log.debug("Remaining walltime unknown")
+    return None
+
+
+class StopDurations(object):
+    """Stop durations of the work measured in previous jobs, kept in a JSON file"""
+    def __init__(self, filename):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        self.filename = filename
+
+    def load(self):
+        """Dict with the list of the last measured stop durations per work name"""
+        try:
+            fh = open(self.filename)
+            durations = json.load(fh)
+            fh.close()
+        except (IOError, OSError, ValueError):
+            self.log.debug("No stop durations in %s" % self.filename)
+            durations = {}
+        return durations
+
+    def lead(self, name):
+        """Seconds needed to stop work name: the longest measured stop with a safety factor"""
+        measured = self.load().get(name, [])
+        if measured:
+            return max(measured) * STOP_LEAD_FACTOR
+        return STOP_LEAD_DEFAULT
+
+    def record(self, name, seconds):
+        """Add the measured stop duration of work name"""
+        durations = self.load()
+        durations[name] = (durations.get(name, []) + [seconds])[-STOP_DURATIONS_KEEP:]
+        tmpfn = "%s.tmp" % self.filename
+        try:
+            fh = open(tmpfn, 'w')
+            json.dump(durations, fh, indent=1, sort_keys=True)
+            fh.close()
+            os.rename(tmpfn, self.filename)
+        except (IOError, OSError):
+            self.log.exception("Failed to write stop durations %s" % self.filename)
+
+
+class ShutdownPlan(object):
+    """Times of the drain and stop requests that end all work before the walltime end"""
+    def __init__(self, end, stop_lead, drain_lead=DRAIN_LEAD, margin=SHUTDOWN_MARGIN):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        self.end = end
+        stop_at = end - margin - stop_lead
+        self.schedule = [['drain', stop_at - drain_lead], ['stop', stop_at]]  # command, time; ordered
+        self.issued = []
+
+    def due(self, now=None):
+        """The control request that is due now (the last one if several are), None if there is none"""
+        if now is None:
+            now = time.time()
+        request = None
+        for command, when in self.schedule:
+            if when <= now and not command in self.issued:
+                self.issued.append(command)
+                request = {'command': command, 'reason': 'walltime'}
+        if request is not None:
+            self.log.info("Shutdown request %s due, %ds before the walltime end" % (request, self.end - now))
+        return request
+
+    def timeout(self, timeout, now=None):
+        """timeout, limited to the time until the next request that was not issued yet"""
+        if now is None:
+            now = time.time()
+        for command, when in self.schedule:
+            if not command in self.issued:
+                timeout = max(0, min(timeout, when - now))
+        return timeout
+
+    def info(self):
+        """Dict with the walltime end and the time of each request"""
+        info = {'end': self.end}
+        for command, when in self.schedule:
+            info[command] = when
+        return info
@@ -0,0 +1,160 @@
+##
+# Copyright 2009-2013 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Watchdog of the daemons started by the work
+
+The daemons are tracked through their pid files. A daemon that was alive and is gone is crashed;
+when it has a restart function, it is restarted with an exponential backoff between the attempts
+and a budget of attempts for the whole job. Each crash and restart is an event for the master;
+the restart latency (from detection to restart) and the lost capacity time (from the last time the
+daemon was seen alive to the restart) are recorded per daemon.
+
+@author: Stijn De Weirdt
+"""
+import time
+
+from vsc import fancylogger
+
+
+WATCHDOG_BACKOFF_MIN = 10  # seconds between the first restart and the next attempt
+WATCHDOG_BACKOFF_MAX = 600
+WATCHDOG_RESTART_BUDGET = 3  # restart attempts per daemon per job
+
+
+class WatchedDaemon(object):
+    """State of a watched daemon"""
+    def __init__(self, name, probe, restart=None):
+        self.name = name
+        self.probe = probe  # a hod.readiness.PidProbe
+        self.restart = restart  # function that restarts the daemon, returns True on success; None: no restart
+
+        self.last_alive = None  # last time the daemon was seen alive
+        self.crashed = None  # time the current crash was detected
+        self.tries = 0  # restart attempts
+        self.restarts = 0  # successful restarts
+        self.lost = 0.0  # seconds of lost capacity of the previous crashes
+
+    def lost_capacity(self, now):
+        """Seconds the daemon was not running, including the current crash"""
+        lost = self.lost
+        if self.crashed is not None:
+            lost += now - self.last_alive
+        return lost
+
+
+class Watchdog(object):
+    """Watch the daemons and restart the crashed ones"""
+    def __init__(self, budget=WATCHDOG_RESTART_BUDGET, backoff_min=WATCHDOG_BACKOFF_MIN,
+                 backoff_max=WATCHDOG_BACKOFF_MAX):
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+        self.budget = budget
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+
+        self.daemons = []
+        self.events = []  # not yet reported events (see pop_events)
+
+    def add(self, name, probe, restart=None):
+        """Watch daemon name with (pid file) probe; restart it with the restart function"""
+        self.daemons.append(WatchedDaemon(name, probe, restart=restart))
+
+    def backoff(self, tries):
+        """Seconds to wait after a crash before restart attempt tries + 1"""
+        if tries == 0:
+            return 0
+        return min(self.backoff_max, self.backoff_min * 2 ** (tries - 1))
+
+    def event(self, daemon, event, now, **kwargs):
+        """Add event for daemon"""
+        evt = {'daemon': daemon.name, 'event': event, 'time': now, 'pid': daemon.probe.pid()}
+        evt.update(kwargs)
+        self.log.warn("Daemon event %s" % evt)
+        self.events.append(evt)
+
+    def pop_events(self):
+        """Return and forget the events since the last call"""
+        events = self.events
+        self.events = []
+        return events
+
+    def stats(self, name):
+        """Restarts and lost capacity time of daemon name"""
+        now = time.time()
+        for daemon in self.daemons:
+            if daemon.name == name:
+                return {'restarts': daemon.restarts, 'lost': daemon.lost_capacity(now)}
+        return {}
+
+    def check(self, now=None):
+        """Check all daemons (at time now, default: now), restart the crashed ones when it is time to"""
+        for daemon in self.daemons:
+            checktime = now
+            if checktime is None:
+                checktime = time.time()
+            if daemon.probe.check():
+                if daemon.crashed is not None:
+                    self.recovered(daemon, checktime, 'recovered')
+                daemon.last_alive = checktime
+            elif daemon.last_alive is None:
+                continue  # never seen alive (see do_work_ready), nothing to restart
+            else:
+                if daemon.crashed is None:
+                    daemon.crashed = checktime
+                    self.event(daemon, 'crashed', checktime, last_alive=daemon.last_alive)
+                self.try_restart(daemon, checktime)
+
+    def try_restart(self, daemon, now):
+        """Restart crashed daemon if it has a restart function, budget left and the backoff time passed"""
+        if daemon.restart is None:
+            return
+        if daemon.tries >= self.budget:
+            if daemon.tries == self.budget:
+                daemon.tries += 1  # only report once
+                self.event(daemon, 'gave_up', now, tries=self.budget)
+            return
+        if now < daemon.crashed + self.backoff(daemon.tries):
+            return
+
+        daemon.tries += 1
+        try:
+            ok = daemon.restart()
+        except Exception:
+            self.log.exception("Failed to restart daemon %s" % daemon.name)
+            ok = False
+        now = time.time()
+        if ok and daemon.probe.check():
+            daemon.restarts += 1
+            self.recovered(daemon, now, 'restarted')
+            daemon.last_alive = now
+        else:
+            self.event(daemon, 'restart_failed', now, tries=daemon.tries)
+
+    def recovered(self, daemon, now, event):
+        """daemon runs again: record the restart latency and the lost capacity time"""
+        latency = now - daemon.crashed
+        lost = now - daemon.last_alive
+        daemon.lost += lost
+        daemon.crashed = None
+        self.event(daemon, event, now, latency=latency, lost=lost)
@@ -27,60 +27,69 @@
 @author: Stijn De Weirdt
 """
 import os
-import time
 
-from hod.commands.command import ScreenDaemon, RunInScreen
+from hod.session import PtySession, CLIENT_SESSION_DEFAULT
 from hod.work.work import Work
 from hod.work.hadoop import Hadoop
 from hod.config.client import LocalClientOpts, RemoteClientOpts
 
+CLIENT_SESSION = CLIENT_SESSION_DEFAULT
+
 
 class LocalClient(LocalClientOpts, Hadoop):
     """This class handles all client config and (if needed) extra services"""
     def __init__(self, ranks, shared):
         Work.__init__(self, ranks)  # don't use Hadoop.__init__, better to redo Hadoop.__init__ with work + opts
         LocalClientOpts.__init__(self, shared)
+        self.session = None
+        self.script_marker = None  # marker id that is seen once the script finished
 
     def start_work_service_master(self):
-        """If the script options is provided, start the screen session"""
-        screenname = 'HODclient'
-        self.log.debug(
-            "Starting screen daemon with screenname %s" % screenname)
-
-        slp = 3
-
-        sd = ScreenDaemon(screenname)
-        sd.run()
-        time.sleep(slp)
-
-        self.log.debug(
-            "Preparing screen client for screen name %s" % screenname)
-        sc = RunInScreen(screenname)
-
-        self.log.debug(
-            "Source the environment script %s" % self.environment_script)
-        sc.run('. %s' % self.environment_script)
-        time.sleep(slp)
+        """Start the client session, source the environment script and start the script (if provided)"""
+        self.log.debug("Starting session %s" % CLIENT_SESSION)
+        logfn = os.path.join(self.logdir, '%s.log' % CLIENT_SESSION)
+        self.session = PtySession(CLIENT_SESSION, logfn=logfn)
+        if not self.session.start():
+            self.log.error("Failed to start session %s" % CLIENT_SESSION)
+            return
+
+        self.log.debug("Source the environment script %s" % self.environment_script)
+        ec = self.session.run('. %s' % self.environment_script)
+        if ec != 0:
+            self.log.error("Sourcing environment script %s failed (exitcode %s)" % (self.environment_script, ec))
 
         if self.shared_opts.get('work_script', None):
             script = os.path.abspath(self.shared_opts['work_script'])
             if os.path.isfile(script):
-                sc.run('%s' % script)
-                time.sleep(slp)
+                # # the script can run for the whole job: only confirm it started
+                if self.session.run('%s' % script, wait=False) is None:
+                    self.log.error("Failed to start script %s" % script)
             else:
                 self.log.error("Failed to locate script %s" % script)
 
-            sc.run('echo OK Finished script %s' % script)
-            time.sleep(slp)
+            # # typed ahead, the shell runs these once the script finishes
+            self.session.send('echo OK Finished script %s\n' % script)
+            self.script_marker = self.session.mark()
         else:
-            sc.run('echo OK No script run.')
-            time.sleep(slp)
-        sc.run('echo OK Start client.')
-        time.sleep(slp)
+            self.session.send('echo OK No script run.\n')
+        self.session.send('echo OK Start client.\n')
+        self.log.info("Client session %s started, output in %s, attach with hod_attach.py %s" %
+                      (CLIENT_SESSION, logfn, CLIENT_SESSION))
+
+    def work_drained(self):
+        """Drained when the script (if any) finished"""
+        if self.script_marker is None or self.session.is_marked(self.script_marker):
+            return True
+        self.log.debug("Script still running, not drained")
+        return False
 
     def stop_work_service_master(self):
-        """Stop the screen session"""
-        self.log.debug("Stopping screen session not implemented")
+        """Stop the client session"""
+        if self.session is None:
+            self.log.debug("No session %s to stop" % CLIENT_SESSION)
+        else:
+            self.log.debug("Stopping session %s" % CLIENT_SESSION)
+            self.session.stop()
 
 
 class RemoteClient(RemoteClientOpts, Hadoop):
@@ -32,7 +32,9 @@ import tempfile
 import re
 import socket
 
-from hod.node import ip_interface_to
+from hod.node import ip_interface_to, select_storage, storage_reserved, storage_weights
+from hod.readiness import PidProbe, PortProbe
+from hod.topology import write_topology
 from hod.work.work import Work
 from hod.config.hadoopopts import HadoopOpts
 from hod.config.customtypes import Arguments
@@ -40,6 +42,11 @@ from hod.config.customtypes import Arguments
 
 class Hadoop(Work, HadoopOpts):
     """Base Hadoop work class"""
+    # # per daemon (eg namenode) list of (param, default) of the ports it listens on
+    DAEMON_PORTS = {}
+    # # daemons that are restarted when they crash (the worker daemons, not the master daemons)
+    RESTART_DAEMONS = []
+
     def __init__(self, ranks, shared):
         Work.__init__(self, ranks)
         HadoopOpts.__init__(self, shared)
@@ -59,18 +66,156 @@ class Hadoop(Work, HadoopOpts):
         else:
             self.log.error("namenode %s cannot be reached by any of the local interfaces %s" % (nn, self.thisnode.network))
 
+    def daemon_ident(self):
+        """The ident string the daemon script uses in the pid and log file names"""
+        ident = os.environ.get('%s_IDENT_STRING' % self.daemonname.upper(), None)
+        if not ident:
+            ident = os.environ.get('USER', pwd.getpwuid(os.getuid())[0])
+        return ident
+
+    def daemon_pidfile(self, hadoopcmd):
+        """The pid file the daemon script writes for hadoopcmd (eg namenode)"""
+        piddir = self.env_params.get('%s_PID_DIR' % self.daemonname.upper(), None) or '/tmp'
+        return os.path.join("%s" % piddir, "%s-%s-%s.pid" % (self.daemonname, self.daemon_ident(), hadoopcmd))
+
+    def daemon_logfiles(self, hadoopcmd):
+        """Glob pattern of the log file the daemon script makes for hadoopcmd"""
+        logdir = self.env_params.get('%s_LOG_DIR' % self.daemonname.upper(), None) or self.logdir
+        return os.path.join("%s" % logdir, "%s-%s-%s-*.log" % (self.daemonname, self.daemon_ident(), hadoopcmd))
+
+    def param_hostport(self, name):
+        """(hostname, port) of param name (eg fs.default.name); (None, None) if not set"""
+        val = self.params.get(name, None)
+        if hasattr(val, 'port'):
+            return val.hostname, val.port
+        reg = re.search(r"([^/:]*):(\d+)", "%s" % val)
+        if reg:
+            return reg.group(1) or None, reg.group(2)
+        return None, None
+
+    def add_port_condition(self, name, probename):
+        """Declare the port of param name as ready condition"""
+        host, port = self.param_hostport(name)
+        if port:
+            self.add_ready_condition(PortProbe(host, port, name=probename))
+        else:
+            self.log.warn("No port for %s, no ready condition for %s" % (name, probename))
+
+    def queue_daemon(self, daemon, **kwargs):
+        """
+        Queue the daemon command; when starting, it is ready when its pid file points to a running process
+        and the watchdog tracks it (and restarts it, if it is in RESTART_DAEMONS)
+        """
+        if daemon.start:
+            probe = PidProbe(self.daemon_pidfile(daemon.hadoopcmd))
+            self.add_ready_condition(probe)
+            self.daemons.append(daemon.hadoopcmd)
+            restart = None
+            if daemon.hadoopcmd in self.RESTART_DAEMONS:
+                restart = lambda: self.restart_daemon(daemon)
+            self.watchdog.add(daemon.hadoopcmd, PidProbe(probe.pidfile), restart=restart)
+        return self.queue_command(daemon, **kwargs)
+
+    def restart_daemon(self, daemon):
+        """Run the start command of daemon again (with the environment it was queued with)"""
+        self.log.info("Restarting daemon %s" % daemon.hadoopcmd)
+        daemon.run()
+        return daemon.result is not None and daemon.result.is_ok()
+
+    def daemon_status(self):
+        """Status of the daemons started on this rank: pid, alive, start time, ports and heap"""
+        res = []
+        heap = self.env_params.get('%s_HEAPSIZE' % self.daemonname.upper(), None)
+        for hadoopcmd in self.daemons:
+            probe = PidProbe(self.daemon_pidfile(hadoopcmd))
+            try:
+                started = os.path.getmtime(probe.pidfile)
+            except OSError:
+                started = None
+            ports = {}
+            for param, default in self.DAEMON_PORTS.get(hadoopcmd, []):
+                value = self.params.get(param, default)
+                if value is not None:
+                    ports[param] = "%s" % value
+            info = {
+                'work': self.__class__.__name__,
+                'daemon': hadoopcmd,
+                'pid': probe.pid(),
+                'alive': probe.check(),
+                'started': started,
+                'ports': ports,
+                'heap': heap and "%s" % heap,
+            }
+            info.update(self.watchdog.stats(hadoopcmd))
+            res.append(info)
+        return res
+
+    def storage_dirs(self, purpose):
+        """Directories of this work for purpose (see hod.node.select_storage), one per selected filesystem"""
+        storage = getattr(self.thisnode, 'storage', [])
+        return [self.work_storage_dir(x) for x in select_storage(storage, purpose)]
+
+    def data_storage(self):
+        """The directories of the local disks for data (see hod.node.select_storage) with the storage layout"""
+        storage = getattr(self.thisnode, 'storage', [])
+        dirs = select_storage(storage, 'data')
+        if self.shared_opts.get('storage', {}).get('layout', None) == 'single':
+            dirs = dirs[:1]
+        return dirs
+
+    def data_dirs(self, name, persistent=None, weighted=True):
+        """
+        Directories name of this work for data, on all disks of data_storage, weighted with the storage weighting.
+        Without weighting, there is one directory per disk (HDFS counts the capacity and the reserved space of
+        each directory, several directories on one disk inflate the capacity).
+        With a persistent key, the directories are the same for all jobs (eg to reuse the HDFS blocks).
+        """
+        storage = getattr(self.thisnode, 'storage', [])
+        dirs = self.data_storage()
+        weighting = 'none'
+        if weighted:
+            weighting = self.storage_weighting()
+        weights = storage_weights(storage, dirs, weighting)
+        res = []
+        for directory in dirs:
+            if persistent is None:
+                workdir = self.work_storage_dir(directory)
+            else:
+                workdir = os.path.join(directory, "hod.%s.%s" % (pwd.getpwuid(os.getuid())[0], persistent))
+            res.append(os.path.join(workdir, name))
+            res.extend([os.path.join(workdir, "%s.%d" % (name, x)) for x in range(1, weights[directory])])
+        return res
+
+    def storage_weighting(self):
+        """The storage weighting (see hod.config.choices.STORAGE_WEIGHTINGS)"""
+        return self.shared_opts.get('storage', {}).get('weighting', 'none')
+
+    def data_reserved(self):
+        """Bytes per data directory to keep free for non-HDFS data (see hod.node.storage_reserved)"""
+        return storage_reserved(getattr(self.thisnode, 'storage', []), self.data_storage())
+
+    def work_storage_dir(self, directory):
+        """The directory of this work in directory (made on first use)"""
+        if not directory in self.storage_workdirs:
+            self.storage_workdirs[directory] = tempfile.mkdtemp(prefix='hod', dir=directory, suffix=".".join([
+                pwd.getpwuid(os.getuid())[0],  # current user uid
+                "%d" % self.rank,
+                self.name]
+            ))
+        return self.storage_workdirs[directory]
+
     def prepare_extra_work_cfg(self):
         """Add some custom parameters"""
 
     def prepare_work_cfg(self):
         """prepare the config: collect the parameters and make the necessary xml cfg files"""
         self.basic_cfg()
+        self.storage_workdirs = {}
         if self.basedir is None:
-            self.basedir = tempfile.mkdtemp(prefix='hod', suffix=".".join([
-                pwd.getpwuid(os.getuid())[0],  # current user uid
-                "%d" % self.rank,
-                self.name]
-            ))
+            self.basedir = self.storage_dirs('base')[0]
+        if self.piddir is None:
+            # # pid files are small and read often (eg by the watchdog)
+            self.piddir = os.path.join(self.storage_dirs('control')[0], 'pid')
 
         self.prepare_extra_work_cfg()
 
@@ -79,14 +224,27 @@ class Hadoop(Work, HadoopOpts):
 
         # # set the defaults
         self.make_opts_env_defaults()
+        self.prepare_topology()
 
         self.use_sdp(False)
 
         # # make the cfg
         self.make_opts_env_cfg()
 
-        # # set the controldir to the confdir
-        self.controldir = self.confdir
+    def prepare_topology(self):
+        """Write the rack mapping of the nodes (see hod.topology) in the confdir and refer to it in the config"""
+        table = self.shared_opts.get('topology', None)
+        if not table:
+            return
+        tablefn, scriptfn = write_topology(self.confdir, table)
+        self.params['topology.script.file.name'] = scriptfn
+        self.description['topology.script.file.name'] = 'HOD rack mapping script (one lookup per host)'
+        if self.hadoopversion['major'] >= 2:
+            # # no script to fork, the table is loaded once
+            self.params['net.topology.node.switch.mapping.impl'] = 'org.apache.hadoop.net.TableMapping'
+            self.params['net.topology.table.file.name'] = tablefn
+            self.description['net.topology.table.file.name'] = 'HOD rack mapping table'
+        self.log.debug("Rack mapping of %s hosts in %s" % (len(table), tablefn))
 
     def use_sdp(self, allowsdp=True):
         """When IB is being used, set jdk SDP support"""
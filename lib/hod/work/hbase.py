@@ -28,26 +28,87 @@
 """
 from hod.work.work import Work
 from hod.work.hadoop import Hadoop
-from hod.config.hbase import HbaseOpts
+from hod.config.hbase import HbaseOpts, zookeeper_quorum_size, zookeeper_ranks, ZOOKEEPER_MYID
+from hod.config.hbase import regionserver_sizing, java_heap, HBASE_DAEMON_HEAP, MB
+from hod.config.mapred import MAPRED_OPTS, tasktracker_slots
 
 from hod.config.customtypes import Directories, Servers
-from hod.commands.hadoop import HbaseZooKeeper, HbaseMaster, HbaseRegionServer
+from hod.commands.hadoop import HbaseZooKeeper, HbaseMaster, HbaseRegionServer, HbaseShell, HbaseBulkLoad
+from hod.readiness import LogProbe, PortProbe
+from hod.tables import live_servers, tables_script, TABLE_SCRIPT, TABLE_SERVERS_WAIT, TABLE_SERVERS_POLL, \
+    TABLE_LOAD_TIMEOUT, TABLE_FLUSH_SCRIPT, TABLE_FLUSHED
 
 
 import os
 import copy
+import time
+
+MASTER_INITIALIZED_REGEX = r"Master has completed initialization"
 
 
 class Hbase(HbaseOpts, Hadoop):
     """Base Hbase work class"""
+    RESTART_DAEMONS = ['regionserver']
+    DAEMON_PORTS = {
+        'zookeeper': [('hbase.zookeeper.property.clientPort', None)],
+        'master': [('hbase.master.port', 60000), ('hbase.master.info.port', 60010)],
+        'regionserver': [('hbase.regionserver.port', 60020), ('hbase.regionserver.info.port', 60030)],
+    }
+
     def __init__(self, ranks, shared):
         Work.__init__(self, ranks)  # don't use Hadoop.__init__, better to redo Hadoop.__init__ with work + opts
         HbaseOpts.__init__(self, shared)
 
+        self.flushed = False  # memstores of all tables flushed (by the drain, see work_drained)
+
+        self.sizing = {}
+
+    def zookeeper_ranks(self):
+        """The ranks of the members of the zookeeper quorum, in the order of the quorum (see hod.config.hbase)"""
+        quorum = zookeeper_quorum_size(self.size, self.shared_opts.get('zookeeper_quorum', 0))
+        racks = None
+        table = self.shared_opts.get('topology', None)
+        if table:
+            racks = [table.get(node['fqdn'], None) for node in self.allnodes]
+        return zookeeper_ranks(self.size, self.masterrank, quorum, racks)
+
+    def colocated_heaps(self):
+        """The (name, heap in MB) of the other daemons on this rank, next to the regionserver"""
+        hadoop_heap = int(self.env_params.get('HADOOP_HEAPSIZE', None) or 1000)
+        colocated = [('datanode', hadoop_heap)]
+        if self.rank == self.masterrank:
+            # # the namenode and jobtracker are on the first rank, like the hbase master
+            colocated += [('namenode', hadoop_heap), ('hbase master', HBASE_DAEMON_HEAP)]
+        if self.rank in self.zookeeper_ranks():
+            colocated.append(('zookeeper', HBASE_DAEMON_HEAP))
+        if self.shared_opts['other_work'].get('Mapred', False):
+            if self.rank == self.masterrank:
+                colocated.append(('jobtracker', hadoop_heap))
+            maps, reduces = tasktracker_slots(len(self.thisnode.usablecores))
+            child_heap = java_heap(MAPRED_OPTS['mapred.child.java.opts'][0])
+            colocated.append(('tasktracker with %d map and %d reduce slots of %d MB' % (maps, reduces, child_heap),
+                              hadoop_heap + (maps + reduces) * child_heap))
+        return colocated
+
+    def prepare_extra_work_cfg(self):
+        """Size the regionserver heap, block cache, memstore, handlers and garbage collection"""
+        memory = self.thisnode.memory['meminfo']['memtotal'] / MB
+        self.sizing = regionserver_sizing(memory, self.colocated_heaps(), len(self.thisnode.usablecores),
+                                                       self.shared_opts.get('workload', 'mixed'))
+        self.log.info("Regionserver sizing %s" % self.sizing)
+
     def set_service_defaults(self, mis):
         """Set service specific default"""
         self.log.debug("Setting servicedefaults for %s" % mis)
-        if mis in ('hbase.rootdir',):
+        if mis in self.sizing:
+            value, reason = self.sizing[mis]
+            if mis.isupper():
+                self.env_params[mis] = value
+                self.env_description[mis] = "%s HOD: %s" % (self.env_description.get(mis, ''), reason)
+            else:
+                self.params[mis] = value
+                self.description[mis] = "%s HOD: %s" % (self.description.get(mis, ''), reason)
+        elif mis in ('hbase.rootdir',):
             ## use the fs.default.name with additional path
             rootdir = copy.deepcopy(self.params['fs.default.name'])
             rootdir.fspath = '/hbase'
@@ -60,11 +121,11 @@ class Hbase(HbaseOpts, Hadoop):
                 "Set mis %s to interface %s (%s)" % (mis, intf[2], intf))
             self.params[mis] = intf[2]
         elif mis in ('hbase.zookeeper.quorum',):
-            ## add master as quorum node
+            ## the quorum members, with their interface that can reach the namenode
             nn_idx = self.thisnode.network.index(self.interface_to_nn())
-            master_intf = self.allnodes[self.masterrank]['network'][nn_idx]
-            svs = Servers(master_intf[0])
-            self.log.debug("Set mis %s for masterrank %s and interface_index_to_nn %s to %s" % (mis, self.masterrank, nn_idx, svs))
+            zk_ranks = self.zookeeper_ranks()
+            svs = Servers([self.allnodes[x]['network'][nn_idx][0] for x in zk_ranks])
+            self.log.debug("Set mis %s for ranks %s and interface_index_to_nn %s to %s" % (mis, zk_ranks, nn_idx, svs))
             self.params[mis] = svs
         elif mis in ('hbase.zookeeper.property.dataDir', 'hbase.tmp.dir',):
             ## set directories relative to basedir
@@ -78,47 +139,148 @@ class Hbase(HbaseOpts, Hadoop):
             self.log.debug("Setting mis %s by using hadoop variable %s with value %s" % (mis, hadoopname, hadoopval))
             self.env_params[mis] = hadoopval
         elif mis in ('HBASE_HEAPSIZE',):
-            ## use half memory (in MB)
-            mem = (self.thisnode.memory['meminfo']['memfree'] + self.thisnode.memory['meminfo']['cached']) / (2 * 1024 * 1024)
-            self.log.debug(
-                "Setting mis %s to half available memory %s MB" % (mis, mem))
-            self.env_params[mis] = mem
+            ## the hbase master and zookeeper; the regionserver heap is set in HBASE_REGIONSERVER_OPTS
+            self.log.debug("Setting mis %s to %s MB" % (mis, HBASE_DAEMON_HEAP))
+            self.env_params[mis] = HBASE_DAEMON_HEAP
         else:
             self.log.warn("Variable %s not found in service defaults" %
                           mis)  # TODO is warn enough?
             return True  # not_mis_found
 
+    def start_zookeeper(self):
+        """Start the zookeeper quorum member on this rank, with its id (its index in the quorum, as hbase numbers them)"""
+        zk_ranks = self.zookeeper_ranks()
+        if not self.rank in zk_ranks:
+            return
+        datadir = "%s" % self.params['hbase.zookeeper.property.dataDir']
+        if not os.path.isdir(datadir):
+            os.makedirs(datadir)
+        open(os.path.join(datadir, ZOOKEEPER_MYID), 'w').write("%d\n" % zk_ranks.index(self.rank))
+
+        # # the hbase master and regionservers retry their zookeeper connection, no need to wait for the zookeeper start
+        self.log.info("Start zookeeper service, member %s of quorum on ranks %s." % (zk_ranks.index(self.rank), zk_ranks))
+        self.queue_daemon(HbaseZooKeeper(self.daemon_script, start=True), name='zookeeper')
+        self.add_ready_condition(PortProbe(None, self.params['hbase.zookeeper.property.clientPort'],
+                                           name='zookeeper client'))
+
     def start_work_service_master(self):
         """Start service on master"""
         self.set_niceness(4, 2, 3, 'socket:0', varname='HBASE_NICENESS')
                           ## same as mapred jobtracker
 
-        self.log.info("Start zookeeper service on master.")
-        command = HbaseZooKeeper(self.daemon_script, start=True)
-        command.run()
+        self.start_zookeeper()
         self.log.info("Start hbase master service on master.")
-        command = HbaseMaster(self.daemon_script, start=True)
-        command.run()
+        self.queue_daemon(HbaseMaster(self.daemon_script, start=True), name='master')
+        self.add_ready_condition(LogProbe(self.daemon_logfiles('master'), MASTER_INITIALIZED_REGEX,
+                                          name='hbase master initialized'))
 
     def start_work_service_slaves(self):
         """Run start_service on slaves"""
         self.set_niceness(
             15, 2, 7, varname='HBASE_NICENESS')  # same as mapred tasktracker
+        if self.rank != self.masterrank:
+            self.start_zookeeper()
         self.log.info("Start regionserver service on slaves.")
-        command = HbaseRegionServer(self.daemon_script, start=True)
-        command.run()
+        self.queue_daemon(HbaseRegionServer(self.daemon_script, start=True), name='regionserver')
+
+    def hbase_shell(self, script):
+        """Run the hbase shell script (the text), return the output"""
+        scriptfile = os.path.join(self.confdir, TABLE_SCRIPT)
+        open(scriptfile, 'w').write(script)
+        cmd = HbaseShell(scriptfile)
+        cmd.env = dict(os.environ)
+        cmd.run()
+        if not cmd.result.is_ok():
+            self.log.error("hbase shell script %s failed: %s" % (script, cmd.result))
+        return cmd.result.out
+
+    def live_regionservers(self):
+        """
+        The number of regionservers registered with the master, after waiting up to TABLE_SERVERS_WAIT seconds
+        for all of them (the master is ready before the regionservers report in)
+        """
+        expected = self.regionservers()
+        deadline = time.time() + TABLE_SERVERS_WAIT
+        live = live_servers(self.hbase_shell("status\nexit\n")) or 0
+        while live < expected and time.time() < deadline:
+            time.sleep(TABLE_SERVERS_POLL)
+            live = live_servers(self.hbase_shell("status\nexit\n")) or 0
+        if live < expected:
+            self.log.warn("Only %d of %d regionservers live after %s seconds" % (live, expected, TABLE_SERVERS_WAIT))
+        return max(live, 1)
+
+    def regionservers(self):
+        """The number of regionservers: on all ranks but the master (on the master when there is only one rank)"""
+        return max(self.size - 1, 1)
+
+    def create_tables(self):
+        """Create the tables of the table specs pre-split over the live regionservers, then bulk load their HFiles"""
+        tables = self.shared_opts.get('tables', [])
+        if not tables:
+            return
+        self.pre_run_any_service()
+        self.timeline.start("Hbase tables")
+        servers = self.live_regionservers()
+        out = self.hbase_shell(tables_script(tables, servers))
+        for line in out.splitlines():
+            if 'ERROR' in line:
+                # # eg an existing table of a persistent HDFS
+                self.log.warn("Create tables: %s" % line)
+        self.log.info("Created tables %s pre-split over %d regionservers" % ([x['name'] for x in tables], servers))
+
+        names = {}
+        for spec in tables:
+            if spec.get('hfiles', None):
+                cmd = HbaseBulkLoad(spec['hfiles'], spec['name'])
+                cmd.timeout = TABLE_LOAD_TIMEOUT
+                names[self.queue_command(cmd, name=spec['name'])] = spec
+        if names:
+            commands = self.run_commands('bulk load')
+            for cmdname, spec in names.items():
+                if commands.failed(cmdname):
+                    self.log.error("Bulk load of %s into table %s failed" % (spec['hfiles'], spec['name']))
+                else:
+                    self.log.info("Bulk loaded %s into table %s" % (spec['hfiles'], spec['name']))
+        self.post_run_any_service()
+        self.timeline.end("Hbase tables")
+
+    def work_drained(self):
+        """
+        Drained when the memstores of all tables are flushed to HDFS (by the master): the stop loses no edits
+        that are only in the write ahead logs, and the regionservers stop fast
+        """
+        if self.rank != self.masterrank or self.flushed:
+            return True
+        self.pre_run_any_service()
+        out = self.hbase_shell(TABLE_FLUSH_SCRIPT)
+        self.post_run_any_service()
+        self.flushed = TABLE_FLUSHED in out and not 'ERROR' in out
+        if not self.flushed:
+            self.log.warn("Failed to flush the tables, not drained: %s" % out)
+        return self.flushed
+
+    def do_work_ready(self):
+        """Wait for the hbase master to be ready, then create the tables on the master"""
+        ready = Work.do_work_ready(self)
+        if ready and self.rank == self.masterrank:
+            self.create_tables()
+        return ready
 
     def stop_work_service_master(self):
         """Stop service on master"""
         self.log.error("Stop hbase master service on master.")
-        command = HbaseMaster(self.daemon_script, start=False)
-        command.run()
-        self.log.info("Stop zookeeper service on master.")
-        command = HbaseZooKeeper(self.daemon_script, start=False)
-        command.run()
+        self.queue_command(HbaseMaster(self.daemon_script, start=False), name='master')
 
     def stop_work_service_slaves(self):
         """Run stop_service on slaves"""
         self.log.info("Stop regionserver service on slaves.")
-        command = HbaseRegionServer(self.daemon_script, start=False)
-        command.run()
+        self.queue_command(HbaseRegionServer(self.daemon_script, start=False), name='regionserver')
+
+    def do_work_stop(self):
+        """Stop the work, then the zookeeper quorum (the master and the regionservers need it to stop cleanly)"""
+        Work.do_work_stop(self)
+        self.barrier("Going to stop zookeeper")
+        if self.rank in self.zookeeper_ranks():
+            self.log.info("Stop zookeeper service.")
+            self.queue_command(HbaseZooKeeper(self.daemon_script, start=False), name='zookeeper')
+        self.run_commands('stop zookeeper')
@@ -27,28 +27,97 @@
 @author: Stijn De Weirdt
 """
 import os
+import time
 
+from hod.jobdir import job_id
+from hod.persistent import PersistentHdfs, check_data_dir
+from hod.staging import StageManifest, assign, local_files, parse_hdfs_ls, stage_path, stage_shared, throughput
+from hod.staging import STAGE_COPY_TIMEOUT
 from hod.work.work import Work
 from hod.work.hadoop import Hadoop
 from hod.config.hdfs import HdfsOpts
 
 from hod.config.customtypes import HostnamePort, Directories
-from hod.commands.hadoop import NameNode, DataNode, FormatHdfs
+from hod.commands.hadoop import NameNode, DataNode, FormatHdfs, SafemodeGet, SafemodeEnter, SaveNamespace
+from hod.commands.hadoop import HadoopLsR, HadoopMkdir, HadoopRm, HadoopPut, HadoopGet
+from hod.readiness import CommandProbe, READY_TIMEOUT
+
+SAFEMODE_TIMEOUT = 2 * READY_TIMEOUT
+VOLUME_CHOOSING_POLICY = 'org.apache.hadoop.hdfs.server.datanode.fsdataset.AvailableSpaceVolumeChoosingPolicy'
 
 
 class Hdfs(HdfsOpts, Hadoop):
     """Base Hdfs work class"""
+    RESTART_DAEMONS = ['datanode']
+    DAEMON_PORTS = {
+        'namenode': [('fs.default.name', None), ('dfs.namenode.http-address', None)],
+        'datanode': [('dfs.datanode.address', None), ('dfs.datanode.ipc.address', None),
+                     ('dfs.datanode.http.address', None)],
+    }
+
     def __init__(self, ranks, shared):
         Work.__init__(self, ranks)  # don't use Hadoop.__init__, better to redo Hadoop.__init__ with work + opts
         HdfsOpts.__init__(self, shared)
 
+        self.persistent = None  # hod.persistent.PersistentHdfs
+        if shared.get('persistent', None):
+            self.persistent = PersistentHdfs(shared['persistent'])
+        self.persistent_check = None  # how to continue with the persistent HDFS (see PersistentHdfs.check)
+
+        self.stage_pairs = shared.get('stage', {})  # (source, destination) pairs per direction (see hod.staging)
+        self.stage_basedir = shared.get('stage_basedir', None)  # directory of the stage-in manifests
+
+    def datanode_hosts(self):
+        """The hosts of the datanodes"""
+        return [node['fqdn'] for rank, node in enumerate(self.allnodes) if rank != self.masterrank or self.size == 1]
+
+    def prepare_extra_work_cfg(self):
+        """
+        With storage weighting, the datanodes fill the disks by free space (Hadoop 2 and later).
+        With persistent HDFS, the master checks the namespace and the hosts and tells the other ranks.
+        """
+        if self.storage_weighting() != 'none':
+            if self.hadoopversion['major'] >= 2:
+                # # one data directory per disk (see data_dirs), the datanode picks the volume with space
+                self.params['dfs.datanode.fsdataset.volume.choosing.policy'] = VOLUME_CHOOSING_POLICY
+                self.description['dfs.datanode.fsdataset.volume.choosing.policy'] = 'HOD storage weighting'
+            else:
+                self.log.warn("No storage weighting of the HDFS blocks with Hadoop %s" % self.hadoopversion)
+
+        if self.persistent is None:
+            return
+        check = None
+        if self.rank == self.masterrank:
+            check = self.persistent.check(self.datanode_hosts())
+        self.persistent_check = self.comm.bcast(check, root=self.masterrank)
+
+        self.format_hdfs = self.persistent_check['mode'] == 'format'
+        if self.persistent_check['mode'] == 'partial':
+            # # the blocks on the missing hosts never come, don't wait for them in safemode
+            self.params['dfs.safemode.threshold.pct'] = 0
+
     def set_service_defaults(self, mis):
         """Set service specific default"""
         self.log.debug("Setting servicedefaults for %s" % mis)
-        if mis in ('dfs.name.dir', 'dfs.data.dir',):
+        if mis in ('dfs.name.dir',) and self.persistent is not None:
+            self.log.debug("%s not set. using persistent %s" % (mis, self.persistent.name_dir))
+            self.params[mis] = Directories(self.persistent.name_dir)
+        elif mis in ('dfs.name.dir',):
             tmpdir = os.path.join(self.basedir, mis)
             self.log.debug("%s not set. using  %s" % (mis, tmpdir))
             self.params[mis] = Directories(tmpdir)
+        elif mis in ('dfs.data.dir',):
+            # # spread the blocks over all local disks
+            persistent = None
+            if self.persistent is not None:
+                persistent = self.persistent.key()
+            tmpdirs = self.data_dirs(mis, persistent=persistent, weighted=False)
+            self.log.debug("%s not set. using  %s" % (mis, tmpdirs))
+            self.params[mis] = Directories(tmpdirs)
+        elif mis in ('dfs.datanode.du.reserved',):
+            reserved = self.data_reserved()
+            self.log.debug("%s not set. using  %s" % (mis, reserved))
+            self.params[mis] = reserved
         elif mis in ('dfs.datanode.address',):
             intf = self.interface_to_nn()
             if intf:
@@ -73,38 +142,169 @@ class Hdfs(HdfsOpts, Hadoop):
     def start_work_service_master(self):
         """Start service on master"""
         self.set_niceness(1, 2, 0, 'socket:0')
+        after = None
+        if self.persistent is not None:
+            self.persistent.start(job_id(), self.persistent_check['mode'])
         if self.format_hdfs:
             self.log.info("Formatting HDFS")
             name_dir = self.params.get('dfs.name.dir', None)
-            if name_dir:
+            if name_dir and os.path.exists("%s" % name_dir):
                 dest_dir = "%s.renamebeforeformat" % name_dir
+                if os.path.exists(dest_dir):
+                    dest_dir = "%s.%d" % (dest_dir, time.time())
                 self.log.debug('Namedir %s found during format. Going to rename it to %s.' % (name_dir, dest_dir))
                 os.rename("%s" % name_dir, dest_dir)
 
-            formatcommand = FormatHdfs()
-            formatcommand.run()
+            after = self.queue_command(FormatHdfs(), name='format')
         else:
             self.log.debug("No HDFS format")
 
         self.log.info("Start namenode service on master.")
-        command = NameNode(self.daemon_script, start=True)
-        command.run()
+        self.queue_daemon(NameNode(self.daemon_script, start=True), after=after)
+        self.add_port_condition('fs.default.name', 'namenode rpc')
+        # # the namenode stays in safemode until enough datanodes reported their blocks
+        self.add_ready_condition(CommandProbe(SafemodeGet(), r'Safe mode is OFF', name='namenode safemode off'),
+                                 timeout=SAFEMODE_TIMEOUT)
 
     def start_work_service_slaves(self):
         """Run start_service on slaves"""
         self.set_niceness(5, 2, 3, 'socket:0')
+        if self.persistent is not None:
+            # # blocks of another namespace make the datanode fail
+            for data_dir in self.params['dfs.data.dir']:
+                check_data_dir(data_dir, self.persistent_check['namespaceID'], self.persistent_check['clusterID'])
         self.log.info("Start datanode service on slaves.")
-        command = DataNode(self.daemon_script, start=True)
-        command.run()
+        self.queue_daemon(DataNode(self.daemon_script, start=True))
+        self.add_port_condition('dfs.datanode.ipc.address', 'datanode ipc')
 
     def stop_work_service_master(self):
         """Stop service on master"""
-        self.log.info("Stop namenode service on master.")
-        command = NameNode(self.daemon_script, start=False)
-        command.run()
+        # # flush: checkpoint the namespace, so the edits log does not have to be replayed on the next start
+        self.log.info("Save namespace and stop namenode service on master.")
+        safemode = self.queue_command(SafemodeEnter(), name='safemode')
+        save = self.queue_command(SaveNamespace(), name='savenamespace', after=safemode)
+        self.queue_command(NameNode(self.daemon_script, start=False), after=save)
 
     def stop_work_service_slaves(self):
         """Run start_service on slaves"""
         self.log.info("Stop datanode service on slaves.")
-        command = DataNode(self.daemon_script, start=False)
-        command.run()
+        self.queue_command(DataNode(self.daemon_script, start=False))
+
+    def hdfs_files(self, top):
+        """(relative path, size) of the files in top in HDFS (empty if there is no top)"""
+        cmd = HadoopLsR(top, major=self.hadoopversion['major'])
+        cmd.env = dict(os.environ)
+        cmd.run()
+        if not cmd.result.is_ok():
+            self.log.debug("No files found in HDFS %s: %s" % (top, cmd.result))
+            return []
+        if cmd.result.truncated:
+            self.log.error("Listing of HDFS %s truncated, only the last files are staged" % top)
+        return parse_hdfs_ls(cmd.result.out, top)
+
+    def stage_todo(self, direction, source, dest, manifest):
+        """The files of the stage pair that still have to be copied, spread over the ranks (master only)"""
+        if direction == 'in':
+            files = local_files(source)
+            existing = self.hdfs_files(dest)
+        else:
+            files = self.hdfs_files(source)
+            existing = []
+            if os.path.exists(dest):
+                existing = local_files(dest)
+        todo = manifest.todo(files, existing)
+        self.log.info("Stage-%s %s to %s: %d of %d files to copy" % (direction, source, dest, len(todo), len(files)))
+
+        if direction == 'in':
+            dirs = sorted(set([os.path.dirname(stage_path(dest, relpath)) for relpath, _ in todo]))
+            dirs = [x for x in dirs if x]
+            if dirs:
+                mkdir = HadoopMkdir(dirs, major=self.hadoopversion['major'])
+                mkdir.env = dict(os.environ)
+                mkdir.run()
+        manifest.save(direction=direction, source=source, dest=dest, state='running', files=len(files))
+        return assign(todo, self.size)
+
+    def stage_copy(self, direction, source, dest, relpath):
+        """Queue the copy of relpath of the stage pair"""
+        src = stage_path(source, relpath)
+        target = stage_path(dest, relpath)
+        after = None
+        if direction == 'in':
+            major = self.hadoopversion['major']
+            if major < 2:
+                # # no put -f; the rm of a target that does not exist fails, the put runs anyway
+                after = self.queue_command(HadoopRm(target), name="rm %s" % (relpath or os.path.basename(src)))
+            cmd = HadoopPut(src, target, major=major)
+        else:
+            # # a partial copy of a previous attempt
+            if os.path.isfile(target):
+                os.remove(target)
+            elif os.path.dirname(target) and not os.path.isdir(os.path.dirname(target)):
+                try:
+                    os.makedirs(os.path.dirname(target))
+                except OSError:
+                    pass  # made by another rank
+            cmd = HadoopGet(src, target)
+        cmd.timeout = STAGE_COPY_TIMEOUT
+        return self.queue_command(cmd, name=relpath or os.path.basename(src), after=after)
+
+    def stage(self, direction):
+        """Copy the stage pairs of direction ('in' or 'out') with all ranks of this work (collective)"""
+        pairs = self.stage_pairs.get(direction, [])
+        if not pairs:
+            return
+        self.pre_run_any_service()
+        for source, dest in pairs:
+            name = "%s stage-%s %s" % (self.__class__.__name__, direction, source)
+            manifest = StageManifest(stage_shared(direction, source, dest, self.stage_basedir))
+            todo = None
+            if self.rank == self.masterrank:
+                self.timeline.start(name)
+                todo = self.stage_todo(direction, source, dest, manifest)
+            todo = self.comm.bcast(todo, root=self.masterrank)
+
+            start = time.time()
+            names = {}
+            for relpath, size in todo[self.rank]:
+                names[self.stage_copy(direction, source, dest, relpath)] = (relpath, size)
+            commands = self.run_commands('stage-%s' % direction)
+            copied = 0
+            failed = []
+            for cmdname, (relpath, size) in names.items():
+                if commands.failed(cmdname):
+                    failed.append(relpath)
+                else:
+                    manifest.record(self.rank, relpath, size)
+                    copied += size
+            allcopied = self.comm.gather((copied, failed), root=self.masterrank)
+
+            if self.rank == self.masterrank:
+                seconds = time.time() - start
+                total = sum([x[0] for x in allcopied])
+                allfailed = sum([x[1] for x in allcopied], [])
+                mbs = throughput(total, seconds)
+                txt = "Stage-%s %s to %s: %.1f MB in %.1fs (%.1f MB/s over %d ranks)" % \
+                    (direction, source, dest, total / (1024.0 * 1024), seconds, mbs, self.size)
+                if allfailed:
+                    self.log.error("%s, failed to copy %s" % (txt, allfailed))
+                else:
+                    self.log.info(txt)
+                manifest.save(state=['done', 'incomplete'][bool(allfailed)], failed=allfailed, bytes=total,
+                              seconds=seconds, throughput=mbs)
+                self.timeline.end(name)
+
+    def do_work_ready(self):
+        """Wait for HDFS to be ready, then stage in"""
+        ready = Work.do_work_ready(self)
+        if ready:
+            self.stage('in')
+        return ready
+
+    def do_work_stop(self):
+        """Stage out, stop the work; record the hosts with the blocks of the persistent HDFS"""
+        self.stage('out')
+        commands = Work.do_work_stop(self)
+        if self.persistent is not None and self.rank == self.masterrank:
+            # # without saved namespace, the next job replays the edits
+            self.persistent.stop(self.datanode_hosts(), clean=not commands.failed('savenamespace'))
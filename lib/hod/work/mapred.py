@@ -27,28 +27,86 @@
 @author: Stijn De Weirdt
 """
 import os
+import re
+import tempfile
 
+from hod.benchmark import CodecBenchmark, best_codec, slowest_throughput, CODEC_BENCHMARK_MARGIN
 from hod.work.work import Work
 from hod.work.hadoop import Hadoop
-from hod.config.mapred import MapredOpts
+from hod.config.mapred import MapredOpts, tasktracker_slots
 
-from hod.config.customtypes import Directories, HostnamePort
-from hod.commands.hadoop import Jobtracker, Tasktracker
+from hod.config.customtypes import Boolean, Directories, HostnamePort
+from hod.config.hadoopcfg import CODECS, CODECS_FAST
+from hod.commands.hadoop import Jobtracker, Tasktracker, JobList, RefreshQueues
+
+RUNNING_JOBS_REGEX = re.compile(r"^(\d+)\s+jobs\s+currently\s+running", re.M)
+QUEUE_STOPPED = 'stopped'  # state of a queue that refuses new jobs
 
 
 class Mapred(MapredOpts, Hadoop):
     """Base Mapred work class"""
+    RESTART_DAEMONS = ['tasktracker']
+    DAEMON_PORTS = {
+        'jobtracker': [('mapred.job.tracker', None), ('mapred.job.tracker.http.address', None)],
+        'tasktracker': [('mapred.task.tracker.http.address', '0.0.0.0:50060')],
+    }
+
     def __init__(self, ranks, shared):
         Work.__init__(self, ranks)  # don't use Hadoop.__init__, better to redo Hadoop.__init__ with work + opts
         MapredOpts.__init__(self, shared)
 
+        self.map_output_codec = None  # see choose_map_output_codec
+        self.map_output_reason = None
+
+    def choose_map_output_codec(self):
+        """
+        Pick the codec for the map output (None for no compression) and the reason, with the compress mode:
+            auto: the fastest native codec of CODECS_FAST (java codecs cost more cpu than they save)
+            benchmark: the native codec with the highest throughput on the slowest node (collective);
+                       a rough check, the auto codec is kept unless another codec is clearly faster
+        """
+        mode = self.shared_opts.get('compress', 'auto')
+        if mode == 'off':
+            return None, "compression is off"
+
+        natives = self.native_codecs()
+        fast = [x for x in CODECS_FAST if x in natives]
+        if mode == 'benchmark':
+            workdir = tempfile.mkdtemp(prefix='codecs.', dir=self.basedir)
+            results = self.comm.allgather(CodecBenchmark(workdir, natives).run())
+            codec, throughput = best_codec(results)
+            if codec is None:
+                return None, "none of the native codecs %s works on all nodes" % natives
+            auto = fast and slowest_throughput(results, fast[0])
+            if auto and throughput < CODEC_BENCHMARK_MARGIN * auto:
+                return fast[0], "%.0f MB/s on the slowest of %d nodes, %s is not clearly faster (benchmark of %s)" % \
+                    (auto, self.size, codec, natives)
+            return codec, "%.0f MB/s on the slowest of %d nodes (benchmark of %s)" % (throughput, self.size, natives)
+
+        if not fast:
+            return None, "no fast native codec (native codecs %s)" % natives
+        return fast[0], "fastest native codec (native codecs %s)" % natives
+
+    def prepare_extra_work_cfg(self):
+        """Pick the map output codec"""
+        self.map_output_codec, self.map_output_reason = self.choose_map_output_codec()
+        self.log.info("Map output codec %s: %s" % (self.map_output_codec, self.map_output_reason))
+
     def set_service_defaults(self, mis):
         """Set service specific default"""
         self.log.debug("Setting servicedefaults for %s" % mis)
-        if mis in ('mapred.local.dir',):
-            tmpdir = os.path.join(self.basedir, 'mapredlocal')
-            self.log.debug("%s not set. using  %s" % (mis, tmpdir))
-            self.params[mis] = Directories(tmpdir)
+        if mis in ('mapred.compress.map.output',):
+            self.params[mis] = Boolean(self.map_output_codec is not None)
+            self.description[mis] = "%s HOD: %s" % (self.description.get(mis, ''), self.map_output_reason)
+        elif mis in ('mapred.map.output.compression.codec',):
+            # # the hadoop default when not compressing
+            self.params[mis] = CODECS[self.map_output_codec or 'deflate'][0]
+            self.description[mis] = "%s HOD: %s" % (self.description.get(mis, ''), self.map_output_reason)
+        elif mis in ('mapred.local.dir',):
+            # # spread the shuffle data over all local disks (never on a network filesystem)
+            tmpdirs = self.data_dirs('mapredlocal')
+            self.log.debug("%s not set. using  %s" % (mis, tmpdirs))
+            self.params[mis] = Directories(tmpdirs)
         elif mis in ('mapred.job.tracker',):
             intf = self.interface_to_nn()
             if intf:
@@ -59,8 +117,7 @@ class Mapred(MapredOpts, Hadoop):
                 self.log.warn("could not set %s. no intf found for namenode")
         elif mis in ('mapred.map.tasks', 'mapred.tasktracker.map.tasks.maximum',):
             if mis.endswith('maximum'):
-                tasks = int(len(
-                    self.thisnode.usablecores) / 2)  # avg 2 cores per task
+                tasks = tasktracker_slots(len(self.thisnode.usablecores))[0]
             else:
                 mapfactor = len(self.thisnode.usablecores) * 2
                 tasks = int(len(self.allnodes) * mapfactor)
@@ -69,7 +126,7 @@ class Mapred(MapredOpts, Hadoop):
         elif mis in ('mapred.reduce.tasks', 'mapred.tasktracker.reduce.tasks.maximum',):
             mapfactor = 2
             if mis.endswith('maximum'):
-                tasks = int(mapfactor * 1.75)  # total number of reduce tasks is maximum*number of nodes
+                tasks = tasktracker_slots(len(self.thisnode.usablecores))[1]  # total is maximum*number of nodes
             else:
                 tasks = int(len(self.allnodes) * mapfactor)
             self.log.debug("%s not set. using  %s" % (mis, tasks))
@@ -83,24 +140,58 @@ class Mapred(MapredOpts, Hadoop):
         """Start service on master"""
         self.set_niceness(4, 2, 3, 'socket:0')
         self.log.info("Start jobtracker service on master.")
-        command = Jobtracker(self.daemon_script, start=True)
-        command.run()
+        self.queue_daemon(Jobtracker(self.daemon_script, start=True))
+        self.add_port_condition('mapred.job.tracker', 'jobtracker rpc')
 
     def start_work_service_slaves(self):
         """Run start_service on slaves"""
         self.set_niceness(15, 2, 7)
         self.log.info("Start tasktracker service on slaves.")
-        command = Tasktracker(self.daemon_script, start=True)
-        command.run()
+        self.queue_daemon(Tasktracker(self.daemon_script, start=True))
+
+    def work_drain(self):
+        """Stop the queues (on the master): the jobtracker refuses new jobs, the running ones finish"""
+        if self.rank != self.masterrank:
+            return
+        queues = [x.strip() for x in str(self.params.get('mapred.queue.names', 'default')).split(',') if x.strip()]
+        for queue in queues:
+            name = 'mapred.queue.%s.state' % queue
+            self.params[name] = QUEUE_STOPPED
+            self.description[name] = 'HOD: stopped by the drain'
+        self.gen_conf_xml_new()
+
+        self.pre_run_any_service()
+        refresh = RefreshQueues()
+        refresh.run()
+        self.post_run_any_service()
+        if refresh.result.is_ok():
+            self.log.info("Stopped the queues %s, no new jobs are accepted" % queues)
+        else:
+            self.log.warn("Failed to stop the queues %s, new jobs are still accepted: %s" % (queues, refresh.result))
+
+    def work_drained(self):
+        """Drained when the jobtracker has no running jobs (checked on the master)"""
+        if self.rank != self.masterrank:
+            return True
+        self.pre_run_any_service()
+        joblist = JobList()
+        out, _ = joblist.run()
+        self.post_run_any_service()
+
+        reg = RUNNING_JOBS_REGEX.search(out)
+        if not joblist.result.is_ok() or not reg:
+            self.log.warn("Failed to get the running jobs (output %s), assuming not drained" % out)
+            return False
+        running = int(reg.group(1))
+        self.log.debug("%s running jobs" % running)
+        return running == 0
 
     def stop_work_service_master(self):
         """Stop service on master"""
         self.log.info("Stop jobtracker service on master.")
-        command = Jobtracker(self.daemon_script, start=False)
-        command.run()
+        self.queue_command(Jobtracker(self.daemon_script, start=False))
 
     def stop_work_service_slaves(self):
         """Run start_service on slaves"""
         self.log.info("Stop tasktracker service on slaves.")
-        command = Tasktracker(self.daemon_script, start=False)
-        command.run()
+        self.queue_command(Tasktracker(self.daemon_script, start=False))
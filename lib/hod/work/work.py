@@ -31,9 +31,11 @@ from vsc import fancylogger
 
 import time
 import os
-import tempfile
 
 from hod.mpiservice import MpiService
+from hod.commands.group import CommandGroup
+from hod.readiness import Readiness, READY_TIMEOUT
+from hod.watchdog import Watchdog
 
 
 class Work(MpiService):
@@ -47,12 +49,17 @@ class Work(MpiService):
 
         self.allranks = ranks
 
-        self.commands = {}  # dict with command : list of ranks
+        self.commands = CommandGroup()  # commands queued by the start/stop_work_service methods
+        self.readiness = Readiness()  # conditions declared by the start_work_service methods
+        self.daemons = []  # names of the daemons started by this work (see daemon_status)
+        self.watchdog = Watchdog()  # restarts crashed daemons (see do_work_wait)
+        self.start_wave = 0  # started after the work of the previous waves is ready (see hod.distribution)
 
-        self.work_max_age = 3600 * 71
+        self.work_max_age = 3600 * 71  # the master stops all work before the walltime ends (see hod.walltime)
         self.work_start_time = time.time()
 
-        self.controldir = tempfile.mkdtemp()
+        self.stop_requested = False  # set by the stop control action
+        self.draining = False
 
     def pre_run_any_service(self):
         """To be run before any service"""
@@ -82,6 +89,29 @@ class Work(MpiService):
         """Cleanup work"""
         self.stop_service()
 
+    def queue_command(self, command, name=None, after=None):
+        """
+        Queue command to be run after the start_work_service/stop_work_service methods, concurrently with
+        the other queued commands that are not in after.
+        The command runs with the environment as it is now (eg with the HADOOP_NICENESS set for it).
+        """
+        command.env = dict(os.environ)
+        return self.commands.add(command, name=name, after=after)
+
+    def run_commands(self, txt=''):
+        """Run the queued commands, start a new queue"""
+        commands = self.commands
+        self.commands = CommandGroup()
+        if len(commands):
+            self.log.debug("Running %s queued commands %s" % (txt, commands.names))
+            commands.run()
+        return commands
+
+    def add_ready_condition(self, probe, timeout=READY_TIMEOUT):
+        """Declare that the started service is only ready when probe is (see do_work_ready)"""
+        self.log.debug("Adding ready condition %s timeout %s" % (probe, timeout))
+        self.readiness.add(probe, timeout=timeout)
+
     def start_work_service_master(self):
         """Start service on master only"""
         self.log.error("Not implemented start_work_service_master.")
@@ -113,6 +143,33 @@ class Work(MpiService):
             self.log.debug("Work started at %s, now is %s, which is more then max_age %s" % (time.localtime(self.work_start_time), time.localtime(now), self.work_max_age))
             return True  # wait is over
 
+    def daemon_status(self):
+        """List of dicts with the status of the daemons of this work on this rank (see hod.status)"""
+        return []
+
+    def work_drain(self):
+        """Stop accepting new work (used by the drain action), the running work continues until work_drained"""
+        self.log.debug("Not implemented work_drain.")
+
+    def work_drained(self):
+        """Returns True when the work can be stopped without interrupting anything (used by the drain action)"""
+        return True
+
+    def control(self, request):
+        """Apply control action request (see hod.control) to this work"""
+        command = request['command']
+        if command == 'stop':
+            self.stop_requested = True
+        elif command == 'extend':
+            self.work_max_age += request['seconds']
+            self.log.info("Extended max age by %s seconds to %s seconds" % (request['seconds'], self.work_max_age))
+        elif command == 'drain':
+            if not self.draining:
+                self.draining = True
+                self.work_drain()
+        else:
+            self.log.error("Unknown control command %s" % command)
+
     def do_work(self):
         """Look for required code and prepare all"""
         self.log.debug("Do work start")
@@ -123,6 +180,8 @@ class Work(MpiService):
 
     def do_work_start(self):
         """Start the work"""
+        name = self.__class__.__name__
+        self.timeline.start("%s launch" % name)
         self.pre_run_any_service()
         self.barrier("Going to start work on master only and on slaves only")
         if self.rank == self.masterrank:
@@ -130,41 +189,61 @@ class Work(MpiService):
         if self.rank != self.masterrank or self.size == 1:
             # # slaves and in case there is only one node (master=slave)
             self.start_work_service_slaves()
+        self.run_commands('start')
         self.barrier("Going to start work on all")
         self.start_work_service_all()
+        self.run_commands('start all')
+        self.post_run_any_service()
+        self.timeline.end("%s launch" % name)
+
+    def do_work_ready(self):
+        """
+        Wait for the ready conditions declared during start on all ranks of this work.
+        Returns True if all conditions on all ranks were met.
+        """
+        name = self.__class__.__name__
+        readiness = self.readiness
+        self.readiness = Readiness()
+
+        self.pre_run_any_service()
+        self.timeline.start("%s ready" % name)
+        failed = readiness.wait(timeline=self.timeline, prefix=name)
+        allfailed = self.comm.allgather((self.rank, failed))
+        self.timeline.end("%s ready" % name)
         self.post_run_any_service()
 
+        notready = [(rank, fld) for rank, fld in allfailed if fld]
+        if notready:
+            if self.rank == self.masterrank:
+                self.log.error("Work %s not ready (rank, conditions): %s" % (name, notready))
+            return False
+        self.log.debug("Work %s ready" % name)
+        return True
+
     def do_work_wait(self):
         self.pre_run_any_service()
         self.barrier("Going to wait work on all. Return True when all is over")
 
-        ans = self.work_wait()  # True when wait is over
-
-        # # override mechanisms
-        force_fn = os.path.join(self.controldir, 'force_stop')
-        if os.path.isfile(force_fn):
-            self.log.warn(
-                "Force stop detected. work_wait was %s. return True" % ans)
-            return True
-        else:
-            self.log.debug("No force stop file %s found" % force_fn)
+        if not self.stop_requested:
+            self.watchdog.check()
 
-        force_fn = os.path.join(self.controldir, 'force_continue')
-        if os.path.isfile(force_fn):
-            self.log.warn("Force continue detected. work_wait was %s. return False" % ans)
-            return False
-        else:
-            self.log.debug("No force continue file %s found" % force_fn)
+        ans = self.work_wait()  # True when wait is over
+        if self.stop_requested:
+            self.log.info("Stop requested. work_wait was %s. return True" % ans)
+            ans = True
 
         self.post_run_any_service()
         return ans
 
     def do_work_stop(self):
-        """Start the work"""
+        """Stop the work, returns the CommandGroup of the stop commands of the master and the slaves"""
+        name = self.__class__.__name__
+        self.timeline.start("%s stop" % name)
         self.pre_run_any_service()
 
         self.barrier("Going to stop work on all")
         self.stop_work_service_all()
+        self.run_commands('stop all')
 
         self.barrier("Going to stop work on master only and on lsaves only")
         if self.rank == self.masterrank:
@@ -172,7 +251,10 @@ class Work(MpiService):
         if self.rank != self.masterrank or self.size == 1:
             # # slaves and in case there is only one node (master=slave)
             self.stop_work_service_slaves()
+        commands = self.run_commands('stop')
         self.post_run_any_service()
+        self.timeline.end("%s stop" % name)
+        return commands
 
 
 class SleepWork(Work):
@@ -65,7 +65,8 @@ PACKAGE = {
         'hod.config',
         'hod.rmscheduler',
     ],
-    'scripts': ['bin/hod_main.py', 'bin/hod_pbs.py'],
+    'scripts': ['bin/hod_main.py', 'bin/hod_pbs.py', 'bin/hod_attach.py', 'bin/hod_control.py', 'bin/hod_metrics.py',
+                'bin/hod_terasort.py', 'bin/hod_bundle.py'],
     'long_description': open(os.path.join(os.path.dirname(__file__), 'README.md')).read(),
 }
 
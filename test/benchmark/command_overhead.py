@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+##
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Per command overhead of running the daemon commands through /bin/sh or directly
+
+Runs a dummy daemon script (that does nothing) with the same arguments the HadoopDaemon commands use.
+
+usage: python command_overhead.py [number of commands per mode, default 300]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from hod.commands.hadoop import DataNode
+
+nr = 300
+if len(sys.argv) > 1:
+    nr = int(sys.argv[1])
+
+fd, daemon = tempfile.mkstemp(prefix='hod-daemon-', suffix='.sh')
+os.write(fd, "#!/bin/sh\nexit 0\n")
+os.close(fd)
+os.chmod(daemon, 0700)
+
+try:
+    res = {}
+    for mode, shell in [('shell', True), ('argv', False)]:
+        start = time.time()
+        for x in xrange(nr):
+            cmd = DataNode(daemon, start=x % 2 == 0)
+            cmd.shell = shell
+            cmd.run()
+            if not cmd.result.is_ok():
+                print "%s failed: %s" % (cmd, cmd.result)
+        res[mode] = (time.time() - start) / nr
+
+    for mode in ['shell', 'argv']:
+        print "%-6s %d commands: %.3f ms per command" % (mode, nr, res[mode] * 1000)
+    print "saved %.3f ms per command (%.2f s per %d commands)" % ((res['shell'] - res['argv']) * 1000,
+                                                                 (res['shell'] - res['argv']) * nr, nr)
+finally:
+    os.remove(daemon)
@@ -25,7 +25,9 @@
 @author Ewan Higgs (Universiteit Gent)
 '''
 
+import errno
 import unittest
+from mock import patch
 import hod.commands.command as hcc
 
 class HodCommandsCommandTestCase(unittest.TestCase):
@@ -79,6 +81,93 @@ class HodCommandsCommandTestCase(unittest.TestCase):
         self.assertEqual(out, '')
         self.assertEqual(err, 'hello')
 
+    def test_command_result(self):
+        '''test command sets a structured result'''
+        c = hcc.Command('echo hello')
+        c.run()
+        self.assertEqual(c.result.exitcode, 0)
+        self.assertEqual(c.result.out, 'hello')
+        self.assertTrue(c.result.is_ok())
+        self.assertFalse(c.result.timedout)
+        self.assertTrue(c.result.walltime < 1) # no fixed sleeps
+
+    def test_command_exitcode(self):
+        '''test command non-zero exitcode'''
+        c = hcc.Command('exit 3')
+        out, err = c.run()
+        self.assertEqual(c.result.exitcode, 3)
+        self.assertFalse(c.result.is_ok())
+        self.assertEqual(err, 'Exitcode 3\n')
+
+    def test_command_timeout(self):
+        '''test command timeout sends SIGTERM'''
+        c = hcc.Command('sleep 30', timeout=1)
+        c.run()
+        self.assertTrue(c.result.timedout)
+        self.assertFalse(c.result.killed)
+        self.assertEqual(c.result.exitcode, -15)
+        self.assertTrue(c.result.walltime < 5)
+
+    def test_command_timeout_kill(self):
+        '''test command timeout escalates to SIGKILL'''
+        c = hcc.Command('trap "" TERM; sleep 10', timeout=1)
+        c.kill_delay = 1
+        c.run()
+        self.assertTrue(c.result.timedout)
+        self.assertTrue(c.result.killed)
+        self.assertEqual(c.result.exitcode, -9)
+        self.assertTrue(c.result.walltime < 5)
+
+    def test_command_large_output(self):
+        '''test command with more output than a pipe can buffer'''
+        c = hcc.Command('head -c 1000000 /dev/zero | tr "\\\\0" "a"; head -c 1000000 /dev/zero | tr "\\\\0" "b" 1>&2')
+        out, err = c.run()
+        self.assertEqual(len(out), 1000000)
+        self.assertEqual(len(err), 1000000)
+        self.assertFalse(c.result.truncated)
+
+    def test_command_output_limit(self):
+        '''test command only keeps the tail of the output'''
+        c = hcc.Command('seq 1 100000')
+        c.output_limit = 1000
+        out, err = c.run()
+        self.assertTrue(c.result.truncated)
+        self.assertTrue(out.endswith('99999\n100000'))
+        self.assertTrue(len(out) <= 1000)
+
+    def test_command_argv(self):
+        '''test command is only run through the shell when needed'''
+        self.assertEqual(hcc.Command('echo hello').argv(), ['echo', 'hello'])
+        self.assertEqual(hcc.Command(['sleep', 1]).argv(), ['sleep', '1'])
+        self.assertEqual(hcc.Command('echo hello 1>&2').argv(), None)
+        self.assertEqual(hcc.Command('exit 3').argv(), None)
+        self.assertEqual(hcc.Command('FOO=bar env').argv(), None)
+        self.assertEqual(hcc.Command(['ls', '*']).argv(), None)
+        self.assertEqual(hcc.Command('echo hello', shell=True).argv(), None)
+        self.assertEqual(hcc.Command(['ls', '*'], shell=False).argv(), ['ls', '*'])
+        self.assertEqual(hcc.GenerateSshKey('.').argv(), None)
+
+    def test_command_argv_no_shell(self):
+        '''test command arguments are passed as is without shell'''
+        c = hcc.Command(['echo', 'a  b', '$HOME'], shell=False)
+        out, err = c.run()
+        self.assertEqual(out, 'a  b $HOME')
+
+    def test_command_not_found(self):
+        '''test command that does not exist'''
+        c = hcc.Command(['/non/existing/hod/command'])
+        out, err = c.run()
+        self.assertEqual(c.result.exitcode, 127)
+        self.assertTrue(err.startswith('/non/existing/hod/command: No such file or directory'))
+
+    def test_command_not_found_shell(self):
+        '''test command through the shell that can't be started'''
+        c = hcc.Command('echo hello > /dev/null')
+        with patch('hod.commands.command.Popen', side_effect=OSError(errno.ENOENT, 'No such file or directory')):
+            out, err = c.run()
+        self.assertEqual(c.result.exitcode, 127)
+        self.assertTrue(err.startswith('echo hello > /dev/null: No such file or directory'))
+
     def test_ipaddrshow(self):
         '''test ipaddrshow'''
         c = hcc.IpAddrShow()
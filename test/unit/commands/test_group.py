@@ -0,0 +1,115 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+
+import time
+import unittest
+import hod.commands.command as hcc
+import hod.commands.group as hcg
+
+class HodCommandsGroupTestCase(unittest.TestCase):
+    '''Test CommandGroup functions'''
+
+    def test_group_empty(self):
+        '''test empty group'''
+        g = hcg.CommandGroup()
+        self.assertEqual(g.run(), {})
+
+    def test_group_add_names(self):
+        '''test group generates unique names'''
+        g = hcg.CommandGroup()
+        self.assertEqual(g.add(hcc.Command('true')), 'Command')
+        self.assertEqual(g.add(hcc.Command('true')), 'Command_1')
+        self.assertEqual(g.add(hcc.Command('true'), name='x', timeout=3), 'x')
+        self.assertEqual(g.commands['x'].timeout, 3)
+
+    def test_group_concurrent(self):
+        '''test independent commands run concurrently'''
+        g = hcg.CommandGroup(maxworkers=4)
+        for x in range(4):
+            g.add(hcc.Command('sleep 1'))
+        start = time.time()
+        results = g.run()
+        self.assertTrue(time.time() - start < 2)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all([res.is_ok() for res in results.values()]))
+
+    def test_group_bounded(self):
+        '''test no more than maxworkers commands run at the same time'''
+        g = hcg.CommandGroup(maxworkers=2)
+        for x in range(4):
+            g.add(hcc.Command('sleep 0.5'))
+        start = time.time()
+        g.run()
+        self.assertTrue(time.time() - start >= 1)
+
+    def test_group_after(self):
+        '''test dependencies are respected'''
+        g = hcg.CommandGroup()
+        first = g.add(hcc.Command('sleep 0.5; date +%s.%N'), name='first')
+        g.add(hcc.Command('date +%s.%N'), name='second', after=first)
+        results = g.run()
+        self.assertTrue(float(results['first'].out) <= float(results['second'].out))
+
+    def test_group_strict(self):
+        '''test strict mode skips commands with failed dependencies'''
+        g = hcg.CommandGroup(strict=True)
+        g.add(hcc.Command('false'), name='fail')
+        g.add(hcc.Command('true'), name='skip', after=['fail'])
+        g.add(hcc.Command('true'), name='run')
+        results = g.run()
+        self.assertFalse(results['fail'].is_ok())
+        self.assertEqual(results['skip'], None)
+        self.assertEqual(g.state['skip'], hcg.SKIPPED)
+        self.assertTrue(results['run'].is_ok())
+
+    def test_group_not_strict(self):
+        '''test default mode runs commands with failed dependencies'''
+        g = hcg.CommandGroup()
+        g.add(hcc.Command('false'), name='fail')
+        g.add(hcc.Command('true'), name='run', after=['fail'])
+        results = g.run()
+        self.assertTrue(results['run'].is_ok())
+
+    def test_group_timeout(self):
+        '''test per command timeout'''
+        g = hcg.CommandGroup()
+        g.add(hcc.Command('sleep 10'), name='slow', timeout=1)
+        results = g.run()
+        self.assertTrue(results['slow'].timedout)
+
+    def test_group_check(self):
+        '''test group check for cycles and unknown dependencies'''
+        g = hcg.CommandGroup()
+        g.add(hcc.Command('true'), name='a', after=['b'])
+        g.add(hcc.Command('true'), name='b', after=['a'])
+        self.assertFalse(g.check())
+        self.assertEqual(g.run(), {})
+
+        g = hcg.CommandGroup()
+        g.add(hcc.Command('true'), name='a', after=['unknown'])
+        self.assertFalse(g.check())
@@ -95,3 +95,27 @@ class HodCommandsHadoopTestCase(unittest.TestCase):
         '''test hbase region server'''
         c = hch.HbaseRegionServer('daemon')
         self.assertEqual(str(c), 'daemon start regionserver')
+
+    def test_hadoop_fs(self):
+        '''test hadoop fs commands'''
+        c = hch.HadoopPut('/shared/a b', 'data/a b')
+        self.assertEqual(c.argv(), ['hadoop', 'fs', '-put', '-f', '/shared/a b', 'data/a b'])
+        c = hch.HadoopGet('out/part-00000', '/shared/out/part-00000')
+        self.assertEqual(str(c), 'hadoop fs -get out/part-00000 /shared/out/part-00000')
+        c = hch.HadoopMkdir(['a', 'b'])
+        self.assertEqual(str(c), 'hadoop fs -mkdir -p a b')
+        c = hch.HadoopLsR('data')
+        self.assertEqual(str(c), 'hadoop fs -ls -R data')
+        c = hch.HadoopRm('data/a')
+        self.assertEqual(str(c), 'hadoop fs -rm data/a')
+
+    def test_hadoop_fs_hadoop1(self):
+        '''test hadoop fs commands of Hadoop 1'''
+        self.assertEqual(str(hch.HadoopPut('a', 'b', major=1)), 'hadoop fs -put a b')
+        self.assertEqual(str(hch.HadoopMkdir(['a', 'b'], major=1)), 'hadoop fs -mkdir a b')
+        self.assertEqual(str(hch.HadoopLsR('data', major=1)), 'hadoop fs -lsr data')
+
+    def test_codec_compress(self):
+        '''test codec compress'''
+        c = hch.CodecCompress('/tmp/sample.lz4')
+        self.assertEqual(str(c), 'hadoop org.apache.hadoop.io.compress.CompressionCodecFactory -in /tmp/sample.lz4')
@@ -25,6 +25,9 @@
 @author Ewan Higgs (Universiteit Gent)
 '''
 
+import os
+import shutil
+import tempfile
 import unittest
 import hod.config.hadoopcfg as hch
 
@@ -68,3 +71,29 @@ class HodConfigHadoopCfg(unittest.TestCase):
         self.assertTrue(cfg.start_script is not None)
         self.assertTrue(cfg.stop_script is not None)
         self.assertTrue(cfg.daemonname is 'hadoop')
+
+    def test_hadoopcfg_native_codecs(self):
+        '''Test the HadoopCfg finds the native codecs in hadoop home, and caches them.'''
+        tmpdir = tempfile.mkdtemp()
+        native = os.path.join(tmpdir, 'lib', 'native', 'Linux-amd64-64')  # hadoop 1 layout
+        os.makedirs(native)
+        symbols = ['Java_org_apache_hadoop_io_compress_lz4', 'Java_org_apache_hadoop_io_compress_snappy']
+        open(os.path.join(native, 'libhadoop.so.1.0.0'), 'w').write('\0'.join(symbols))
+        cfg = hch.HadoopCfg()
+        cfg.hadoophome = tmpdir
+        libpath = os.environ.pop('LD_LIBRARY_PATH', None)
+        try:
+            codecs = cfg.native_codecs()
+            self.assertTrue('lz4' in codecs)
+            self.assertFalse('lzo' in codecs)
+            self.assertEqual('snappy' in codecs, hch.find_native_lib([], 'snappy') is not None)
+
+            open(os.path.join(native, 'libsnappy.so.1'), 'w').write('')
+            self.assertEqual(cfg.native_codecs(), codecs)  # cached
+            del hch._native_codecs[tmpdir]
+            self.assertTrue('snappy' in cfg.native_codecs())
+        finally:
+            if libpath is not None:
+                os.environ['LD_LIBRARY_PATH'] = libpath
+            hch._native_codecs.pop(tmpdir, None)
+            shutil.rmtree(tmpdir)
@@ -68,3 +68,53 @@ class HodConfigHBase(unittest.TestCase):
         '''test HbaseCfg pre_run_any_service'''
         cfg = hch.HbaseOpts()
         cfg.pre_run_any_service()
+
+    def test_zookeeper_quorum_size(self):
+        '''quorum size by the number of nodes'''
+        self.assertEqual([hch.zookeeper_quorum_size(x) for x in (1, 2, 4, 5, 19, 20, 100)], [1, 1, 1, 3, 3, 5, 5])
+        self.assertEqual(hch.zookeeper_quorum_size(100, 3), 3)
+        self.assertEqual(hch.zookeeper_quorum_size(4, 5), 3)
+        self.assertEqual(hch.zookeeper_quorum_size(2, 3), 1)
+        self.assertEqual(hch.zookeeper_quorum_size(10, 4), 3)  # not a valid size: automatic
+
+    def test_zookeeper_ranks(self):
+        '''members not on the master, spread over the ranks and racks'''
+        self.assertEqual(hch.zookeeper_ranks(1, 0, 1), [0])
+        self.assertEqual(hch.zookeeper_ranks(2, 0, 1), [1])
+        self.assertEqual(hch.zookeeper_ranks(10, 0, 3), [1, 4, 7])
+        self.assertEqual(hch.zookeeper_ranks(4, 0, 3), [1, 2, 3])
+        racks = ['/r1', '/r1', '/r1', '/r1', '/r2', '/r2', '/r3']
+        self.assertEqual(hch.zookeeper_ranks(7, 0, 3, racks), [1, 4, 6])
+        self.assertEqual(hch.zookeeper_ranks(7, 0, 5, racks), [1, 2, 4, 5, 6])
+
+    def test_java_heap(self):
+        '''maximum heap from the java options'''
+        self.assertEqual(hch.java_heap('-Xmx1024M'), 1024)
+        self.assertEqual(hch.java_heap('-server -Xmx2g'), 2048)
+        self.assertEqual(hch.java_heap('-server'), None)
+
+    def test_regionserver_heap(self):
+        '''memory minus the OS reserve and the colocated daemons, within bounds'''
+        self.assertEqual(hch.regionserver_heap(32768, [('datanode', 1000)])[0], 32768 - 3276 - 1000)
+        self.assertEqual(hch.regionserver_heap(256 * 1024, [])[0], hch.HBASE_HEAP_MAX)
+        heap, reason = hch.regionserver_heap(4096, [('tasktracker', 4000)])
+        self.assertEqual(heap, hch.HBASE_HEAP_MIN)
+        self.assertTrue('overcommitted' in reason)
+
+    def test_regionserver_sizing(self):
+        '''block cache and memstore by workload, never more than 80% of the heap'''
+        for workload in hch.HBASE_WORKLOADS:
+            sizing = hch.regionserver_sizing(65536, [('datanode', 1000)], 16, workload)
+            total = sizing['hfile.block.cache.size'][0] + sizing['hbase.regionserver.global.memstore.upperLimit'][0]
+            self.assertTrue(total <= 0.8)
+            self.assertTrue(sizing['hbase.regionserver.global.memstore.lowerLimit'][0] <
+                            sizing['hbase.regionserver.global.memstore.upperLimit'][0])
+        read = hch.regionserver_sizing(65536, [], 16, 'read')
+        write = hch.regionserver_sizing(65536, [], 16, 'write')
+        self.assertTrue(read['hfile.block.cache.size'][0] > write['hfile.block.cache.size'][0])
+        self.assertEqual(read['hbase.regionserver.handler.count'][0], 128)
+        self.assertEqual(write['hbase.regionserver.handler.count'][0], 48)
+        opts = "%s" % read['HBASE_REGIONSERVER_OPTS'][0]
+        self.assertTrue('-Xmx%dm' % hch.regionserver_heap(65536, [])[0] in opts)
+        self.assertTrue('-XX:CMSInitiatingOccupancyFraction=80' in opts)
+        self.assertTrue('datanode' in hch.regionserver_sizing(65536, [('datanode', 1000)], 16)['HBASE_REGIONSERVER_OPTS'][1])
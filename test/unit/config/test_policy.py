@@ -0,0 +1,82 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import unittest
+import hod.config.policy as hcp
+from hod.config.hdfs import HdfsOpts
+
+GB = 1024 ** 3
+
+
+class HodConfigPolicyTestCase(unittest.TestCase):
+    '''Test the HDFS policy'''
+
+    def test_replication(self):
+        '''replication from the number of datanodes and the free disk'''
+        self.assertEqual(hcp.choose_replication(1, 100 * GB)[0], 1)
+        self.assertEqual(hcp.choose_replication(2, 100 * GB)[0], 2)
+        self.assertEqual(hcp.choose_replication(10, 100 * GB)[0], 3)
+        self.assertEqual(hcp.choose_replication(10, 1000 * GB, 100 * GB)[0], 3)
+        replication, reason = hcp.choose_replication(10, 1000 * GB, 200 * GB)
+        self.assertEqual(replication, 2)
+        self.assertTrue('do not fit' in reason)
+        self.assertEqual(hcp.choose_replication(10, 1000 * GB, 2000 * GB)[0], 1)
+
+    def test_block_size(self):
+        '''block size from the dataset size'''
+        self.assertEqual(hcp.choose_block_size(10)[0], hcp.POLICY_BLOCK_DEFAULT)
+        self.assertEqual(hcp.choose_block_size(10, 10 * GB)[0], hcp.POLICY_BLOCK_MIN)
+        self.assertEqual(hcp.choose_block_size(10, 80 * GB)[0], 256 * 1024 * 1024)
+        self.assertEqual(hcp.choose_block_size(10, 100000 * GB)[0], hcp.POLICY_BLOCK_MAX)
+
+    def test_namenode_handlers(self):
+        '''handlers from the number of datanodes'''
+        self.assertEqual(hcp.choose_namenode_handlers(1)[0], hcp.POLICY_HANDLERS_MIN)
+        self.assertEqual(hcp.choose_namenode_handlers(100)[0], 92)
+        self.assertEqual(hcp.choose_namenode_handlers(10 ** 6)[0], hcp.POLICY_HANDLERS_MAX)
+
+    def test_node_capacity(self):
+        '''free local disk for data'''
+        storage = [
+            {'directory': '/a', 'fstype': 'ext4', 'local': True, 'free': 10 * GB, 'rotational': True,
+             'throughput': None},
+            {'directory': '/b', 'fstype': 'xfs', 'local': True, 'free': 20 * GB, 'rotational': True,
+             'throughput': None},
+            {'directory': '/c', 'fstype': 'nfs', 'local': False, 'free': 40 * GB, 'rotational': None,
+             'throughput': None},
+        ]
+        self.assertEqual(hcp.node_capacity({'storage': storage}), 30 * GB)
+        self.assertEqual(hcp.node_capacity({'storage': storage}, 'single'), 20 * GB)
+
+    def test_hdfs_policy(self):
+        '''the reasons go in the config descriptions'''
+        params = hcp.hdfs_policy(4, 1000 * GB, 4 * GB)
+        cfg = HdfsOpts(shared={'params': params})
+        self.assertEqual(cfg.params['dfs.replication'], 3)
+        self.assertEqual(cfg.params['dfs.block.size'], hcp.POLICY_BLOCK_MIN)
+        self.assertTrue(cfg.description['dfs.replication'].startswith('FINAL'))
+        self.assertTrue('HOD policy: 4 datanodes' in cfg.description['dfs.replication'])
@@ -86,6 +86,17 @@ class HodRMSchedulerHodjobTestCase(unittest.TestCase):
         /usr/bin/python /apps/gent/SL6/sandybridge/software/vsc-mympirun/3.2.3/bin/mympirun --output=/vscmnt/gent_vulpix/_/user/home/gent/vsc410/vsc41041/jobs/hadoop/hod.output.12191.master16.delcatty.gent.vsc --hybrid=1 --variablesprefix=HADOOP,JAVA,HOD,MAPRED,HDFS,HDFS,MAPRED python /apps/gent/SL6/sandybridge/software/hanythingondemand/2.1.1-ictce-5.5.0-Python-2.7.6/bin/hod_main --hod-script=/user/home/gent/vsc410/vsc41041/jobs/hadoop/run_job.sh --hod-envclass=PbsEBMMHod
         """
 
+    def test_mympirunhod_envsnapshot(self):
+        '''source the environment snapshot, pass it to the clients'''
+        with patch('hod.rmscheduler.hodjob.HodJob.get_hod', side_effect=lambda: ('sentinel1', 'sentinel2')):
+            o = hrh.MympirunHod(self.mpiopt)
+        o.envsnapshot = '/home/user/.hod/envsnapshot.0123.sh'
+        o.modules = ['Hadoop/1.2.1']
+        self.assertEqual(o.generate_environment(), ['if [ -r /home/user/.hod/envsnapshot.0123.sh ]; then',
+                                                    '    . /home/user/.hod/envsnapshot.0123.sh', 'else',
+                                                    '    module load Hadoop/1.2.1', 'fi'])
+        self.assertTrue(o.generate_exe()[0].endswith(' --hod-envscript=/home/user/.hod/envsnapshot.0123.sh'))
+
     def test_easybuildmmhod_init(self):
         '''test EasybuildMMHod init function'''
         os.environ['EBMODNAMEHANYTHINGONDEMAND'] = '/path/to/hanythindondemand'
@@ -69,3 +69,13 @@ class HodRMSchedulerJobTestCase(unittest.TestCase):
         '''test Job get_jobs'''
         hrj.Job.get_job(hrj.Job, None)
 
+
+    def test_job_class(self):
+        '''test job_class and job_name'''
+        self.assertEqual(hrj.job_class('NoSuchJob'), None)
+        self.assertEqual(hrj.job_class('hod.rmscheduler.job.Job'), hrj.Job)
+        self.assertEqual(hrj.job_name(hrj.Job), 'hod.rmscheduler.job.Job')
+        for name in hrj.JOB_CLASSES:
+            cls = hrj.job_class(name)
+            self.assertEqual(cls.__name__, name)
+            self.assertEqual(hrj.job_name(cls), name)
@@ -0,0 +1,95 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import hod.benchmark as hb
+
+HDFS_SITE = """<?xml version="1.0"?>
+<configuration>
+<property><name>dfs.name.dir</name><value>/local/name</value></property>
+<property><name>dfs.data.dir</name><value>/ssd/hod/dfs.data.dir,/local/hod/dfs.data.dir</value></property>
+</configuration>
+"""
+
+class HodBenchmarkTestCase(unittest.TestCase):
+    '''Test terasort and codec benchmark helpers'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_data_dirs(self):
+        '''data dirs from hdfs-site.xml'''
+        open(os.path.join(self.tmpdir, 'hdfs-site.xml'), 'w').write(HDFS_SITE)
+        self.assertEqual(hb.data_dirs(self.tmpdir), ['/ssd/hod/dfs.data.dir', '/local/hod/dfs.data.dir'])
+        self.assertEqual(hb.conf_property(os.path.join(self.tmpdir, 'hdfs-site.xml'), 'dfs.replication'), None)
+
+    def test_find_examples_jar(self):
+        '''examples jar of hadoop 1'''
+        self.assertEqual(hb.find_examples_jar(self.tmpdir), None)
+        jar = os.path.join(self.tmpdir, 'hadoop-examples-1.2.1.jar')
+        open(jar, 'w').close()
+        self.assertEqual(hb.find_examples_jar(self.tmpdir), jar)
+
+    def test_record_compare(self):
+        '''record runs and compare the layouts'''
+        fn = os.path.join(self.tmpdir, hb.TERASORT_CSV)
+        hb.record(fn, 'single', 1, 1000, {'teragen': 10.0, 'terasort': 30.0, 'teravalidate': 5.0})
+        hb.record(fn, 'single', 1, 1000, {'teragen': 20.0, 'terasort': 40.0, 'teravalidate': 5.0})
+        hb.record(fn, 'striped', 4, 1000, {'teragen': 5.0, 'terasort': 15.0, 'teravalidate': 2.0})
+        hb.record(fn, 'striped', 4, 1000, {'teragen': 5.0, 'terasort': None, 'teravalidate': None})
+        res = hb.compare(fn)
+        self.assertEqual(sorted(res.keys()), [('single', 1000), ('striped', 1000)])
+        self.assertEqual(res[('single', 1000)]['runs'], 2)
+        self.assertEqual(res[('single', 1000)]['terasort'], 35.0)
+        self.assertEqual(res[('single', 1000)]['total'], 55.0)
+        self.assertEqual(res[('striped', 1000)]['runs'], 1)
+
+    def test_codec_sample(self):
+        '''compressible sample'''
+        fn = os.path.join(self.tmpdir, 'sample')
+        hb.codec_sample(fn, 3 * 1024 * 1024)
+        size = os.path.getsize(fn)
+        self.assertTrue(2 * 1024 * 1024 < size <= 3 * 1024 * 1024)
+
+    def test_best_codec(self):
+        '''highest throughput on the slowest rank'''
+        results = [
+            {'lz4': {'throughput': 500.0, 'ratio': 0.5}, 'snappy': {'throughput': 400.0, 'ratio': 0.5}},
+            {'lz4': {'throughput': 100.0, 'ratio': 0.5}, 'snappy': {'throughput': 300.0, 'ratio': 0.5}},
+        ]
+        self.assertEqual(hb.best_codec(results), ('snappy', 300.0))
+        results[1]['snappy'] = None
+        self.assertEqual(hb.best_codec(results), ('lz4', 100.0))
+        self.assertEqual(hb.best_codec([{'lz4': None}]), (None, None))
+        self.assertEqual(hb.slowest_throughput(results, 'lz4'), 100.0)
+        self.assertEqual(hb.slowest_throughput(results, 'snappy'), None)
@@ -0,0 +1,94 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import zipfile
+import hod.bundle as hb
+
+
+class HodBundleTestCase(unittest.TestCase):
+    '''Test the byte-compiled bundle'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.main = os.path.join(self.tmpdir, 'main.py')
+        open(self.main, 'w').write("import sys\nimport hod.timeline\nprint hod.timeline.__file__, sys.argv[1:]\n")
+        self.bundle = os.path.join(self.tmpdir, 'shared', hb.BUNDLE_NAME)
+        os.mkdir(os.path.dirname(self.bundle))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_build_bundle(self):
+        '''sources with pycs zipimport accepts, __main__'''
+        self.assertTrue(hb.build_bundle(self.bundle, packages=['hod'], main=self.main) > 10)
+        archive = zipfile.ZipFile(self.bundle)
+        names = archive.namelist()
+        for name in ['hod/__init__.py', 'hod/__init__.pyc', 'hod/config/hodoption.pyc', '__main__.py', 'hod_main.py']:
+            self.assertTrue(name in names, name)
+        # # the mtime in the pyc is the (2 second resolution) time of the source in the zip
+        info = archive.getinfo('hod/timeline.py')
+        mtime = struct.unpack('<I', archive.read('hod/timeline.pyc')[4:8])[0]
+        self.assertTrue(abs(time.mktime(info.date_time + (0, 0, -1)) - mtime) <= 1)
+
+        code = hb.BundleImporter(os.path.join(self.bundle, 'hod')).get_code('hod.timeline')
+        self.assertEqual(code.co_filename, os.path.join(self.bundle, 'hod', 'timeline.py'))
+
+    def test_build_bundle_errors(self):
+        '''no C extensions, no partial bundle'''
+        self.assertRaises(hb.BundleError, hb.build_bundle, self.bundle, packages=['mpi4py'])
+        self.assertRaises(hb.BundleError, hb.build_bundle, self.bundle, packages=['nosuchpackage'])
+        self.assertEqual(os.listdir(os.path.dirname(self.bundle)), [])
+
+    def test_localize(self):
+        '''one copy per bundle in tmpdir'''
+        hb.build_bundle(self.bundle, packages=['hod'])
+        local = hb.localize(self.bundle, tmpdir=self.tmpdir)
+        self.assertEqual(os.path.dirname(local), self.tmpdir)
+        self.assertEqual(open(local).read(), open(self.bundle).read())
+        inode = os.stat(local).st_ino
+        self.assertEqual(hb.localize(self.bundle, tmpdir=self.tmpdir), local)
+        self.assertEqual(os.stat(local).st_ino, inode)
+        self.assertEqual(hb.localize(local, tmpdir=self.tmpdir), None)
+        self.assertEqual(hb.localize(os.path.join(self.tmpdir, 'nosuchbundle'), tmpdir=self.tmpdir), None)
+
+    def test_run_bundle(self):
+        '''the bundle runs main from its local copy'''
+        hb.build_bundle(self.bundle, main=self.main)
+        env = dict(os.environ, TMPDIR=self.tmpdir)
+        env.pop('PYTHONPATH', None)
+        out = subprocess.Popen([sys.executable, self.bundle, 'arg'], env=env, stdout=subprocess.PIPE).communicate()[0]
+        local = [x for x in os.listdir(self.tmpdir) if x.endswith('.zip')]
+        self.assertEqual(len(local), 1)
+        self.assertEqual(out.strip(), "%s ['arg']" % os.path.join(self.tmpdir, local[0], 'hod', 'timeline.pyc'))
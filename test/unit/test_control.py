@@ -0,0 +1,109 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import json
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import time
+import unittest
+import hod.control as hc
+import hod.jobdir as hj
+
+class HodControlTestCase(unittest.TestCase):
+    '''Test control endpoint'''
+
+    def setUp(self):
+        self.basedir = tempfile.mkdtemp()
+        self.jobdir = hj.job_dir(jobid='123.master', basedir=self.basedir, create=True)
+        self.server = hc.ControlServer(self.jobdir)
+        self.server.add_query('status', lambda request: {'size': 2})
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.basedir)
+
+    def test_jobdir(self):
+        '''job dirs are listed and found by (short) job id'''
+        self.assertEqual(hj.list_jobs(self.basedir), ['123.master'])
+        self.assertEqual(hj.find_job('123', basedir=self.basedir), '123.master')
+        self.assertEqual(hj.find_job('12', basedir=self.basedir), None)
+
+    def test_endpoint(self):
+        '''endpoint file is private and removed on stop'''
+        endpoint = os.path.join(self.jobdir, hc.CONTROL_ENDPOINT)
+        self.assertEqual(stat.S_IMODE(os.stat(endpoint).st_mode), 0600)
+        self.assertEqual(hc.read_endpoint(self.jobdir)['token'], self.server.token)
+        self.server.stop()
+        self.assertFalse(os.path.exists(endpoint))
+        self.assertRaises(hc.ControlError, hc.read_endpoint, self.jobdir)
+
+    def test_query(self):
+        '''queries are answered by the thread, without serve'''
+        start = time.time()
+        reply = hc.control_request(self.jobdir, 'status')
+        self.assertTrue(time.time() - start < 1)
+        self.assertEqual(reply, {'ok': True, 'command': 'status', 'size': 2})
+        self.assertEqual(self.server.serve(0.01), None)
+
+    def test_query_slow_client(self):
+        '''a client that does not send its request does not hold up the others'''
+        endpoint = hc.read_endpoint(self.jobdir)
+        stuck = socket.create_connection((endpoint['host'], endpoint['port']))
+        time.sleep(0.1)  # accepted first
+        start = time.time()
+        reply = hc.control_request(self.jobdir, 'status')
+        self.assertTrue(time.time() - start < 1)
+        self.assertTrue(reply['ok'])
+        stuck.close()
+
+    def test_action(self):
+        '''actions are validated and queued for serve'''
+        reply = hc.control_request(self.jobdir, 'extend', seconds='60')
+        self.assertTrue(reply['ok'])
+        self.assertEqual(self.server.serve(5), {'command': 'extend', 'seconds': 60})
+
+        reply = hc.control_request(self.jobdir, 'extend', seconds='soon')
+        self.assertFalse(reply['ok'])
+        self.assertEqual(self.server.serve(0.01), None)
+
+    def test_invalid(self):
+        '''wrong token and unknown commands are refused'''
+        endpoint = hc.read_endpoint(self.jobdir)
+        conn = socket.create_connection((endpoint['host'], endpoint['port']))
+        conn.sendall(json.dumps({'command': 'stop', 'token': 'wrong'}) + '\n')
+        reply = json.loads(hc._read_line(conn))
+        conn.close()
+        self.assertEqual(reply['error'], 'invalid token')
+
+        reply = hc.control_request(self.jobdir, 'reboot')
+        self.assertFalse(reply['ok'])
+        self.assertTrue(reply['error'].startswith('unknown command reboot'))
+        self.assertEqual(self.server.serve(0.01), None)
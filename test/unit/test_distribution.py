@@ -0,0 +1,91 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import unittest
+from optparse import Values
+import hod.distribution as hd
+
+
+def entry(name, provides=None, needs=None, uses=None, ready=None):
+    return {'name': name, 'work': None, 'options': [], 'provides': provides or [], 'needs': needs or [],
+            'uses': uses or [], 'ready': ready or [], 'placement': None, 'shared': None}
+
+
+class HodDistributionTestCase(unittest.TestCase):
+    '''Test the work registry and its dependencies'''
+
+    def test_work_class(self):
+        '''work class from the import path, only imported when asked for'''
+        self.assertEqual(hd.work_name('hod.work.hbase.Hbase'), 'Hbase')
+        cls = hd.work_class('hod.work.hbase.Hbase')
+        self.assertEqual(cls.__name__, 'Hbase')
+        self.assertEqual(hd.work_class(cls), cls)
+        self.assertEqual(hd.work_name(cls), 'Hbase')
+        for entry in hd.WORK_REGISTRY:
+            self.assertEqual(hd.work_name(entry['work']), entry['name'])
+
+    def test_work_registry(self):
+        '''the registry entries come first, plugins can't replace them'''
+        registry = hd.work_registry()
+        self.assertEqual(registry[:len(hd.WORK_REGISTRY)], hd.WORK_REGISTRY)
+        for entry in registry:
+            self.assertEqual(sorted(entry.keys()), sorted(hd.WORK_ENTRY_KEYS))
+
+    def test_enabled_work(self):
+        '''work enabled by the options'''
+        options = Values({'hdfs_off': False, 'hbase_on': False, 'mr1_off': False, 'yarn_on': False})
+        names = [x['name'] for x in hd.enabled_work(hd.WORK_REGISTRY, options)]
+        self.assertEqual(names, ['Hdfs', 'Mapred', 'LocalClient', 'RemoteClient'])
+        options.yarn_on = True
+        names = [x['name'] for x in hd.enabled_work(hd.WORK_REGISTRY, options)]
+        self.assertEqual(names, ['Hdfs', 'LocalClient', 'RemoteClient'])
+
+    def test_resolve(self):
+        '''order by the dependencies, waves by readiness'''
+        entries = [
+            entry('client', uses=['a', 'b', 'c'], ready=['a', 'b', 'c']),
+            entry('b', provides=['pb'], needs=['pa'], ready=['a']),
+            entry('c', needs=['pa'], uses=['b'], ready=['a']),
+            entry('a', provides=['pa']),
+        ]
+        ordered, waves, dropped = hd.resolve(entries)
+        self.assertEqual([x['name'] for x in ordered], ['a', 'b', 'c', 'client'])
+        self.assertEqual(waves, {'a': 0, 'b': 1, 'c': 1, 'client': 2})
+        self.assertEqual(dropped, [])
+
+    def test_resolve_dropped(self):
+        '''missing providers (also of dropped work) and cycles'''
+        entries = [entry('b', provides=['pb'], needs=['pa']), entry('c', needs=['pb']), entry('d')]
+        ordered, waves, dropped = hd.resolve(entries)
+        self.assertEqual([x['name'] for x in ordered], ['d'])
+        self.assertEqual([x[0] for x in dropped], ['b', 'c'])
+
+        entries = [entry('a', uses=['b']), entry('b', uses=['a']), entry('c')]
+        ordered, waves, dropped = hd.resolve(entries)
+        self.assertEqual([x['name'] for x in ordered], ['c'])
+        self.assertEqual(sorted([x[0] for x in dropped]), ['a', 'b'])
+        self.assertTrue('cyclic' in dropped[0][1])
@@ -0,0 +1,97 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import unittest
+import hod.envsnapshot as he
+
+
+class HodEnvSnapshotTestCase(unittest.TestCase):
+    '''Test the environment snapshot of the module commands'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.environ = {'PATH': os.environ['PATH'], 'KEEP': 'same', 'GONE': 'x'}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_resolve(self):
+        '''set, changed and unset variables'''
+        commands = ["export JAVA_HOME=%s" % self.tmpdir, "export PATH=/some/bin:$PATH", "unset GONE"]
+        changed, removed = he.resolve(commands, environ=self.environ)
+        self.assertEqual(changed, {'JAVA_HOME': self.tmpdir, 'PATH': "/some/bin:%s" % os.environ['PATH']})
+        self.assertEqual(removed, ['GONE'])
+        self.assertEqual(he.resolve(['false'], environ=self.environ), None)
+
+    def test_resolve_socket_stdin(self):
+        '''no startup files, also when stdin is a socket (bash acts as if started by sshd)'''
+        sock, other = socket.socketpair()
+        stdin = os.dup(0)
+        os.dup2(sock.fileno(), 0)
+        try:
+            changed, _ = he.resolve(["export PATH=/some/bin:$PATH"], environ={'PATH': '/usr/bin:/bin'})
+        finally:
+            os.dup2(stdin, 0)
+            os.close(stdin)
+            sock.close()
+            other.close()
+        self.assertEqual(changed, {'PATH': '/some/bin:/usr/bin:/bin'})
+
+    def test_validate(self):
+        '''directories of the snapshot that don't exist'''
+        changed = {'JAVA_HOME': self.tmpdir, 'EBROOTHADOOP': '/no/such/dir', 'PATH': '/no/such/bin'}
+        self.assertEqual(he.validate(changed), (sorted([self.tmpdir, '/no/such/dir']), ['/no/such/dir']))
+
+    def test_snapshot_script(self):
+        '''snapshot if its directories exist, the commands otherwise'''
+        def run(changed):
+            script = he.snapshot_script(['export FROM=commands'], changed, ['GONE'])
+            script.append('echo "$FROM ${GONE:-unset} ${WEIRD:-}"')
+            return subprocess.Popen(['bash', '-c', "\n".join(script)], env=self.environ,
+                                    stdout=subprocess.PIPE).communicate()[0].strip()
+
+        self.assertEqual(run({'FROM': 'snapshot', 'JAVA_HOME': self.tmpdir, 'WEIRD': "a 'b' $c"}),
+                         "snapshot unset a 'b' $c")
+        self.assertEqual(run({'FROM': 'snapshot', 'JAVA_HOME': '/no/such/dir'}), "commands x")
+
+    def test_make_snapshot(self):
+        '''one snapshot per content, none for failing commands or missing directories'''
+        commands = ["export JAVA_HOME=%s" % self.tmpdir]
+        basedir = os.path.join(self.tmpdir, 'hod')
+        fn = he.make_snapshot(commands, basedir, extra=['export HOD_EXTRA=1'])
+        self.assertEqual(os.path.dirname(fn), basedir)
+        self.assertTrue(open(fn).read().startswith(he.ENV_SNAPSHOT_MARKER))
+        self.assertTrue('export HOD_EXTRA=1\n' in open(fn).read())
+        self.assertEqual(he.make_snapshot(commands, basedir, extra=['export HOD_EXTRA=1']), fn)
+        self.assertEqual(len(os.listdir(basedir)), 1)
+        self.assertEqual(he.make_snapshot(['false'], basedir), None)
+        self.assertEqual(he.make_snapshot(["export EBROOTX=/no/such/dir"], basedir), None)
@@ -25,11 +25,15 @@
 @author Ewan Higgs (Universiteit Gent)
 '''
 
+import shutil
+import tempfile
 import unittest
 from mock import sentinel
 from optparse import OptionParser
 from hod.config.hodoption import HodOption
 import hod.hodproc as hh
+from hod.distribution import work_name
+from hod.persistent import PersistentHdfs
 
 class HodProcTestCase(unittest.TestCase):
     '''Test HodProc functions'''
@@ -52,20 +56,53 @@ class HodProcTestCase(unittest.TestCase):
         hm = hh.HadoopMaster(opts)
         hm.distribution()
 
-    def test_hadoop_master_make_client(self):
-        '''test hadoop master make client'''
-        opts = HodOption(go_args=['progname'])
+    def test_hadoop_master_distribution_order(self):
+        '''test hadoop master distribution order and start waves'''
+        opts = HodOption(go_args=['progname', '--hbase-on'])
+        hm = hh.HadoopMaster(opts)
+        hm.distribution()
+        self.assertEqual([work_name(x[0]) for x in hm.dists], ['Hdfs', 'Hbase', 'Mapred', 'LocalClient', 'RemoteClient'])
+        self.assertEqual([x[2]['start_wave'] for x in hm.dists], [0, 1, 1, 2, 2])
+        # # the needed params of the providers are passed on
+        self.assertTrue('fs.default.name' in hm.dists[1][2]['params'])
+        self.assertTrue('fs.default.name' in hm.dists[2][2]['params'])
+        self.assertTrue('mapred.job.tracker' in hm.dists[2][2]['params'])
+        self.assertTrue(hm.dists[0][2]['other_work']['Hbase'])
+
+    def test_hadoop_master_distribution_hdfs_off(self):
+        '''test hadoop master distribution without hdfs'''
+        opts = HodOption(go_args=['progname', '--hdfs-off'])
         hm = hh.HadoopMaster(opts)
         hm.distribution()
-        hm.make_client()
+        self.assertEqual([work_name(x[0]) for x in hm.dists], ['LocalClient', 'RemoteClient'])
 
-    def test_hadoop_master_distribution_hdfs(self):
-        '''test hadoop master distribution hdfs'''
+    def test_hadoop_master_distribution_persistent_in_use(self):
+        '''test hadoop master distribution refuses a persistent HDFS in use by another job'''
+        tmpdir = tempfile.mkdtemp()
+        PersistentHdfs(tmpdir).start('1.master', 'format')
+        opts = HodOption(go_args=['progname', '--hdfs-persistent=%s' % tmpdir])
+        hm = hh.HadoopMaster(opts)
+        hm.distribution()
+        self.assertEqual([work_name(x[0]) for x in hm.dists], ['LocalClient', 'RemoteClient'])
+        opts = HodOption(go_args=['progname', '--hdfs-persistent=%s' % tmpdir, '--hdfs-persistent-force'])
+        hm = hh.HadoopMaster(opts)
+        hm.distribution()
+        self.assertEqual(work_name(hm.dists[0][0]), 'Hdfs')
+        shutil.rmtree(tmpdir)
+
+    def test_hadoop_master_shared_client(self):
+        '''test hadoop master shared client'''
+        opts = HodOption(go_args=['progname'])
+        hm = hh.HadoopMaster(opts)
+        self.assertEqual(hm.shared_RemoteClient(0, [0]), {'environment': None})
+
+    def test_hadoop_master_shared_hdfs(self):
+        '''test hadoop master shared hdfs'''
         opts = HodOption(go_args=['progname'])
         hm = hh.HadoopMaster(opts)
         hm.distribution()
-        hm.distribution_HDFS()
-        self.assertTrue(hm.dists is not None)
+        shared = hm.shared_Hdfs(*hm.select_hdfs_ranks())
+        self.assertTrue('fs.default.name' in shared['params'])
 
     def test_hadoop_master_distribution_yarn(self):
         '''test hadoop master distribution yarn'''
@@ -75,21 +112,21 @@ class HodProcTestCase(unittest.TestCase):
         hm.distribution_Yarn()
         self.assertTrue(hm.dists is not None)
 
-    def test_hadoop_master_distribution_mapred(self):
-        '''test hadoop master distribution mapred'''
+    def test_hadoop_master_shared_mapred(self):
+        '''test hadoop master shared mapred'''
         opts = HodOption(go_args=['progname'])
         hm = hh.HadoopMaster(opts)
         hm.distribution()
-        hm.distribution_Mapred()
-        self.assertTrue(hm.dists is not None)
+        shared = hm.shared_Mapred(*hm.select_mapred_ranks())
+        self.assertTrue('mapred.job.tracker' in shared['params'])
 
-    def test_hadoop_master_distribution_hbase(self):
-        '''test hadoop master distribution hbase'''
+    def test_hadoop_master_shared_hbase(self):
+        '''test hadoop master shared hbase'''
         opts = HodOption(go_args=['progname'])
         hm = hh.HadoopMaster(opts)
         hm.distribution()
-        hm.distribution_Hbase()
-        self.assertTrue(hm.dists is not None)
+        shared = hm.shared_Hbase(*hm.select_hbasemaster_ranks())
+        self.assertEqual(shared['workload'], 'mixed')
 
     def test_hadoop_master_select_network(self):
         '''test hadoop master select network'''
@@ -110,3 +110,21 @@ class MPIServiceTestCase(unittest.TestCase):
         ms = hm.MpiService()
         ms.distribution()
         ms. run_dist()
+
+    def test_mpiservice_wait_control(self):
+        '''test mpiservice wait control'''
+        ms = hm.MpiService()
+        self.assertEqual(ms.wait_control(0), {'command': 'done'})
+        ms.active_work = ['dummy']
+        self.assertEqual(ms.wait_control(0), {'command': 'continue'})
+
+    def test_mpiservice_plan_shutdown(self):
+        '''test mpiservice shutdown requests at the end of the walltime'''
+        ms = hm.MpiService()
+        ms.active_work = ['dummy']
+        ms.plan_shutdown()
+        self.assertEqual(ms.shutdown, None)
+        ms.walltime_end = 0
+        ms.plan_shutdown()
+        self.assertEqual(ms.wait_control(10)['command'], 'stop')
+        self.assertEqual(ms.wait_control(0), {'command': 'continue'})
@@ -27,7 +27,9 @@
 
 import unittest
 from mock import patch
+import os
 import socket
+import tempfile
 import hod.node as hn
 
 class HodNodeTestCase(unittest.TestCase):
@@ -158,6 +160,21 @@ class HodNodeTestCase(unittest.TestCase):
         n = hn.Node()
         desc = n.go()
 
+    def test_node_local_storage(self):
+        '''the storage is collected once per process and probe'''
+        calls = []
+        orig = hn.get_storage
+        hn._storage_cache.clear()
+        try:
+            hn.get_storage = lambda probe=0: calls.append(probe) or [{'directory': '/a', 'throughput': probe}]
+            storage = hn.Node(storage_probe=1).go()['storage']
+            storage[0]['directory'] = '/changed'
+            self.assertEqual(hn.Node(storage_probe=1).go()['storage'], [{'directory': '/a', 'throughput': 1}])
+            self.assertEqual(calls, [1])
+        finally:
+            hn.get_storage = orig
+            hn._storage_cache.clear()
+
     def test_node_order_network(self):
         '''test node order network'''
         n = hn.Node()
@@ -167,3 +184,57 @@ class HodNodeTestCase(unittest.TestCase):
         '''test node get memory'''
         memory = hn.get_memory()
         self.assertTrue(memory['meminfo'] > 512)
+
+    def test_node_get_mounts(self):
+        '''test node get mounts'''
+        fh, fn = tempfile.mkstemp()
+        os.write(fh, "proc /proc proc rw 0 0\n/dev/sdb1 /local\\040disk xfs rw 0 0\n")
+        os.close(fh)
+        mounts = hn.get_mounts(fn)
+        os.remove(fn)
+        self.assertEqual(mounts, [('proc', '/proc', 'proc'), ('/dev/sdb1', '/local disk', 'xfs')])
+
+    def test_node_get_storage(self):
+        '''test node get storage'''
+        storage = hn.get_storage()
+        self.assertTrue(storage)
+        for info in storage:
+            self.assertTrue(os.access(info['directory'], os.W_OK))
+            self.assertTrue(info['free'] <= info['size'])
+
+    def test_node_select_storage(self):
+        '''test node select storage'''
+        gb = 2 ** 30
+        def disk(directory, fstype, free, rotational=True, local=True):
+            return {'directory': directory, 'fstype': fstype, 'free': free * gb, 'rotational': rotational,
+                    'local': local, 'throughput': None}
+        storage = [disk('/tmp', 'ext4', 10), disk('/dev/shm', 'tmpfs', 4, None), disk('/ssd', 'xfs', 5, False),
+                   disk('/local', 'xfs', 100), disk('/full', 'ext4', 0), disk('/home', 'nfs', 1000, None, False)]
+        self.assertEqual(hn.select_storage(storage, 'data'), ['/ssd', '/local', '/tmp'])
+        self.assertEqual(hn.select_storage(storage, 'base'), ['/ssd'])
+        self.assertEqual(hn.select_storage(storage, 'control'), ['/dev/shm'])
+        # # never a network filesystem, not even as only option
+        self.assertEqual(hn.select_storage(storage[-1:], 'data'), [os.path.realpath(tempfile.gettempdir())])
+        nfstmp = disk(os.path.realpath(tempfile.gettempdir()), 'nfs', 1000, None, False)
+        self.assertEqual(hn.select_storage([nfstmp, storage[1]], 'data'), ['/dev/shm'])
+
+    def test_node_probe_throughput(self):
+        '''test node probe throughput'''
+        tmpdir = tempfile.mkdtemp()
+        self.assertTrue(hn.probe_throughput(tmpdir, 1) > 0)
+        self.assertEqual(os.listdir(tmpdir), [])
+        os.rmdir(tmpdir)
+
+    def test_node_storage_weights(self):
+        '''test node storage weights and reserved space'''
+        storage = [{'directory': '/a', 'free': 100, 'size': 200, 'throughput': 300.0},
+                   {'directory': '/b', 'free': 210, 'size': 400, 'throughput': None},
+                   {'directory': '/c', 'free': 1000, 'size': 1000, 'throughput': 100.0}]
+        self.assertEqual(hn.storage_weights(storage, ['/a', '/b', '/c']), {'/a': 1, '/b': 1, '/c': 1})
+        self.assertEqual(hn.storage_weights(storage, ['/a', '/b', '/c'], 'capacity'), {'/a': 1, '/b': 2, '/c': 4})
+        self.assertEqual(hn.storage_weights(storage, ['/a', '/c'], 'throughput'), {'/a': 3, '/c': 1})
+        # # not probed: no weighting
+        self.assertEqual(hn.storage_weights(storage, ['/a', '/b'], 'throughput'), {'/a': 1, '/b': 1})
+        self.assertEqual(hn.storage_reserved(storage, ['/b', '/c'], fraction=0.1), 40)
+        self.assertEqual(hn.storage_reserved(storage, ['/b', '/c'], fraction=0.1, maximum=10), 10)
+        self.assertEqual(hn.storage_reserved(storage, []), 0)
@@ -0,0 +1,164 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import hod.persistent as hp
+
+
+def write_version(directory, namespaceid, fsimage=True):
+    '''Fake HDFS storage directory'''
+    current = os.path.join(directory, 'current')
+    os.makedirs(current)
+    open(os.path.join(current, 'VERSION'), 'w').write("#comment\nnamespaceID=%s\nlayoutVersion=-41\n" % namespaceid)
+    if fsimage:
+        open(os.path.join(current, 'fsimage'), 'w').write('')
+
+
+def write_version2(directory, clusterid, namespaceid):
+    '''Fake Hadoop 2 datanode storage directory: the namespaceID is in the VERSION of the block pool'''
+    current = os.path.join(directory, 'current')
+    bpcurrent = os.path.join(current, 'BP-%s-10.0.0.1-1400000000000' % namespaceid, 'current')
+    os.makedirs(bpcurrent)
+    open(os.path.join(current, 'VERSION'), 'w').write(
+        "storageID=DS-1\nclusterID=%s\ndatanodeUuid=0123\nstorageType=DATA_NODE\nlayoutVersion=-56\n" % clusterid)
+    open(os.path.join(bpcurrent, 'VERSION'), 'w').write(
+        "namespaceID=%s\nblockpoolID=BP-%s-10.0.0.1-1400000000000\nlayoutVersion=-56\n" % (namespaceid, namespaceid))
+
+
+class HodPersistentTestCase(unittest.TestCase):
+    '''Test persistent HDFS across jobs'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.phdfs = hp.PersistentHdfs(os.path.join(self.tmpdir, 'hdfs'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_read_version(self):
+        '''VERSION properties'''
+        self.assertEqual(hp.read_version(self.tmpdir), {})
+        write_version(self.tmpdir, '1234')
+        self.assertEqual(hp.read_version(self.tmpdir), {'namespaceID': '1234', 'layoutVersion': '-41'})
+
+    def test_check(self):
+        '''pick reuse, partial or format'''
+        # # nothing yet
+        self.assertEqual(self.phdfs.check(['a', 'b'])['mode'], 'format')
+        # # namespace without image
+        write_version(self.phdfs.name_dir, '1234', fsimage=False)
+        self.assertEqual(self.phdfs.check(['a', 'b'])['mode'], 'format')
+        open(os.path.join(self.phdfs.name_dir, 'current', 'fsimage'), 'w').write('')
+
+        self.phdfs.start('1.master', 'format')
+        self.phdfs.stop(['b', 'a'])
+        manifest = self.phdfs.load()
+        self.assertEqual(manifest['hosts'], ['a', 'b'])
+        self.assertEqual(manifest['namespaceID'], '1234')
+        self.assertEqual(manifest['state'], 'stopped')
+        self.assertTrue(manifest['clean'])
+
+        self.assertEqual(self.phdfs.check(['a', 'b', 'c']),
+                         {'mode': 'reuse', 'namespaceID': '1234', 'clusterID': None, 'missing': []})
+        self.assertEqual(self.phdfs.check(['b']),
+                         {'mode': 'partial', 'namespaceID': '1234', 'clusterID': None, 'missing': ['a']})
+        self.assertEqual(self.phdfs.check(['c'])['mode'], 'format')
+
+        # # manifest of another namespace
+        manifest['namespaceID'] = '5678'
+        self.phdfs.save(manifest)
+        self.assertEqual(self.phdfs.check(['a', 'b'])['mode'], 'format')
+
+    def test_in_use(self):
+        '''manifest of a running job that is not known to be gone'''
+        self.assertEqual(self.phdfs.in_use(), None)
+        self.phdfs.start('1.master', 'format')
+        orig = hp.job_gone
+        try:
+            hp.job_gone = lambda jobid: None
+            self.assertEqual(self.phdfs.in_use(), 'in use by job 1.master (unknown state)')
+            self.assertEqual(self.phdfs.in_use(force=True), None)
+            hp.job_gone = lambda jobid: False
+            self.assertEqual(self.phdfs.in_use(), 'in use by job 1.master (still running)')
+            hp.job_gone = lambda jobid: True
+            self.assertEqual(self.phdfs.in_use(), None)
+        finally:
+            hp.job_gone = orig
+        self.phdfs.stop(['a'], clean=False)
+        self.assertEqual(self.phdfs.in_use(), None)
+        self.assertFalse(self.phdfs.load()['clean'])
+
+    def test_key(self):
+        '''same directory, same key'''
+        self.assertEqual(self.phdfs.key(), hp.PersistentHdfs(os.path.join(self.tmpdir, 'hdfs', '.')).key())
+        self.assertNotEqual(self.phdfs.key(), hp.PersistentHdfs(self.tmpdir).key())
+
+    def test_check_data_dir(self):
+        '''blocks of another namespace are removed'''
+        data = os.path.join(self.tmpdir, 'data')
+        self.assertFalse(hp.check_data_dir(data, '1234'))
+        write_version(data, '1234')
+        self.assertFalse(hp.check_data_dir(data, '1234'))
+        self.assertTrue(hp.check_data_dir(data, '5678'))
+        self.assertEqual(os.listdir(data), [])
+        write_version(data, '1234')
+        self.assertTrue(hp.check_data_dir(data, None))
+
+    def test_check_data_dir_hadoop2(self):
+        '''Hadoop 2 datanode blocks are only removed when the clusterID or the namespaceID differs'''
+        data = os.path.join(self.tmpdir, 'data')
+        write_version2(data, 'CID-1', '1234')
+        self.assertEqual(hp.storage_ids(data), {'clusterID': 'CID-1', 'namespaceID': ['1234']})
+        self.assertFalse(hp.check_data_dir(data, '1234', 'CID-1'))
+        self.assertFalse(hp.check_data_dir(data, '1234'))
+        self.assertTrue(os.path.isdir(os.path.join(data, 'current')))
+        self.assertTrue(hp.check_data_dir(data, '1234', 'CID-2'))
+        write_version2(data, 'CID-1', '1234')
+        self.assertTrue(hp.check_data_dir(data, '5678'))
+        write_version2(data, 'CID-1', '1234')
+        self.assertTrue(hp.check_data_dir(data, None))
+        # # no block pool yet
+        os.makedirs(os.path.join(data, 'current'))
+        open(os.path.join(data, 'current', 'VERSION'), 'w').write("storageID=DS-1\n")
+        self.assertFalse(hp.check_data_dir(data, '1234'))
+
+    def test_manifest_hadoop2(self):
+        '''the clusterID of the namenode is kept in the manifest'''
+        write_version(self.phdfs.name_dir, '1234')
+        version = os.path.join(self.phdfs.name_dir, 'current', 'VERSION')
+        open(version, 'a').write("clusterID=CID-1\n")
+        self.phdfs.start('1.master', 'format')
+        self.phdfs.stop(['a'])
+        self.assertEqual(self.phdfs.load()['clusterID'], 'CID-1')
+        self.assertEqual(self.phdfs.check(['a'])['clusterID'], 'CID-1')
+        manifest = self.phdfs.load()
+        manifest['clusterID'] = 'CID-2'
+        self.phdfs.save(manifest)
+        self.assertEqual(self.phdfs.check(['a'])['mode'], 'format')
@@ -0,0 +1,97 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+import hod.commands.command as hcc
+import hod.readiness as hr
+from hod.timeline import Timeline
+
+class HodReadinessTestCase(unittest.TestCase):
+    '''Test readiness probes'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_port_probe(self):
+        '''port probe is ready when something listens'''
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        probe = hr.PortProbe('127.0.0.1', port)
+        self.assertFalse(probe.check())
+        sock.listen(1)
+        self.assertTrue(probe.check())
+        sock.close()
+
+    def test_pid_probe(self):
+        '''pid probe checks the process in the pidfile'''
+        pidfile = os.path.join(self.tmpdir, 'test.pid')
+        probe = hr.PidProbe(pidfile)
+        self.assertFalse(probe.check())
+        open(pidfile, 'w').write("%s\n" % os.getpid())
+        self.assertTrue(probe.check())
+
+    def test_log_probe(self):
+        '''log probe finds the pattern in new data'''
+        logfn = os.path.join(self.tmpdir, 'hbase-user-master-host.log')
+        probe = hr.LogProbe(os.path.join(self.tmpdir, 'hbase-*-master-*.log'), r'completed initialization')
+        self.assertFalse(probe.check())
+        fh = open(logfn, 'w')
+        fh.write("starting\nMaster has completed")
+        fh.flush()
+        self.assertFalse(probe.check())
+        fh.write(" initialization\n")
+        fh.close()
+        self.assertTrue(probe.check())
+
+    def test_command_probe(self):
+        '''command probe needs success and matching output'''
+        self.assertTrue(hr.CommandProbe(hcc.Command('echo Safe mode is OFF'), r'is OFF').check())
+        self.assertFalse(hr.CommandProbe(hcc.Command('echo Safe mode is ON'), r'is OFF').check())
+        self.assertFalse(hr.CommandProbe(hcc.Command('false')).check())
+
+    def test_readiness_wait(self):
+        '''wait records ready times in the timeline and returns the failed conditions'''
+        pidfile = os.path.join(self.tmpdir, 'test.pid')
+        open(pidfile, 'w').write("%s\n" % os.getpid())
+        readiness = hr.Readiness(delay_min=0.01, delay_max=0.1)
+        readiness.add(hr.PidProbe(pidfile, name='self'))
+        readiness.add(hr.PidProbe(os.path.join(self.tmpdir, 'missing.pid'), name='missing'), timeout=0.3)
+        timeline = Timeline()
+        start = time.time()
+        self.assertEqual(readiness.wait(timeline=timeline, prefix='Test'), ['missing'])
+        self.assertTrue(time.time() - start < 2)
+        self.assertEqual(readiness.ready.keys(), ['self'])
+        self.assertEqual([x[0] for x in timeline.events], ['Test ready self'])
@@ -0,0 +1,90 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import hod.sampler as hs
+
+class HodSamplerTestCase(unittest.TestCase):
+    '''Test resource sampling and metrics'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_proc(self):
+        '''read the real /proc'''
+        busy, total = hs.read_cpu()
+        self.assertTrue(0 <= busy <= total)
+        used, total = hs.read_meminfo()
+        self.assertTrue(0 < used < total)
+        self.assertEqual(len(hs.read_diskstats()), 2)
+        self.assertEqual(len(hs.read_netdev()), 2)
+        ticks, rss, _, _ = hs.read_pid(os.getpid())
+        self.assertTrue(rss > 0)
+        self.assertEqual(hs.read_pid(-1), None)
+
+    def test_sampler(self):
+        '''rates from the second sample on'''
+        sampler = hs.Sampler()
+        metrics = sampler.sample({'self': os.getpid(), 'gone': None})
+        self.assertTrue('node.mem' in metrics)
+        self.assertTrue('self.rss' in metrics)
+        self.assertFalse('node.cpu' in metrics)
+        time.sleep(0.1)
+        metrics = sampler.sample({'self': os.getpid()})
+        for name in ['node.cpu', 'node.disk_read', 'node.net_tx', 'self.cpu']:
+            self.assertTrue(name in metrics, name)
+
+    def test_aggregate_series_summarize(self):
+        '''aggregate per metric, write the series and summarize it'''
+        samples = [{'node.cpu': 10.0}, {'node.cpu': 90.0, 'Hdfs/datanode.rss': 500.0}, {'node.cpu': 20.0}, None]
+        agg = hs.aggregate(samples, topn=2)
+        self.assertEqual(agg['node.cpu']['count'], 3)
+        self.assertEqual(agg['node.cpu']['mean'], 40.0)
+        self.assertEqual(agg['node.cpu']['maxrank'], 1)
+        self.assertEqual(agg['node.cpu']['minrank'], 0)
+        self.assertEqual(agg['node.cpu']['top'], [(1, 90.0), (2, 20.0)])
+        self.assertEqual(agg['Hdfs/datanode.rss']['std'], 0)
+
+        fn = os.path.join(self.tmpdir, hs.METRICS_CSV)
+        series = hs.MetricsSeries(fn)
+        series.append(agg, when=1)
+        series.append(hs.aggregate([{'node.cpu': 10.0}, {'node.cpu': 70.0}, {'node.cpu': 10.0}], topn=2), when=2)
+        self.assertEqual(len(open(fn).readlines()), 4)  # header, 2 metrics and 1 metric
+
+        summ = hs.summarize(fn, topn=2)
+        self.assertEqual(summ['node.cpu']['samples'], 2)
+        self.assertEqual(summ['node.cpu']['peak'], 90.0)
+        self.assertEqual(summ['node.cpu']['peakrank'], 1)
+        self.assertAlmostEqual(summ['node.cpu']['imbalance'], (90.0 / 40 + 70.0 / 30) / 2)
+        self.assertEqual(summ['node.cpu']['hotspots'][0], (1, 2))
@@ -0,0 +1,99 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+import hod.session as hs
+
+SHELL = ['/bin/bash', '--noprofile', '--norc', '-i']
+
+class HodSessionTestCase(unittest.TestCase):
+    '''Test PtySession'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.logfn = os.path.join(self.tmpdir, 'test.log')
+        self.session = hs.PtySession('test', logfn=self.logfn, sessiondir=self.tmpdir, shell=SHELL)
+        self.assertTrue(self.session.start())
+
+    def tearDown(self):
+        self.session.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_run(self):
+        '''run waits for the completion marker and reports the exitcode'''
+        self.assertEqual(self.session.run('true', timeout=10), 0)
+        self.assertEqual(self.session.run('false', timeout=10), 1)
+        self.assertEqual(self.session.run('(exit 3)', timeout=10), 3)
+
+    def test_run_keeps_state(self):
+        '''commands run in the same shell'''
+        self.assertEqual(self.session.run('export HODTEST=42', timeout=10), 0)
+        self.assertEqual(self.session.run('test "$HODTEST" = 42', timeout=10), 0)
+
+    def test_run_nowait(self):
+        '''no wait only confirms the start'''
+        start = time.time()
+        self.assertEqual(self.session.run('sleep 5', wait=False, timeout=10), 0)
+        self.assertTrue(time.time() - start < 4)
+
+    def test_run_timeout(self):
+        '''no marker within timeout returns None'''
+        self.assertEqual(self.session.run('sleep 2', timeout=0.5), None)
+
+    def test_log_and_list(self):
+        '''output goes to the log, the session socket is listed'''
+        self.assertEqual(self.session.run('echo hello_from_session', timeout=10), 0)
+        self.assertTrue('hello_from_session' in open(self.logfn).read())
+        self.assertEqual(hs.list_sessions(self.tmpdir), ['test'])
+
+    def test_attach_socket(self):
+        '''attached clients can type in the session and receive its output'''
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(hs.session_socket('test', sessiondir=self.tmpdir))
+        time.sleep(0.2)
+        sock.sendall('echo from_$((40+2))_client\n')
+        data = ''
+        deadline = time.time() + 10
+        sock.settimeout(1)
+        while 'from_42_client' not in data and time.time() < deadline:
+            try:
+                data += sock.recv(4096)
+            except socket.timeout:
+                pass
+        sock.close()
+        self.assertTrue('from_42_client' in data)
+
+    def test_stop(self):
+        '''stop ends the shell and removes the socket'''
+        self.session.stop()
+        self.assertFalse(self.session.is_alive())
+        self.assertEqual(hs.list_sessions(self.tmpdir), [])
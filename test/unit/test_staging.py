@@ -0,0 +1,114 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import hod.staging as hs
+
+LS_R = """Found 3 items
+drwxr-xr-x   - user group          0 2014-01-01 12:00 data/sub
+-rw-r--r--   3 user group       1234 2014-01-01 12:00 data/sub/a b
+-rw-r--r--   3 user group          5 2014-01-01 12:00 data/c
+"""
+
+
+class HodStagingTestCase(unittest.TestCase):
+    '''Test the stage-in and stage-out helpers'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_parse_stage(self):
+        '''SRC:DEST pairs'''
+        self.assertEqual(hs.parse_stage(['/shared/in:data', 'bad', 'out:/shared/x:y']),
+                         [('/shared/in', 'data'), ('out', '/shared/x:y')])
+
+    def test_files(self):
+        '''local and HDFS listings'''
+        self.assertEqual(hs.parse_hdfs_ls(LS_R, 'data/'), [('c', 5), ('sub/a b', 1234)])
+        self.assertEqual(hs.parse_hdfs_ls(LS_R.replace('data/', '/user/x/data/'), 'data', home='/user/x'),
+                         [('c', 5), ('sub/a b', 1234)])
+
+        os.makedirs(os.path.join(self.tmpdir, 'sub'))
+        open(os.path.join(self.tmpdir, 'sub', 'a'), 'w').write('x' * 10)
+        open(os.path.join(self.tmpdir, 'c'), 'w').write('')
+        self.assertEqual(hs.local_files(self.tmpdir), [('c', 0), ('sub/a', 10)])
+        self.assertEqual(hs.local_files(os.path.join(self.tmpdir, 'c')), [('', 0)])
+        self.assertEqual(hs.stage_path('data', ''), 'data')
+        self.assertEqual(hs.stage_path('data', 'sub/a'), 'data/sub/a')
+
+    def test_parse_hdfs_ls_boundary(self):
+        '''top only matches on a path boundary'''
+        # top out also occurs in the home directory and in the names below it
+        ls_r = LS_R.replace('data/', 'hdfs://nn:8020/user/scout/out/').replace('sub/', 'out/')
+        self.assertEqual(hs.parse_hdfs_ls(ls_r, 'out', home='/user/scout'), [('c', 5), ('out/a b', 1234)])
+        self.assertEqual(hs.parse_hdfs_ls(ls_r, '/user/scout/out'), [('c', 5), ('out/a b', 1234)])
+        self.assertEqual(hs.parse_hdfs_ls(ls_r, 'ou', home='/user/scout'), [])
+        self.assertEqual(hs.parse_hdfs_ls(ls_r, '/user/scout/out/c'), [('', 5)])
+        self.assertEqual(hs.parse_hdfs_ls(ls_r, 'out', home='/user/other'), [])
+
+    def test_assign(self):
+        '''balanced by number of blocks'''
+        files = [('a', 300), ('b', 100), ('c', 100), ('d', 100), ('e', 1)]
+        assigned = hs.assign(files, 2, block=100)
+        self.assertEqual(assigned, [[('a', 300), ('e', 1)], [('b', 100), ('c', 100), ('d', 100)]])
+        self.assertEqual(hs.assign([], 3), [[], [], []])
+
+    def test_manifest(self):
+        '''resume with the files that are not copied yet'''
+        manifest = hs.StageManifest(os.path.join(self.tmpdir, 'out'))
+        files = [('a', 1), ('b', 2), ('c', 3)]
+        self.assertEqual(manifest.todo(files, files), files)
+
+        manifest.record(0, 'a', 1)
+        manifest.record(1, 'b', 2)
+        self.assertEqual(len(manifest.parts()), 2)
+        # # b was copied, but is gone (or changed) since
+        self.assertEqual(manifest.todo(files, [('a', 1), ('b', 1)]), [('b', 2), ('c', 3)])
+
+        saved = manifest.save(state='done', throughput=1.0)
+        self.assertEqual(saved['done'], {'a': 1, 'b': 2})
+        self.assertEqual(manifest.parts(), [])
+        self.assertEqual(manifest.load()['state'], 'done')
+        self.assertEqual(manifest.todo(files, files), [('c', 3)])
+
+    def test_stage_shared(self):
+        '''stage-in manifest in the base directory, stage-out manifest next to the destination'''
+        shared = hs.stage_shared('in', '/readonly/data', 'data', self.tmpdir)
+        self.assertEqual(os.path.dirname(shared), self.tmpdir)
+        self.assertNotEqual(shared, hs.stage_shared('in', '/readonly/data', 'other', self.tmpdir))
+        self.assertEqual(hs.stage_shared('out', 'out', '/shared/out', self.tmpdir), '/shared/out')
+
+    def test_throughput(self):
+        '''MB/s'''
+        self.assertEqual(hs.throughput(10 * 1024 * 1024, 2), 5.0)
+        self.assertEqual(hs.throughput(10, 0), 0.0)
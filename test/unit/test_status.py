@@ -0,0 +1,100 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import hod.status as hs
+
+class DummyWork(object):
+    '''class as used in dists'''
+
+class HodStatusTestCase(unittest.TestCase):
+    '''Test StatusModel'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.snapshot = os.path.join(self.tmpdir, hs.STATUS_SNAPSHOT)
+        self.model = hs.StatusModel('123.master', snapshot=self.snapshot)
+        self.model.set_ranks([{'fqdn': 'node1', 'cores': 8, 'pid': 10}, {'fqdn': 'node2', 'cores': 8, 'pid': 11}])
+        self.model.set_dists([[DummyWork, [0, 1], {}]])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_work(self):
+        '''work state and remaining time'''
+        self.model.update_work('DummyWork', state='running', started=0, max_age=100)
+        status = self.model.query()
+        self.assertEqual(status['work']['DummyWork']['state'], 'running')
+        self.assertEqual(status['work']['DummyWork']['ranks'], [0, 1])
+        self.assertTrue(status['work']['DummyWork']['remaining'] < 0)
+        self.assertEqual(status['ranks']['1']['fqdn'], 'node2')
+
+    def test_daemons(self):
+        '''incremental daemon updates'''
+        info = {'work': 'Hdfs', 'daemon': 'datanode', 'pid': 42, 'alive': True, 'started': 1.0,
+                'ports': {'dfs.datanode.ipc.address': 'node2:50020'}, 'heap': '1000'}
+        self.model.update_daemons(1, {'Hdfs/datanode': info})
+        self.model.update_daemons(0, {})
+        status = self.model.query()
+        self.assertEqual(status['daemons']['1']['Hdfs/datanode']['pid'], 42)
+        self.assertTrue(status['daemons']['1']['Hdfs/datanode']['uptime'] > 0)
+        txt = hs.format_status(status)
+        self.assertTrue('rank 1 node2 Hdfs/datanode: alive pid 42' in txt)
+
+        self.model.update_daemons(1, {'Hdfs/datanode': None})
+        self.assertEqual(self.model.query()['daemons']['1'], {})
+
+    def test_events(self):
+        '''daemon events of all ranks'''
+        self.model.update_work('Hdfs', state='running')
+        self.model.add_events(1, [{'daemon': 'datanode', 'work': 'Hdfs', 'event': 'restarted', 'time': 0,
+                                   'latency': 1.0, 'lost': 2.0}])
+        status = self.model.query()
+        self.assertEqual(status['events'][0]['rank'], 1)
+        txt = hs.format_status(status)
+        self.assertTrue('rank 1 Hdfs/datanode: restarted latency 1.0s lost 2.0s' in txt)
+
+    def test_shutdown(self):
+        '''planned shutdown times are relative to now in the query'''
+        self.model.set_shutdown({'end': 0, 'drain': -20, 'stop': -10})
+        status = self.model.query()
+        self.assertTrue(status['shutdown_in']['stop'] < -10)
+        txt = hs.format_status(status)
+        self.assertTrue('walltime ends in' in txt)
+        self.assertTrue('drain in' in txt)
+
+    def test_snapshot(self):
+        '''snapshot is valid JSON'''
+        self.model.set_state('running')
+        self.model.write_snapshot()
+        snapshot = json.load(open(self.snapshot))
+        self.assertEqual(snapshot['state'], 'running')
+        self.assertEqual(snapshot['jobid'], '123.master')
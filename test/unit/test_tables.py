@@ -0,0 +1,74 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import hod.tables as ht
+
+
+class HodTablesTestCase(unittest.TestCase):
+    '''Test the HBase table pre-split helpers'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_load_tables(self):
+        '''valid specs with defaults, invalid ones dropped'''
+        fn = os.path.join(self.tmpdir, 'tables.json')
+        json.dump([{'name': 'a', 'families': ['d']}, {'name': 'b'}, {'name': 'c', 'families': ['d'], 'keys': 'x'},
+                   {'name': 'e', 'families': ['d'], 'keys': ['k1', 'k0'], 'hfiles': '/staged/e'}], open(fn, 'w'))
+        tables = ht.load_tables(fn)
+        self.assertEqual([x['name'] for x in tables], ['a', 'e'])
+        self.assertEqual(tables[0]['keys'], 'hex')
+        self.assertEqual(tables[0]['regions_per_server'], ht.TABLE_REGIONS_PER_SERVER)
+        self.assertEqual(ht.load_tables(os.path.join(self.tmpdir, 'nosuchfile')), [])
+
+    def test_split_keys(self):
+        '''regions - 1 evenly spread keys'''
+        self.assertEqual(ht.split_keys('hex', 4), ['40000000', '80000000', 'c0000000'])
+        self.assertEqual(ht.split_keys('decimal', 4, 4), ['2500', '5000', '7500'])
+        self.assertEqual(ht.split_keys('hex', 1), [])
+        self.assertEqual(ht.split_keys(['b', 'a'], 10), ['a', 'b'])
+
+    def test_tables_script(self):
+        '''the hbase shell script'''
+        spec = {'name': "it's", 'families': ['d', 'm'], 'keys': 'hex', 'regions_per_server': 1}
+        script = ht.tables_script([spec], 2)
+        self.assertEqual(script, "create 'it\\'s', {NAME => 'd'}, {NAME => 'm'}, {SPLITS => ['80000000']}\nexit\n")
+        self.assertEqual(ht.tables_script([spec], 1), "create 'it\\'s', {NAME => 'd'}, {NAME => 'm'}\nexit\n")
+
+    def test_live_servers(self):
+        '''regionserver count from the status output'''
+        self.assertEqual(ht.live_servers("3 servers, 0 dead, 1.0000 average load\n"), 3)
+        self.assertEqual(ht.live_servers("2 live servers\n    node1:60020 1400000000000\n"), 2)
+        self.assertEqual(ht.live_servers("ERROR: Can't get master address from ZooKeeper"), None)
@@ -0,0 +1,46 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import unittest
+import hod.timeline as ht
+
+class HodTimelineTestCase(unittest.TestCase):
+    '''Test Timeline'''
+
+    def test_timeline(self):
+        '''start, end, add and summary'''
+        tl = ht.Timeline(t0=0)
+        tl.start('launch')
+        self.assertTrue(tl.end('launch') >= 0)
+        tl.add('ready', 1, 3)
+        tl.start('running')
+        self.assertEqual(tl.duration('ready'), 2)
+        self.assertEqual(tl.duration('running'), None)
+        txt = tl.summary()
+        self.assertTrue('launch' in txt)
+        self.assertTrue('    1.00     3.00     2.00 ready' in txt)
+        self.assertTrue('running' in txt)
@@ -0,0 +1,83 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+import hod.topology as ht
+
+NODES = [
+    {'fqdn': 'node101.cluster', 'topology': [0], 'network': [['node101.ib.cluster', '10.1.2.1', 'ib0', 16],
+                                                             ['localhost', '127.0.0.1', 'lo', 8]]},
+    {'fqdn': 'node102.cluster', 'topology': [0], 'network': [['node102.ib.cluster', '10.1.2.2', 'ib0', 16]]},
+    {'fqdn': 'node201.cluster', 'topology': [0], 'network': [['node201.ib.cluster', '10.1.3.1', 'ib0', 16]]},
+]
+
+SWITCH_MAP = """# site switch map
+node1*.cluster /sw1/rack1
+10.1.3.*       /sw1/rack2
+invalid
+"""
+
+
+class HodTopologyTestCase(unittest.TestCase):
+    '''Test the rack mapping'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.mapfn = os.path.join(self.tmpdir, 'switchmap')
+        open(self.mapfn, 'w').write(SWITCH_MAP)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_node_rack(self):
+        '''rack from the switch map or the topology levels'''
+        switchmap = ht.parse_switch_map(self.mapfn)
+        self.assertEqual(switchmap, [('node1*.cluster', '/sw1/rack1'), ('10.1.3.*', '/sw1/rack2')])
+        self.assertEqual(ht.node_names(NODES[0]), ['node101.cluster', 'node101', 'node101.ib.cluster', '10.1.2.1'])
+        self.assertEqual([ht.node_rack(x, switchmap) for x in NODES], ['/sw1/rack1', '/sw1/rack1', '/sw1/rack2'])
+        self.assertEqual(ht.node_rack({'fqdn': 'x', 'topology': [1, 3]}), '/1/3')
+        self.assertEqual(ht.node_rack({'fqdn': 'x', 'topology': []}), ht.TOPOLOGY_DEFAULT_RACK)
+
+    def test_rack_table(self):
+        '''no table for a single rack'''
+        self.assertEqual(ht.rack_table(NODES), None)
+        table = ht.rack_table(NODES, ht.parse_switch_map(self.mapfn))
+        self.assertEqual(table['10.1.2.2'], '/sw1/rack1')
+        self.assertEqual(table['node201'], '/sw1/rack2')
+
+    def test_write_topology(self):
+        '''the script looks up the hosts in the table'''
+        table = ht.rack_table(NODES, ht.parse_switch_map(self.mapfn))
+        tablefn, scriptfn = ht.write_topology(self.tmpdir, table)
+        self.assertTrue('10.1.3.1 /sw1/rack2\n' in open(tablefn).read())
+        out = subprocess.Popen([scriptfn, '10.1.3.1', 'node102.cluster', 'unknown'],
+                               stdout=subprocess.PIPE).communicate()[0]
+        self.assertEqual(out, '/sw1/rack2 /sw1/rack1 /default-rack\n')
@@ -0,0 +1,106 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import hod.walltime as hw
+
+QSTAT_TORQUE = """Job Id: 123.master
+    Job_Name = HanythingOnDemand_job
+    Resource_List.walltime = 48:00:00
+    resources_used.walltime = 01:00:00
+    Walltime.Remaining = 169190
+"""
+
+QSTAT_PBSPRO = """Job Id: 123.master
+    Resource_List.walltime = 02:00:00
+    resources_used.walltime = 00:30:00
+"""
+
+class HodWalltimeTestCase(unittest.TestCase):
+    '''Test walltime and the shutdown schedule'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_parse_walltime(self):
+        '''walltime formats'''
+        self.assertEqual(hw.parse_walltime('48:00:00'), 48 * 3600)
+        self.assertEqual(hw.parse_walltime('01:30'), 90)
+        self.assertEqual(hw.parse_walltime('3600'), 3600)
+
+    def test_qstat_remaining(self):
+        '''remaining walltime from qstat -f output'''
+        self.assertEqual(hw.qstat_remaining(QSTAT_TORQUE), 169190)
+        self.assertEqual(hw.qstat_remaining(QSTAT_PBSPRO), 5400)
+        self.assertEqual(hw.qstat_remaining('Job Id: 123.master'), None)
+
+    def test_remaining_walltime_env(self):
+        '''fallback on the walltime in the environment'''
+        env = dict(os.environ)
+        try:
+            os.environ.pop(hw.JOBID_ENV, None)
+            os.environ[hw.WALLTIME_ENV] = '3600'
+            remaining = hw.remaining_walltime(started=0)
+            self.assertTrue(remaining < 0)
+            remaining = hw.remaining_walltime()
+            self.assertTrue(3500 < remaining <= 3600)
+            del os.environ[hw.WALLTIME_ENV]
+            self.assertEqual(hw.remaining_walltime(), None)
+        finally:
+            os.environ.clear()
+            os.environ.update(env)
+
+    def test_stop_durations(self):
+        '''measured stop durations give the lead time'''
+        sd = hw.StopDurations(os.path.join(self.tmpdir, hw.STOP_DURATIONS))
+        self.assertEqual(sd.lead('Hdfs'), hw.STOP_LEAD_DEFAULT)
+        for seconds in range(hw.STOP_DURATIONS_KEEP + 2):
+            sd.record('Hdfs', 10 + seconds)
+        self.assertEqual(len(sd.load()['Hdfs']), hw.STOP_DURATIONS_KEEP)
+        self.assertEqual(sd.lead('Hdfs'), (10 + hw.STOP_DURATIONS_KEEP + 1) * hw.STOP_LEAD_FACTOR)
+
+    def test_shutdown_plan(self):
+        '''drain and stop requests in time'''
+        plan = hw.ShutdownPlan(1000, 100, drain_lead=200, margin=50)
+        self.assertEqual(plan.info(), {'end': 1000, 'drain': 650, 'stop': 850})
+        self.assertEqual(plan.timeout(60, now=0), 60)
+        self.assertEqual(plan.timeout(60, now=600), 50)
+        self.assertEqual(plan.due(now=600), None)
+        self.assertEqual(plan.due(now=700)['command'], 'drain')
+        self.assertEqual(plan.due(now=700), None)
+        self.assertEqual(plan.timeout(600, now=700), 150)
+        # # too late for the drain: only stop
+        plan = hw.ShutdownPlan(1000, 100, drain_lead=200, margin=50)
+        self.assertEqual(plan.due(now=900)['command'], 'stop')
+        self.assertEqual(plan.due(now=901), None)
+        self.assertEqual(plan.timeout(60, now=901), 60)
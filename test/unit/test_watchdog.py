@@ -0,0 +1,113 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import unittest
+import hod.watchdog as hw
+
+class DummyProbe(object):
+    '''pid probe with settable state'''
+    def __init__(self):
+        self.alive = False
+
+    def check(self):
+        return self.alive
+
+    def pid(self):
+        return 42
+
+class HodWatchdogTestCase(unittest.TestCase):
+    '''Test Watchdog'''
+
+    def setUp(self):
+        self.probe = DummyProbe()
+        self.restarts = 0
+        self.restart_ok = True
+        self.wd = hw.Watchdog(budget=2, backoff_min=10)
+        self.wd.add('datanode', self.probe, restart=self.restart)
+
+    def restart(self):
+        self.restarts += 1
+        self.probe.alive = self.restart_ok
+        return self.restart_ok
+
+    def test_not_started(self):
+        '''no restart of a daemon that never ran'''
+        self.wd.check(now=0)
+        self.assertEqual(self.restarts, 0)
+        self.assertEqual(self.wd.pop_events(), [])
+
+    def test_restart(self):
+        '''crashed daemon is restarted, latency and lost capacity are recorded'''
+        self.probe.alive = True
+        self.wd.check(now=0)
+        self.probe.alive = False
+        self.wd.check(now=10)
+        self.assertEqual(self.restarts, 1)
+        events = self.wd.pop_events()
+        self.assertEqual([x['event'] for x in events], ['crashed', 'restarted'])
+        self.assertEqual(events[0]['last_alive'], 0)
+        self.assertTrue(events[1]['lost'] >= events[1]['latency'])
+        stats = self.wd.stats('datanode')
+        self.assertEqual(stats['restarts'], 1)
+        self.assertEqual(stats['lost'], events[1]['lost'])
+        self.assertEqual(self.wd.pop_events(), [])
+
+    def test_backoff_budget(self):
+        '''failing restarts back off and stop when the budget is used'''
+        self.restart_ok = False
+        self.probe.alive = True
+        self.wd.check(now=0)
+        self.probe.alive = False
+        self.wd.check(now=1)
+        self.assertEqual(self.restarts, 1)
+        self.wd.check(now=5)
+        self.assertEqual(self.restarts, 1)
+        self.wd.check(now=11)
+        self.assertEqual(self.restarts, 2)
+        self.wd.check(now=1000)
+        self.wd.check(now=2000)
+        self.assertEqual(self.restarts, 2)
+        events = [x['event'] for x in self.wd.pop_events()]
+        self.assertEqual(events, ['crashed', 'restart_failed', 'restart_failed', 'gave_up'])
+        self.assertEqual(self.wd.stats('datanode')['restarts'], 0)
+
+    def test_no_restart(self):
+        '''daemon without restart function is only reported'''
+        wd = hw.Watchdog()
+        probe = DummyProbe()
+        probe.alive = True
+        wd.add('namenode', probe)
+        wd.check(now=0)
+        probe.alive = False
+        wd.check(now=1)
+        wd.check(now=2)
+        self.assertEqual([x['event'] for x in wd.pop_events()], ['crashed'])
+        probe.alive = True
+        wd.check(now=3)
+        events = wd.pop_events()
+        self.assertEqual(events[0]['event'], 'recovered')
+        self.assertEqual(events[0]['lost'], 3)
@@ -0,0 +1,54 @@
+###
+# Copyright 2009-2014 Ghent University
+#
+# This file is part of hanythingondemand
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/hanythingondemand
+#
+# hanythingondemand is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# hanythingondemand is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with hanythingondemand. If not, see <http://www.gnu.org/licenses/>.
+'''
+@author Ewan Higgs (Universiteit Gent)
+'''
+
+import unittest
+from mpi4py import MPI
+import hod.readiness as hr
+import hod.work.work as hww
+
+class HodWorkTestCase(unittest.TestCase):
+    '''Test Work functions'''
+
+    def test_work_do_work_ready(self):
+        '''do_work_ready waits for the declared conditions once'''
+        o = hww.Work([0])
+        o.init_comm(MPI.COMM_WORLD)
+        o.add_ready_condition(hr.PidProbe('/no/such/file.pid'), timeout=0.1)
+        self.assertFalse(o.do_work_ready())
+        self.assertTrue(o.do_work_ready())  # conditions are consumed
+        self.assertTrue('Work ready' in o.timeline.summary())
+
+    def test_work_control_drain(self):
+        '''drain calls work_drain once, also when requested several times'''
+        o = hww.Work([0])
+        calls = []
+        o.work_drain = lambda: calls.append(True)
+        self.assertFalse(o.draining)
+        o.control({'command': 'drain'})
+        o.control({'command': 'drain'})
+        self.assertTrue(o.draining)
+        self.assertEqual(len(calls), 1)
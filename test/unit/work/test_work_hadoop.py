@@ -25,8 +25,11 @@
 @author Ewan Higgs (Universiteit Gent)
 '''
 
+import os
+import pwd
 import unittest
 import hod.work.hadoop as hwh
+from hod.node import Node
 
 class HodWorkHadoopTestCase(unittest.TestCase):
     '''Test Hadoop worker functions'''
@@ -45,6 +48,17 @@ class HodWorkHadoopTestCase(unittest.TestCase):
         o = hwh.Hadoop([0], {})
         o.prepare_extra_work_cfg() # TODO: Remove
 
+    def test_work_hadoop_data_dirs(self):
+        '''test Hadoop data_dirs: weighted striping, or one directory per disk'''
+        o = hwh.Hadoop([0], {'storage': {'weighting': 'capacity'}})
+        disk = {'fstype': 'ext4', 'local': True, 'rotational': True, 'throughput': None, 'size': 10 ** 12}
+        o.thisnode = Node()
+        o.thisnode.storage = [dict(disk, directory='/a', free=10 ** 11), dict(disk, directory='/b', free=2 * 10 ** 11)]
+        user = pwd.getpwuid(os.getuid())[0]
+        self.assertEqual(len(o.data_dirs('mapredlocal', persistent='key')), 3)
+        self.assertEqual(o.data_dirs('dfs.data.dir', persistent='key', weighted=False),
+                         ['/b/hod.%s.key/dfs.data.dir' % user, '/a/hod.%s.key/dfs.data.dir' % user])
+
     def test_work_hadoop_prepare_work_cfg(self):
         '''test Hadoop prepare_work_cfg'''
         o = hwh.Hadoop([0], {})
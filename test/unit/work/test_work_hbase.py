@@ -26,7 +26,9 @@
 '''
 
 import unittest
+from mpi4py import MPI
 import hod.work.hbase as hwh
+from hod.tables import TABLE_FLUSHED
 
 class HodWorkHbaseTestCase(unittest.TestCase):
     '''Test Hbase worker functions'''
@@ -61,3 +63,28 @@ class HodWorkHbaseTestCase(unittest.TestCase):
         '''test Hbase stop_work_service_slaves'''
         o = hwh.Hbase([0], {})
         o.stop_work_service_slaves()
+
+    def test_work_hbase_live_regionservers(self):
+        '''wait for the regionservers on all ranks but the master'''
+        o = hwh.Hbase([0], {})
+        o.init_comm(MPI.COMM_WORLD)
+        self.assertEqual(o.regionservers(), 1)
+        o.size = 4
+        self.assertEqual(o.regionservers(), 3)
+        scripts = []
+        o.hbase_shell = lambda script: scripts.append(script) or "3 servers, 0 dead, 2.0000 average load"
+        self.assertEqual(o.live_regionservers(), 3)
+        self.assertEqual(len(scripts), 1)
+
+    def test_work_hbase_work_drained(self):
+        '''drained once the master flushed all tables'''
+        o = hwh.Hbase([0], {})
+        o.init_comm(MPI.COMM_WORLD)
+        o.pre_run_any_service = o.post_run_any_service = lambda: None
+        scripts = []
+        o.hbase_shell = lambda script: scripts.append(script) or 'ERROR: table offline'
+        self.assertFalse(o.work_drained())
+        o.hbase_shell = lambda script: scripts.append(script) or TABLE_FLUSHED
+        self.assertTrue(o.work_drained())
+        self.assertTrue(o.work_drained())  # flushed only once
+        self.assertEqual(len(scripts), 2)